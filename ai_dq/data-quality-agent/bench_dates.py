@@ -0,0 +1,44 @@
+# bench_dates.py
+# Date parsing: per-value inference (dateutil, format="mixed") vs the cached
+# format + distinct-value parse in dates.py, for a few common layouts.
+# Per-value inference is timed on at most SLOW_ROWS rows and extrapolated.
+# Usage: python bench_dates.py [rows]
+import sys
+import time
+import numpy as np
+import pandas as pd
+from dates import infer_date_format, parse_dates, future_date_mask
+
+SLOW_ROWS = 500_000
+LAYOUTS = {"iso date": "%Y-%m-%d", "day-first": "%d/%m/%Y", "timestamp": "%m/%d/%Y %H:%M"}
+
+def make_column(rows, fmt, seed=0):
+    rng = np.random.default_rng(seed)
+    unit = "min" if "%H" in fmt else "D"
+    span = 10 * 365 * (1440 if unit == "min" else 1)
+    ts = pd.Timestamp("2018-01-01") + pd.to_timedelta(rng.integers(0, span, rows), unit=unit)
+    s = pd.Series(ts.strftime(fmt), name="signup_date").astype(object)
+    s[rng.random(rows) < 0.05] = None
+    return s
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def run(rows=5_000_000):
+    print(f"[BENCH] {rows:,} rows")
+    print("| layout | distinct | per-value s (extrapolated) | infer s | parse s | future check s |")
+    print("|--------|----------|----------------------------|---------|---------|----------------|")
+    for name, fmt in LAYOUTS.items():
+        s = make_column(rows, fmt)
+        slow_rows = min(rows, SLOW_ROWS)
+        _, slow = timed(lambda: pd.to_datetime(s[:slow_rows], format="mixed", errors="coerce", cache=False))
+        inferred, inf = timed(lambda: infer_date_format(s))
+        assert inferred == fmt, (inferred, fmt)
+        parsed, p = timed(lambda: parse_dates(s))
+        _, fut = timed(lambda: future_date_mask(s, parsed))
+        print(f"| {name} | {s.nunique():,} | {slow * rows / slow_rows:.1f} | {inf:.3f} | {p:.2f} | {fut:.2f} |")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
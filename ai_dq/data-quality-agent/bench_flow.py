@@ -0,0 +1,142 @@
+# bench_flow.py
+# End-to-end latency of the agent flow against mock_ollama.py instead of a
+# live Ollama: run_tests.run_flow and the full main.main() (approval answered
+# "y", plan cache off so every run plans), RUNS times each, with p50/p95 per
+# stage and in total. The mock answers instantly by default, so "own code"
+# (total minus LLM time) is what regressions show up in; pass a latency and
+# token rate to model a real server. Runs happen in a scratch copy of data/,
+# docs/ and memory_store/ so the repo's files are left alone.
+# Usage: python bench_flow.py [runs] [latency_s] [tokens_per_s]
+import io
+import os
+import sys
+import time
+import shutil
+import socket
+import builtins
+import tempfile
+import contextlib
+from collections import defaultdict
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COPY = ("data", "docs", "memory_store")
+SKIP = ("snapshots", "sketches")            # generated stores are not copied
+
+FLOW_STAGES = ("load_data", "analyze_data", "planner_agent", "get_combined_rag_text", "reasoner_agent",
+               "critic_validate_plan")
+MAIN_STAGES = ("backup_csv", "load_data", "analyze_data_state", "analyze_data", "sketch_frame", "planner_agent",
+               "reasoner_agent", "critic_validate_plan", "apply_fixes", "write_output", "evaluate_improvement",
+               "critic_validate_results")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _scratch():
+    d = tempfile.mkdtemp(prefix="bench_flow_")
+    for name in COPY:
+        shutil.copytree(os.path.join(HERE, name), os.path.join(d, name), ignore=shutil.ignore_patterns(*SKIP))
+    return d
+
+
+class StageTimer:
+    # wraps module attributes so each call adds its time to the current run
+    def __init__(self):
+        self.runs = []
+        self.current = defaultdict(float)
+        self.originals = []
+
+    def wrap(self, module, name, stage=None):
+        fn = getattr(module, name)
+        self.originals.append((module, name, fn))
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.current[stage or name] += time.perf_counter() - t0
+        setattr(module, name, timed)
+
+    def unwrap(self):
+        for module, name, fn in reversed(self.originals):
+            setattr(module, name, fn)
+        self.originals = []
+
+    def run(self, fn):
+        self.current = defaultdict(float)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        self.current["total"] = time.perf_counter() - t0
+        self.current["own code"] = self.current["total"] - self.current["llm"]
+        self.runs.append(dict(self.current))
+
+    def report(self, title, stages):
+        print(f"\n[BENCH] {title}: {len(self.runs)} runs")
+        print("| stage | p50 ms | p95 ms |")
+        print("|-------|--------|--------|")
+        for stage in list(stages) + ["llm", "own code", "total"]:
+            values = [r[stage] for r in self.runs if stage in r]
+            if values:
+                p50, p95 = np.percentile(values, [50, 95]) * 1000
+                print(f"| {stage} | {p50:.1f} | {p95:.1f} |")
+
+
+def run(runs=50, latency=0.0, tokens_per_s=0.0):
+    from mock_ollama import serve_in_background
+    port = _free_port()
+    server = serve_in_background(port, responses_path=os.path.join(HERE, "data", "mock_llm_responses.json"),
+                                 latency=latency, tokens_per_s=tokens_per_s)
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{port}"
+    scratch = _scratch()
+    cwd, ask = os.getcwd(), builtins.input
+    os.chdir(scratch)
+    sys.path.insert(0, HERE)
+    try:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            import planner
+            import reasoner
+            import run_tests
+            import main
+        print(f"[BENCH] mock Ollama on port {port} (latency {latency}s, "
+              f"{tokens_per_s or 'unlimited'} tokens/s); imports took {time.perf_counter() - t0:.1f}s")
+
+        flow = StageTimer()
+        for module in (planner, reasoner):
+            flow.wrap(module, "llama_run", "llm")
+        for name in FLOW_STAGES:
+            flow.wrap(run_tests, name)
+        for _ in range(runs):
+            flow.run(run_tests.run_flow)
+        flow.unwrap()
+        flow.report("run_flow", FLOW_STAGES)
+
+        full = StageTimer()
+        for module in (planner, reasoner):
+            full.wrap(module, "llama_run", "llm")
+        for name in MAIN_STAGES:
+            if hasattr(main, name):
+                full.wrap(main, name)
+        main.find_cached_plan = lambda mem, signature: None
+        builtins.input = lambda prompt="": "y"
+        for _ in range(runs):
+            full.run(main.main)
+        full.unwrap()
+        full.report("main.main", MAIN_STAGES)
+    finally:
+        builtins.input = ask
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 50, float(args[1]) if len(args) > 1 else 0.0,
+        float(args[2]) if len(args) > 2 else 0.0)
@@ -0,0 +1,44 @@
+# bench_io.py
+# Load / write / projected-load timings for CSV vs Parquet vs Feather.
+# Usage: python bench_io.py [rows]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from data_io import load_table, save_table, iter_batches
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "name": rng.choice(["John Doe", "Jane Smith", "Bob Johnson", "Alice Williams"], rows),
+        "email": np.char.add(rng.integers(0, rows // 4 + 1, rows).astype(str), "@example.com"),
+        "phone": rng.choice(["123-456-7890", "345-678-9012", None], rows),
+        "signup_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "price": rng.normal(150, 50, rows).round(2),
+    })
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def run(rows=5_000_000):
+    df = make_frame(rows)
+    with tempfile.TemporaryDirectory() as d:
+        print(f"[BENCH] {rows:,} rows")
+        print("| format | write s | size MB | load s | load 2 cols s | stream s |")
+        print("|--------|---------|---------|--------|---------------|----------|")
+        for ext in (".csv", ".parquet", ".feather"):
+            path = os.path.join(d, "bench" + ext)
+            _, w = timed(lambda: save_table(df, path))
+            size = os.path.getsize(path) / 1e6
+            _, r = timed(lambda: load_table(path))
+            _, rp = timed(lambda: load_table(path, columns=["email", "price"]))
+            _, rs = timed(lambda: sum(len(b) for b in iter_batches(path, columns=["email", "price"])))
+            print(f"| {ext[1:]} | {w:.2f} | {size:.1f} | {r:.2f} | {rp:.2f} | {rs:.2f} |")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
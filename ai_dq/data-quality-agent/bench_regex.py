@@ -0,0 +1,74 @@
+# bench_regex.py
+# regex_clean on large string columns: per-value re.sub (the old executor
+# path), pandas str.replace and safe_regex (RE2 via pyarrow when the pattern
+# allows it), for common cleaning patterns. Per-value re.sub is timed on at
+# most SLOW_ROWS rows and extrapolated. The last row is a pattern that
+# backtracks catastrophically, stopped by the time budget.
+# Usage: python bench_regex.py [rows]
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+import safe_regex
+from safe_regex import compile_regex, RegexTimeout
+
+SLOW_ROWS = 1_000_000
+PATTERNS = [
+    ("phone", r"\D", ""),                           # keep digits
+    ("name", r"\s+", " "),                          # collapse whitespace
+    ("name", r"^\s+|\s+$", ""),                     # trim
+    ("name", r"[^\w\s]", ""),                       # drop punctuation
+    ("email", r"@(\w+)\.example\.com$", r"@\1.com"),   # rewrite a domain
+    ("email", r"(?<=\.)co$", "com"),                # lookbehind: Python engine
+]
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, 10 ** 7, rows).astype(str).astype(object)
+    phone = pd.Series(rng.integers(200, 999, rows)).astype(str).astype(object)
+    phone = "(" + phone + ") " + ids.astype(str)
+    first = np.array(["  Ana", "José ", "li  wei", "O'Brien", "Zoë-Marie", "bob!!"], dtype=object)
+    name = first[rng.integers(0, len(first), rows)] + "  " + ids
+    host = np.array(["mail.example.com", "corp.example.com", "example.co", "test.org"], dtype=object)
+    email = "user" + ids + "@" + host[rng.integers(0, len(host), rows)]
+    return pd.DataFrame({"phone": phone, "name": name, "email": email})
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def run(rows=10_000_000):
+    df = make_frame(rows)
+    print(f"[BENCH] {rows:,} rows")
+    print("| column | pattern | engine | per-value re.sub s (extrapolated) | pandas str.replace s | safe_regex s | same output |")
+    print("|--------|---------|--------|-----------------------------------|----------------------|--------------|-------------|")
+    for col, pattern, repl in PATTERNS:
+        values = df[col].to_numpy(dtype=object)
+        slow_rows = min(rows, SLOW_ROWS)
+        rx = re.compile(pattern)
+        expected, slow = timed(lambda: [rx.sub(repl, v) for v in values[:slow_rows]])
+        _, pd_s = timed(lambda: df[col].str.replace(pattern, repl, regex=True))
+        compiled = compile_regex(pattern, repl)
+        got, fast = timed(lambda: compiled.sub_values(values))
+        engine = "re2" if compiled.re2 else "python"
+        same = list(got[:slow_rows]) == expected
+        print(f"| {col} | `{pattern}` | {engine} | {slow * rows / slow_rows:.1f} | {pd_s:.1f} | {fast:.1f} | {same} |")
+    info = compile_regex.cache_info()
+    print(f"[BENCH] compile cache: {info.hits} hits, {info.misses} misses")
+
+    budget = 2.0
+    values = np.array(["a" * 30 + "!"] * 1000, dtype=object)
+    try:
+        _, secs = timed(lambda: compile_regex(r"(?=a)(a+)+$", "").sub_values(values, time.monotonic() + budget))
+        print(f"[BENCH] catastrophic pattern finished in {secs:.1f}s")
+    except RegexTimeout:
+        print(f"[BENCH] catastrophic pattern `(?=a)(a+)+$` stopped by the {budget:.0f}s budget")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
@@ -0,0 +1,74 @@
+# bench_snapshots.py
+# Backup cost: full-file copy (the old .bak) vs the snapshot store, for a
+# first snapshot, an unchanged file, a 1% append and a restore. The input,
+# the store and the copies all live in one temporary directory (inside
+# work_dir when given) that is removed afterwards.
+# Usage: python bench_snapshots.py [size_gb] [work_dir]
+import os
+import sys
+import time
+import base64
+import shutil
+import tempfile
+from shutil import copyfile
+from snapshots import SnapshotStore, _reflink
+
+BLOCK = 48 << 20
+
+
+def make_file(path, size):
+    # base64 text lines: incompressible and without repeated blocks
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            block = base64.encodebytes(os.urandom(min(BLOCK, size - written) * 3 // 4 + 3))
+            f.write(block)
+            written += len(block)
+    return os.path.getsize(path)
+
+
+def append(path, size):
+    with open(path, "ab") as f:
+        f.write(base64.encodebytes(os.urandom(size * 3 // 4 + 3)))
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def run(size_gb=10.0, work_dir=None):
+    d = tempfile.mkdtemp(prefix="bench_snap_", dir=work_dir)
+    try:
+        src = os.path.join(d, "input.csv")
+        size = make_file(src, int(size_gb * 2 ** 30))
+        clone = os.path.join(d, "probe")
+        print(f"[BENCH] {size / 2 ** 30:.1f} GB file in {d} (reflink supported: {_reflink(src, clone)})")
+        if os.path.exists(clone):
+            os.remove(clone)
+        store = SnapshotStore(root=os.path.join(d, "store"))
+
+        _, copy_s = timed(lambda: copyfile(src, src + ".bak"))
+        os.remove(src + ".bak")
+        rows = [("full copy (.bak)", copy_s, size)]
+        m1, s1 = timed(lambda: store.snapshot(src))
+        rows.append((f"snapshot, first ({store.list(src)[0]['method']})", s1, store.list(src)[0]["stored_bytes"]))
+        _, s2 = timed(lambda: store.snapshot(src))
+        rows.append(("snapshot, unchanged", s2, 0))
+        append(src, size // 100)
+        _, s3 = timed(lambda: store.snapshot(src))
+        rows.append(("snapshot, after 1% append", s3, store.list(src)[0]["stored_bytes"]))
+        _, r1 = timed(lambda: store.restore(m1))
+        rows.append(("restore first snapshot", r1, size))
+
+        print("| operation | seconds | bytes written |")
+        print("|-----------|---------|---------------|")
+        for name, secs, written in rows:
+            print(f"| {name} | {secs:.2f} | {written / 2 ** 20:,.0f} MB |")
+    finally:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 10.0, sys.argv[2] if len(sys.argv) > 2 else None)
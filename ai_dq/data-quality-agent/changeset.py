@@ -0,0 +1,156 @@
+# changeset.py
+# Cell-level change log as an alternative to rewriting the whole cleaned
+# file. A changeset is a Parquet table with one row per changed cell or
+# dropped row:
+#   row (source row number), column, op ("update" | "delete"),
+#   old, new (values as text), fix_id
+# The base file's size/mtime, the row count and the cleaned frame's dtypes
+# and column order are kept in the Parquet metadata, so apply_changeset can
+# materialize the cleaned file from the base on demand.
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from data_io import load_table, save_table, _file_key
+
+META_KEY = b"dq_changeset"
+
+
+def _as_text(values):
+    # None stays None; everything else as its str() (shortest round-trip repr for floats)
+    values = np.asarray(values, dtype=object)
+    out = np.full(len(values), None, dtype=object)
+    present = ~pd.isna(values)
+    out[present] = [str(v) for v in values[present]]
+    return out
+
+
+def _from_text(values, dtype):
+    # text values back into dtype (the cleaned frame's dtype of the column)
+    s = pd.Series(values, dtype=object)
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(s, format="ISO8601")
+    if dtype == "bool":
+        return s.map({"True": True, "False": False})
+    try:
+        if pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+            return pd.to_numeric(s)
+    except TypeError:
+        pass
+    return s
+
+
+def merge_changes(first, second, rows):
+    # changes of two successive apply_fixes runs (second ran on the output
+    # of first) as one set of positions in the original frame of rows rows
+    kept = np.ones(rows, dtype=bool)
+    kept[first["dropped"]] = False
+    kept_pos = np.flatnonzero(kept)
+    dropped = np.concatenate([first["dropped"], kept_pos[second["dropped"]]])
+    dropped_fixes = np.concatenate([first["dropped_fixes"], second["dropped_fixes"]])
+    order = np.argsort(dropped, kind="stable")
+    out = {"dropped": dropped[order], "dropped_fixes": dropped_fixes[order], "columns": {}, "column_fixes": {},
+           "skipped": list(first.get("skipped", [])) + list(second.get("skipped", []))}
+    gone = ~kept
+    gone[kept_pos[second["dropped"]]] = True
+    for col in set(first["columns"]) | set(second["columns"]):
+        pos = np.concatenate([first["columns"].get(col, np.empty(0, dtype=np.int64)),
+                              kept_pos[second["columns"].get(col, np.empty(0, dtype=np.int64))]])
+        fixes = np.concatenate([first["column_fixes"].get(col, np.empty(0, dtype=object)),
+                                second["column_fixes"].get(col, np.empty(0, dtype=object))])
+        frame = pd.DataFrame({"pos": pos, "fix": fixes})
+        frame = frame[~gone[frame["pos"].to_numpy()]]
+        grouped = frame.groupby("pos", sort=True)["fix"].agg(",".join)
+        out["columns"][col] = grouped.index.to_numpy(dtype=np.int64)
+        out["column_fixes"][col] = grouped.to_numpy(dtype=object)
+    return out
+
+
+def build_changeset(before_df, after_df, changes):
+    # before_df: the frame apply_fixes ran on, after_df: its result;
+    # changes: the dict apply_fixes filled in (positions in before_df)
+    kept = np.ones(len(before_df), dtype=bool)
+    kept[changes["dropped"]] = False
+    kept_pos = np.flatnonzero(kept)
+    parts = [pd.DataFrame({"row": np.asarray(changes["dropped"], dtype=np.int64), "column": None, "op": "delete",
+                           "old": None, "new": None, "fix_id": np.asarray(changes["dropped_fixes"], dtype=object)})]
+    for col, pos in changes["columns"].items():
+        pos = np.asarray(pos, dtype=np.int64)
+        old = _as_text(before_df[col].to_numpy(dtype=object)[pos])
+        new = _as_text(after_df[col].to_numpy(dtype=object)[np.searchsorted(kept_pos, pos)])
+        part = pd.DataFrame({"row": pos, "column": col, "op": "update", "old": old, "new": new,
+                             "fix_id": np.asarray(changes["column_fixes"][col], dtype=object)})
+        # merged retries can change a cell back to its original value
+        parts.append(part[part["old"].ne(part["new"]) & ~(part["old"].isna() & part["new"].isna())])
+    cs = pd.concat(parts, ignore_index=True)
+    cs = cs.astype({"row": "int64", "column": object, "op": object, "old": object, "new": object, "fix_id": object})
+    return cs.sort_values(["row", "column"], kind="stable", na_position="first").reset_index(drop=True)
+
+
+def write_changeset(path, before_df, after_df, changes, base_path):
+    # Parquet changeset for the fixes that turned base_path's data
+    # (before_df) into after_df; returns the number of entries
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    cs = build_changeset(before_df, after_df, changes)
+    table = pa.Table.from_pandas(cs, preserve_index=False, schema=pa.schema([
+        ("row", pa.int64()), ("column", pa.string()), ("op", pa.string()),
+        ("old", pa.string()), ("new", pa.string()), ("fix_id", pa.string())]))
+    meta = {"base": os.path.abspath(base_path), "base_file": _file_key(base_path), "rows": int(len(before_df)),
+            "columns": list(after_df.columns), "dtypes": {c: str(t) for c, t in after_df.dtypes.items()}}
+    table = table.replace_schema_metadata({META_KEY: json.dumps(meta).encode("utf-8")})
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+    return len(cs)
+
+
+def read_changeset(path):
+    import pyarrow.parquet as pq
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[META_KEY])
+    return table.to_pandas(), meta
+
+
+def apply_changeset(changeset_path, out_path, base_path=None):
+    # Materialize the cleaned file: load the base, apply the updates one
+    # column at a time, drop the deleted rows, write out_path.
+    cs, meta = read_changeset(changeset_path)
+    base_path = base_path or meta["base"]
+    if _file_key(base_path) != meta["base_file"]:
+        raise ValueError(f"{base_path} changed since the changeset was written")
+    df = load_table(base_path, typed=True)
+    if len(df) != meta["rows"]:
+        raise ValueError(f"{base_path} has {len(df)} rows, the changeset expects {meta['rows']}")
+    cols = {}
+    updates = cs[cs["op"] == "update"]
+    groups = dict(tuple(updates.groupby("column", sort=False)))
+    for col, dtype in meta["dtypes"].items():
+        if col not in groups and str(df[col].dtype) == dtype:
+            continue
+        s = df[col].astype(object)
+        if col in groups:
+            group = groups[col]
+            s.iloc[group["row"].to_numpy()] = _from_text(group["new"].to_numpy(dtype=object), dtype).to_numpy(dtype=object)
+        cols[col] = s if dtype == "object" else s.astype(dtype)
+    out = df.assign(**cols) if cols else df
+    deleted = cs.loc[cs["op"] == "delete", "row"].to_numpy()
+    if len(deleted):
+        keep = np.ones(len(out), dtype=bool)
+        keep[deleted] = False
+        out = out[keep]
+    save_table(out[meta["columns"]], out_path)
+    return out_path
+
+
+def summarize_changeset(path):
+    # entries per fix id and op, for review
+    cs, _ = read_changeset(path)
+    return {f"{fix} {op}": int(n) for (fix, op), n in cs.groupby(["fix_id", "op"]).size().items()}
+
+
+if __name__ == "__main__":
+    # python changeset.py <changeset.parquet> <out_path> [base_path]
+    apply_changeset(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    print(f"[INFO] Materialized {sys.argv[2]}")
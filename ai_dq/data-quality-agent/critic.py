@@ -86,18 +86,30 @@ def critic_validate_results(before_profile, after_profile, plan, dataset_name=No
     after_invalids = sum(after_profile.get("invalids", {}).values()) + after_profile.get("dup_rows", 0)
     improved = after_invalids < before_invalids
 
-    # Compliance checks: if RAG-P5 exists (no negative numbers), verify price negative eliminated
+    # Compliance checks use the per-row policy rule counts (rules.py) carried in the profiles
     notes = []
+    failed = []     # policies that failed, for targeted retries (retry_scheduler.py)
     compliance = True
+    before_viol = before_profile.get("policy_violations", {})
+    after_viol = after_profile.get("policy_violations", {})
     if KNOWN_POLICIES_LOWER.get("RAG-P5", "") in rag_text:
-        # check after_profile numeric negatives
-        # caller provides profiles only; let's inspect after_profile invalids as proxy
-        if after_profile.get("invalids", {}).get("price_negative_count", 0) > 0:
+        # no negative numbers left in any numeric field (falls back to the price proxy)
+        negatives = after_viol.get("RAG-P5", after_profile.get("invalids", {}).get("price_negative_count", 0))
+        if negatives > 0:
             compliance = False
-            notes.append("Negative price values remain while policy prohibits negatives.")
+            failed.append("RAG-P5")
+            notes.append(f"{negatives} negative numeric values remain while policy prohibits negatives.")
+    # every policy a fix was justified by must not end up with more violations
+    cited = {pr.get("policy_id") for fx in plan.get("proposed_fixes", []) for pr in fx.get("policy_refs", [])}
+    for pid in sorted(p for p in cited if p in before_viol and p in after_viol):
+        if after_viol[pid] > before_viol[pid]:
+            compliance = False
+            failed.append(pid)
+            notes.append(f"{pid} violations increased from {before_viol[pid]} to {after_viol[pid]}.")
 
     return {
         "accepted": improved and compliance,
         "notes": "Improved and compliant" if improved and compliance else "; ".join(notes) or "No improvement detected",
-        "confidence": 0.9 if improved and compliance else 0.2
+        "confidence": 0.9 if improved and compliance else 0.2,
+        "failed_policies": sorted(set(failed))
     }
@@ -0,0 +1,255 @@
+# data_io.py
+# Format-aware load/save helpers. The format is picked from the file extension:
+#   .csv (default), .parquet / .pq, .feather / .arrow (Arrow IPC)
+# pyarrow is only imported when a columnar file is actually used.
+import os
+import json
+import importlib.util
+import numpy as np
+import pandas as pd
+
+PARQUET_EXTS = {".parquet", ".pq"}
+FEATHER_EXTS = {".feather", ".arrow"}
+BATCH_ROWS = 1_000_000
+COMPRESSION = "zstd"
+# object columns with fewer distinct values than this share of rows are
+# written dictionary-encoded (categorical) in Feather output
+DICTIONARY_MAX_RATIO = 0.5
+# typed CSV loading: the inferred compact schema is cached next to the file
+SCHEMA_SUFFIX = ".schema.json"
+SCHEMA_VERSION = 2          # 2: int/date dtypes only where the column writes back unchanged
+ISO_DATETIME = r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?"
+INT_TYPES = ("int8", "int16", "int32", "int64")
+
+
+def file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PARQUET_EXTS:
+        return "parquet"
+    if ext in FEATHER_EXTS:
+        return "feather"
+    return "csv"
+
+
+def load_table(path, columns=None, typed=False, report=None):
+    # columns: optional projection, only these columns are read from disk
+    # typed: load CSV with the compact cached schema (see load_csv_typed)
+    fmt = file_format(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    if fmt == "feather":
+        return pd.read_feather(path, columns=columns)
+    if typed:
+        return load_csv_typed(path, columns=columns, report=report)
+    return pd.read_csv(path, usecols=columns)
+
+
+def _string_dtype():
+    return "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+
+
+def _smallest_int(lo, hi, nullable):
+    for name in INT_TYPES:
+        info = np.iinfo(name)
+        if info.min <= lo and hi <= info.max:
+            return name.capitalize() if nullable else name
+    return None
+
+
+def infer_compact_dtype(s):
+    # Compact dtype for a column as read_csv loaded it by default:
+    # smallest (nullable) int, ISO dates, category for low cardinality
+    # strings, Arrow-backed strings otherwise. None = keep as is.
+    values = s.dropna()
+    if not len(values):
+        return None
+    if pd.api.types.is_integer_dtype(s):
+        return _smallest_int(values.min(), values.max(), nullable=False)
+    if pd.api.types.is_float_dtype(s):
+        if (values % 1 == 0).all() and values.abs().max() < 2 ** 53:
+            return _smallest_int(values.min(), values.max(), nullable=True)
+        return None
+    if s.dtype != object:
+        return None
+    text = values.astype(str)
+    if text.str.fullmatch(ISO_DATETIME).all() and pd.to_datetime(text, format="ISO8601", errors="coerce").notna().all():
+        return "datetime64[ns]"
+    if values.nunique() / len(s) < DICTIONARY_MAX_RATIO:
+        return "category"
+    return _string_dtype()
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_schema_cache(path):
+    # cached {"dtypes", "default_bytes"} or None if missing/stale
+    try:
+        with open(path + SCHEMA_SUFFIX, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cache if cache.get("file") == _file_key(path) and cache.get("version") == SCHEMA_VERSION else None
+
+
+def write_schema_cache(path, dtypes, default_bytes):
+    cache = {"version": SCHEMA_VERSION, "file": _file_key(path), "dtypes": dtypes, "default_bytes": default_bytes}
+    with open(path + SCHEMA_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    return cache
+
+
+def _convert(s, dtype):
+    if dtype is None:
+        return s
+    if dtype == "datetime64[ns]":
+        return pd.to_datetime(s, format="ISO8601")
+    return s.astype(dtype)
+
+
+def _csv_text(s):
+    # the column as to_csv writes it, one string per row
+    return s.to_frame().to_csv(index=False, header=False, lineterminator="\n").split("\n")[:-1]
+
+
+def _lossless(path, raw, dtypes):
+    # Columns whose int/date dtype would change their text on save (2.0 -> 2,
+    # 2024-01-05T10:00 -> 2024-01-05 10:00:00). Those keep the default dtype,
+    # so a saved file only differs from the input where a fix changed it.
+    cols = [c for c, t in dtypes.items() if t == "datetime64[ns]" or (t or "").lower() in INT_TYPES]
+    if not cols:
+        return dtypes
+    text = pd.read_csv(path, usecols=cols, dtype=str)
+    lossy = {c for c in cols if _csv_text(_convert(raw[c], dtypes[c])) != _csv_text(text[c])}
+    return {c: (None if c in lossy else t) for c, t in dtypes.items()}
+
+
+def load_csv_typed(path, columns=None, report=None):
+    # First load: read with default dtypes, infer the compact schema and
+    # cache it beside the file. Later loads (same size/mtime) read straight
+    # into the cached dtypes. report (dict) gets default vs typed memory.
+    cache = read_schema_cache(path) or {"dtypes": {}, "default_bytes": {}}
+    names = list(columns) if columns is not None else list(pd.read_csv(path, nrows=0).columns)
+    missing = [c for c in names if c not in cache["dtypes"]]
+    if missing:
+        raw = pd.read_csv(path, usecols=names)
+        usage = raw.memory_usage(index=False, deep=True)
+        inferred = {}
+        for col in missing:
+            inferred[col] = infer_compact_dtype(raw[col])
+            cache["default_bytes"][col] = int(usage[col])
+        cache["dtypes"].update(_lossless(path, raw, inferred))
+        df = pd.DataFrame({c: _convert(raw[c], cache["dtypes"][c]) for c in names})
+        write_schema_cache(path, cache["dtypes"], cache["default_bytes"])
+    else:
+        dtypes = {c: cache["dtypes"][c] for c in names}
+        dates = [c for c, t in dtypes.items() if t == "datetime64[ns]"]
+        df = pd.read_csv(path, usecols=columns,
+                         dtype={c: t for c, t in dtypes.items() if t and c not in dates},
+                         parse_dates=dates or None, date_format="ISO8601" if dates else None)
+        df = df[names]
+    if report is not None:
+        before = sum(cache["default_bytes"][c] for c in names)
+        after = int(df.memory_usage(index=False, deep=True).sum())
+        report.update({"rows": int(len(df)), "columns": len(names), "default_bytes": int(before),
+                       "typed_bytes": after, "ratio": round(before / after, 2) if after else None,
+                       "dtypes": {c: str(df[c].dtype) for c in names}})
+    return df
+
+
+def memory_summary(report):
+    return (f"{report['rows']} rows x {report['columns']} cols: "
+            f"{report['default_bytes'] / 2 ** 20:.1f} MB default -> {report['typed_bytes'] / 2 ** 20:.1f} MB typed "
+            f"({report['ratio']}x smaller)")
+
+
+def iter_batches(path, columns=None, batch_rows=BATCH_ROWS):
+    # Stream the file as DataFrames of at most batch_rows rows
+    # (row groups for Parquet, record batches for Arrow IPC).
+    fmt = file_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "feather":
+        import pyarrow as pa
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=batch_rows):
+            yield chunk
+
+
+def _dictionary_encode(df):
+    out = {}
+    n = max(len(df), 1)
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object and s.nunique(dropna=True) / n < DICTIONARY_MAX_RATIO:
+            out[col] = s.astype("category")
+    return df.assign(**out) if out else df
+
+
+def save_table(df, path):
+    fmt = file_format(path)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False, compression=COMPRESSION, use_dictionary=True,
+                      row_group_size=BATCH_ROWS)
+    elif fmt == "feather":
+        _dictionary_encode(df).reset_index(drop=True).to_feather(
+            path, compression=COMPRESSION, chunksize=BATCH_ROWS)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+class TableWriter:
+    # Append DataFrame chunks to a CSV / Parquet / Feather file in one stream.
+    # Later chunks are cast to the schema of the first one.
+    def __init__(self, path):
+        self.path = path
+        self.fmt = file_format(path)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.fmt == "parquet":
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self.path, self._schema, compression=COMPRESSION,
+                                                    use_dictionary=True)
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+                    self._writer = pa.ipc.new_file(self.path, self._schema, options=options)
+            elif not table.schema.equals(self._schema):
+                table = table.cast(self._schema)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self.rows == 0 and self.fmt == "csv":
+            open(self.path, "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
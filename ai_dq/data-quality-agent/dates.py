@@ -0,0 +1,185 @@
+# dates.py
+# Date detection and parsing for the date policies (RAG-P6) and the
+# fix_future_dates action. A column's format is inferred once from a small
+# sample and cached, then each distinct value is parsed once with that
+# format (pyarrow strptime / pd.to_datetime(format=...)) instead of
+# per-value dateutil inference.
+import re
+import importlib.util
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+CANDIDATE_FORMATS = (
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y/%m/%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%m-%d-%Y", "%d.%m.%Y",
+    "%Y%m%d", "%d %b %Y", "%b %d %Y", "%d %B %Y", "%B %d, %Y",
+    "%d/%m/%Y %H:%M", "%m/%d/%Y %H:%M", "ISO8601",
+)
+SAMPLE_VALUES = 500
+UNIQUE_PROBE_ROWS = 50_000               # leading rows used to decide whether to parse distinct values only
+MIN_PARSE_RATE = 0.9                    # share of the sample a format must parse
+MAX_YEAR = pd.Timestamp.max.year        # later years do not fit datetime64[ns]
+ARROW_DIRECTIVES = re.compile(r"(%[YmdHMS]|[^%])+")   # numeric layouts parsed with pyarrow
+SEED = 0
+FORMAT_CACHE_SIZE = 1024                # cached (column, value shapes) keys, least recently used go first
+
+_FORMAT_CACHE = OrderedDict()           # (column, value shapes) -> format or None
+
+
+def _shape(value):
+    # "2024-01-05" -> "9999-99-99": values with the same shape share a format
+    return re.sub(r"[A-Za-z]+", "a", re.sub(r"\d", "9", value))
+
+
+def _sample(s, n=SAMPLE_VALUES, seed=SEED):
+    if len(s) > 4 * n:
+        # random positions instead of s.dropna() on the whole column
+        s = s.iloc[np.sort(np.random.default_rng(seed).integers(0, len(s), 4 * n))]
+    values = s.dropna()
+    if len(values) > n:
+        values = values.sample(n, random_state=seed)
+    return values.astype(str).str.strip()
+
+
+def _parse_rate(sample, fmt):
+    parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+    return (parsed.notna().to_numpy() | _far_future(sample, parsed)).mean()
+
+
+def infer_date_format(s, name=None):
+    # Best format for the column's non-null values, or None if no candidate
+    # parses at least MIN_PARSE_RATE of the sample. Cached per column name
+    # and value shapes, so re-checks of the same data skip inference; a
+    # cached format is still tried on the sample (same name and shapes can
+    # be another dataset: 13/01/2024 vs 01/13/2024) and re-inferred if it fails.
+    sample = _sample(s)
+    if not len(sample):
+        return None
+    key = (name if name is not None else s.name, frozenset(sample.map(_shape).value_counts().index[:5]))
+    if key in _FORMAT_CACHE:
+        _FORMAT_CACHE.move_to_end(key)
+        fmt = _FORMAT_CACHE[key]
+        if fmt is None or _parse_rate(sample, fmt) >= MIN_PARSE_RATE:
+            return fmt
+    best, best_rate = None, 0.0
+    for fmt in CANDIDATE_FORMATS:
+        rate = _parse_rate(sample, fmt)
+        if rate > best_rate:
+            best, best_rate = fmt, rate
+        if rate == 1.0:
+            break
+    fmt = best if best_rate >= MIN_PARSE_RATE else None
+    _FORMAT_CACHE[key] = fmt
+    if len(_FORMAT_CACHE) > FORMAT_CACHE_SIZE:
+        _FORMAT_CACHE.popitem(last=False)
+    return fmt
+
+
+def is_date_like(s, name=None):
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return True
+    if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+        return False
+    # cheap pre-check before trying formats: dates contain digits
+    probe = _sample(s, 20)
+    if not len(probe) or probe.str.contains(r"\d").mean() < MIN_PARSE_RATE:
+        return False
+    return infer_date_format(s, name) is not None
+
+
+def _parse_values(values, fmt):
+    # values: non-null strings. Numeric layouts go through pyarrow's
+    # vectorized strptime. It is lenient (31/02 rolls over to 02/03), so
+    # results on days 1-3, where a roll-over lands, are re-parsed by pandas.
+    out = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    rest = np.ones(len(values), dtype=bool)
+    if fmt not in (None, "ISO8601") and ARROW_DIRECTIVES.fullmatch(fmt) and importlib.util.find_spec("pyarrow"):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        try:
+            arr = pc.utf8_trim_whitespace(pa.array(values, type=pa.string()))
+            ts = pc.strptime(arr, format=fmt, unit="s", error_is_null=True)
+        except pa.ArrowException:
+            ts = None   # e.g. non-string objects in the column: pandas handles all
+        if ts is not None:
+            secs = ts.to_numpy(zero_copy_only=False)
+            safe = pc.fill_null(pc.greater(pc.day(ts), 3), False).to_numpy(zero_copy_only=False)
+            fits = safe & (secs >= np.datetime64(pd.Timestamp.min.ceil("s"))) & (secs <= np.datetime64(pd.Timestamp.max.floor("s")))
+            out[fits] = secs[fits].astype("datetime64[ns]")
+            rest = ~fits
+    if rest.any():
+        kw = {"format": "mixed"} if fmt is None else {"format": fmt}
+        text = pd.Series(values[rest]).astype(str).str.strip()
+        out[rest] = pd.to_datetime(text, errors="coerce", cache=False, **kw).to_numpy(dtype="datetime64[ns]")
+    return out
+
+
+def parse_dates(s, fmt=None):
+    # vectorized parse with the (cached) inferred format; unparseable -> NaT
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    fmt = fmt or infer_date_format(s)
+    # parse each distinct value once when values repeat (typical for dates);
+    # mostly-unique timestamps are parsed directly
+    head = s.iloc[:UNIQUE_PROBE_ROWS]
+    if head.nunique() > 0.5 * head.count() and not isinstance(s.dtype, pd.CategoricalDtype):
+        values = s.to_numpy(dtype=object, na_value=None)
+        present = pd.notna(values)
+        parsed = np.full(len(s), np.datetime64("NaT"), dtype="datetime64[ns]")
+        parsed[present] = _parse_values(values[present], fmt)
+        return pd.Series(parsed, index=s.index, name=s.name)
+    codes, uniques = pd.factorize(s)
+    parsed = _parse_values(np.asarray(uniques, dtype=object), fmt)
+    values = np.append(parsed, np.datetime64("NaT", "ns"))[codes]   # code -1 -> NaT
+    return pd.Series(values, index=s.index, name=s.name)
+
+
+def _far_future(s, parsed):
+    # values that failed to parse only because the year is past datetime64[ns]
+    failed = parsed.isna().to_numpy() & s.notna().to_numpy()
+    out = np.zeros(len(s), dtype=bool)
+    if failed.any():
+        years = s[failed].astype(str).str.extract(r"(\d{4})", expand=False).astype(float)
+        out[failed] = (years > MAX_YEAR).to_numpy()
+    return out
+
+
+def future_date_mask(s, parsed=None, cutoff=None):
+    # True where the date is after today (cutoff = start of tomorrow)
+    cutoff = cutoff if cutoff is not None else pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+    parsed = parse_dates(s) if parsed is None else parsed
+    mask = (parsed >= cutoff).to_numpy(dtype=bool, na_value=False)
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        mask |= _far_future(s, parsed)
+    return mask
+
+
+def fix_future_dates(s, strategy="null"):
+    # "null": future dates become missing; "clip": replaced by today, written
+    # in the column's own format so untouched values keep their text as is
+    mask = future_date_mask(s)
+    if not mask.any():
+        return s
+    out = s.copy()
+    if strategy == "clip":
+        today = pd.Timestamp.now().normalize()
+        if pd.api.types.is_datetime64_any_dtype(s):
+            out[mask] = today
+        else:
+            fmt = infer_date_format(s)
+            out = out.astype(object)
+            out[mask] = today.strftime("%Y-%m-%d" if fmt in (None, "ISO8601") else fmt)
+    else:
+        out = out.astype(object) if not pd.api.types.is_datetime64_any_dtype(s) else out
+        out[mask] = pd.NaT if pd.api.types.is_datetime64_any_dtype(s) else np.nan
+    return out
+
+
+def date_formats(df):
+    # {column: inferred format} for the date-like columns of df
+    out = {}
+    for col in df.columns:
+        if is_date_like(df[col], col):
+            out[col] = "datetime" if pd.api.types.is_datetime64_any_dtype(df[col]) else infer_date_format(df[col], col)
+    return out
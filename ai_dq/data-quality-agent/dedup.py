@@ -0,0 +1,137 @@
+# dedup.py
+# Hash-based duplicate detection that does not need the whole frame in memory.
+# Every row (or `subset` of columns) is reduced to a 128-bit hash; hashes are
+# spilled to disk partitioned by their top bits, and duplicates are then found
+# one partition at a time (keep-first, like pandas drop_duplicates).
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from data_io import iter_batches, TableWriter, BATCH_ROWS
+
+HASH_KEYS = ("0123456789123456", "dq-agent-dedup-2")  # 2 x 64-bit = 128-bit row hash
+PARTITION_BITS = 8                                    # 256 partition files
+RECORD = np.dtype([("h1", "<u8"), ("h2", "<u8"), ("row", "<i8")])
+
+
+def _hash_frame(frame, key):
+    # numeric columns hashed as float64 (+0.0 folds -0.0) so int/float chunks agree
+    norm = {}
+    for col in frame.columns:
+        s = frame[col]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            norm[col] = s.astype("float64") + 0.0
+    if norm:
+        frame = frame.assign(**norm)
+    return pd.util.hash_pandas_object(frame, index=False, hash_key=key).to_numpy()
+
+
+def row_hashes128(df, subset=None):
+    frame = df[list(subset)] if subset else df
+    return _hash_frame(frame, HASH_KEYS[0]), _hash_frame(frame, HASH_KEYS[1])
+
+
+def keep_first_mask(df, subset=None):
+    # In-memory variant: True for the first occurrence of every distinct row.
+    n = len(df)
+    mask = np.zeros(n, dtype=bool)
+    if n == 0:
+        return mask
+    h1, h2 = row_hashes128(df, subset)
+    keys = np.empty(n, dtype=[("h1", "<u8"), ("h2", "<u8")])
+    keys["h1"], keys["h2"] = h1, h2
+    _, first = np.unique(keys, return_index=True)
+    mask[first] = True
+    return mask
+
+
+class DiskDedup:
+    def __init__(self, subset=None, spill_dir=None, partition_bits=PARTITION_BITS):
+        self.subset = list(subset) if subset else None
+        self.partition_bits = partition_bits
+        # spill_dir only picks the volume; each engine gets its own subdirectory
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = tempfile.mkdtemp(prefix="dq_dedup_", dir=spill_dir)
+        self.rows = 0
+
+    def _part_path(self, p):
+        return os.path.join(self.spill_dir, f"part_{p:04x}.bin")
+
+    def add(self, df):
+        # Hash a chunk and append (h1, h2, global row number) to its partition file.
+        n = len(df)
+        if n == 0:
+            return
+        h1, h2 = row_hashes128(df, self.subset)
+        rec = np.empty(n, dtype=RECORD)
+        rec["h1"], rec["h2"] = h1, h2
+        rec["row"] = np.arange(self.rows, self.rows + n)
+        part = (h1 >> np.uint64(64 - self.partition_bits)).astype(np.int64)
+        order = np.argsort(part, kind="stable")
+        rec, part = rec[order], part[order]
+        bounds = np.flatnonzero(np.diff(part)) + 1
+        starts = np.concatenate(([0], bounds))
+        for start, chunk in zip(starts, np.split(rec, bounds)):
+            with open(self._part_path(int(part[start])), "ab") as f:
+                chunk.tofile(f)
+        self.rows += n
+
+    def _partitions(self):
+        for name in sorted(os.listdir(self.spill_dir)):
+            if name.startswith("part_"):
+                yield np.fromfile(os.path.join(self.spill_dir, name), dtype=RECORD)
+
+    def duplicate_count(self):
+        dups = 0
+        for rec in self._partitions():
+            keys = rec[["h1", "h2"]]
+            dups += len(rec) - len(np.unique(keys))
+        return int(dups)
+
+    def duplicate_rows(self):
+        # Sorted global row numbers of every non-first occurrence.
+        out = []
+        for rec in self._partitions():
+            rec = rec[np.lexsort((rec["row"], rec["h2"], rec["h1"]))]
+            same = (rec["h1"][1:] == rec["h1"][:-1]) & (rec["h2"][1:] == rec["h2"][:-1])
+            out.append(rec["row"][1:][same])
+        if not out:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(out))
+
+    def close(self):
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def count_duplicates_file(path, subset=None, spill_dir=None, batch_rows=BATCH_ROWS):
+    with DiskDedup(subset=subset, spill_dir=spill_dir) as dd:
+        for chunk in iter_batches(path, batch_rows=batch_rows):
+            dd.add(chunk)
+        return dd.duplicate_count()
+
+
+def dedup_file(in_path, out_path, subset=None, spill_dir=None, batch_rows=BATCH_ROWS):
+    # Two streaming passes: hash + partition, then copy rows that are not
+    # duplicates (keep-first). Returns the number of rows removed.
+    with DiskDedup(subset=subset, spill_dir=spill_dir) as dd:
+        for chunk in iter_batches(in_path, batch_rows=batch_rows):
+            dd.add(chunk)
+        dup_rows = dd.duplicate_rows()
+
+    offset = 0
+    with TableWriter(out_path) as writer:
+        for chunk in iter_batches(in_path, batch_rows=batch_rows):
+            lo, hi = np.searchsorted(dup_rows, [offset, offset + len(chunk)])
+            is_dup = np.zeros(len(chunk), dtype=bool)
+            is_dup[dup_rows[lo:hi] - offset] = True
+            writer.write(chunk[~is_dup])
+            offset += len(chunk)
+    return int(len(dup_rows))
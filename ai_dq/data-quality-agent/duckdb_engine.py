@@ -0,0 +1,321 @@
+# duckdb_engine.py
+# SQL-pushdown versions of analyze_data and apply_fixes for files bigger than
+# RAM. The profile and every fix are generated as SQL and run by an embedded
+# DuckDB directly against the CSV/Parquet file (parallel, spills to disk),
+# so nothing is loaded into pandas.
+import os
+import duckdb
+import pandas as pd
+from data_io import file_format
+from policies import POLICY_RULES
+from rules import resolve_columns
+from dates import is_date_like, infer_date_format
+from safe_regex import _re2_pattern, re2_translation
+from fix_executor import fix_id
+
+EMAIL_PREFIX_RE = r"^[^@]+@[^@]+\.[^@]+"   # same prefix match as str.match in analyze_data
+INT_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT"}
+FLOAT_TYPES = {"FLOAT", "DOUBLE", "REAL"}
+NUMERIC_PREFIXES = ("DECIMAL",)
+DATE_SAMPLE_ROWS = 2000     # rows per text column sampled to detect date columns and their format
+SOURCE_TABLE = "__dq_source"
+# CSV date text the typed loader parses: the forms to_csv writes back unchanged
+CSV_DATE_TEXT = r"\d{4}-\d{2}-\d{2}"
+CSV_DATETIME_TEXT = r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}"
+
+
+def quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def source_sql(path, columns=None):
+    if columns is not None:
+        return f"(SELECT {', '.join(quote_ident(c) for c in columns)} FROM {source_sql(path)})"
+    fmt = file_format(path)
+    if fmt == "parquet":
+        return f"read_parquet({quote_literal(path)})"
+    if fmt == "csv":
+        return f"read_csv_auto({quote_literal(path)})"
+    raise ValueError(f"DuckDB engine supports CSV and Parquet, not '{path}'")
+
+
+def connect(memory_limit=None, temp_dir=None, threads=None):
+    con = duckdb.connect()
+    if memory_limit:
+        con.execute(f"SET memory_limit = {quote_literal(memory_limit)}")
+    if temp_dir:
+        con.execute(f"SET temp_directory = {quote_literal(temp_dir)}")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    return con
+
+
+def describe(con, path):
+    # pandas stores a non-default index as __index_level_N__; read_parquet
+    # turns it back into the index, so it is not a data column here either
+    rows = con.execute(f"DESCRIBE SELECT * FROM {source_sql(path)}").fetchall()
+    return [(r[0], r[1]) for r in rows if not r[0].startswith("__index_level_")]
+
+
+def _is_numeric(sql_type):
+    return sql_type in INT_TYPES or sql_type in FLOAT_TYPES or sql_type.startswith(NUMERIC_PREFIXES)
+
+
+def _pandas_dtype(sql_type, has_nulls, date_fmt, fmt):
+    # what load_data would have reported for the column; date_fmt is its
+    # date_formats entry ("datetime" once parsed). The typed CSV loader keeps
+    # integers with nulls as nullable ints, read_parquet makes them floats.
+    if sql_type in INT_TYPES:
+        return ("Int64" if fmt == "csv" else "float64") if has_nulls else "int64"
+    if sql_type in FLOAT_TYPES or sql_type.startswith(NUMERIC_PREFIXES):
+        return "float64"
+    if sql_type == "BOOLEAN":
+        return "object" if has_nulls else "bool"
+    if date_fmt == "datetime":
+        return "datetime64[ns]"
+    return "object"
+
+
+def date_formats_sql(con, path, cols):
+    # dates.date_formats as load_data sees the file: Parquet DATE/TIMESTAMP
+    # columns and CSV columns the typed loader parses (data_io._lossless) are
+    # "datetime"; other text columns get the format of a sample
+    csv = file_format(path) == "csv"
+    text_src = f"read_csv_auto({quote_literal(path)}, all_varchar = true)" if csv else source_sql(path)
+    out = {}
+    for c, t in cols:
+        q = quote_ident(c)
+        typed = t.startswith(("DATE", "TIMESTAMP"))
+        if typed and not csv:
+            out[c] = "datetime"
+            continue
+        if typed:
+            # DuckDB's sniffer types more date text than the typed loader:
+            # that parses only dates, or date-times not all at midnight
+            # (to_csv writes those as dates), in to_csv's own layout
+            not_date, not_datetime, timed = con.execute(
+                f"SELECT count(*) FILTER (WHERE NOT regexp_full_match({q}, {quote_literal(CSV_DATE_TEXT)})), "
+                f"count(*) FILTER (WHERE NOT regexp_full_match({q}, {quote_literal(CSV_DATETIME_TEXT)})), "
+                f"count(*) FILTER (WHERE NOT ends_with({q}, ' 00:00:00')) "
+                f"FROM {text_src} WHERE {q} IS NOT NULL").fetchone()
+            if not not_date or (not not_datetime and timed):
+                out[c] = "datetime"
+                continue
+        if typed or t == "VARCHAR":
+            rows = con.execute(f"SELECT {q} FROM {text_src} "
+                               f"USING SAMPLE reservoir({DATE_SAMPLE_ROWS} ROWS) REPEATABLE (0)").fetchall()
+            s = pd.Series([r[0] for r in rows], name=c, dtype=object)
+            if is_date_like(s, c):
+                out[c] = infer_date_format(s, c)
+    return out
+
+
+def _rule_filter(rule, col, sql_type, date_fmt, cutoff):
+    # SQL condition true where the value of col breaks rule
+    q = quote_ident(col)
+    check = rule["check"]
+    if check == "not_null":
+        return f"{q} IS NULL"
+    if check == "pattern":
+        translated = _re2_pattern(rule["pattern"])
+        if translated is None:
+            return None
+        return f"({q} IS NOT NULL AND NOT regexp_full_match(CAST({q} AS VARCHAR), {quote_literal(translated[0])}))"
+    if check == "non_negative":
+        return f"{q} < 0"
+    if check == "not_future":
+        if sql_type.startswith(("DATE", "TIMESTAMP")):
+            ts = f"CAST({q} AS TIMESTAMP)"
+        elif date_fmt == "ISO8601":
+            ts = f"TRY_CAST(trim({q}) AS TIMESTAMP)"
+        else:
+            ts = f"try_strptime(trim({q}), {quote_literal(date_fmt)})"
+        return f"{ts} >= TIMESTAMP {quote_literal(str(cutoff))}"
+    return None
+
+
+def policy_violations_sql(con, path, cols, date_fmts, rows):
+    # rules.evaluate_rules counts (violating rows per policy) without loading
+    # the file: one aggregate scan, plus a DISTINCT scan per "unique" rule
+    types = dict(cols)
+    cutoff = pd.Timestamp.now().normalize() + pd.Timedelta(days=1)   # start of tomorrow
+    aggs, pids, counts = [], [], {}
+    for pid, rule in POLICY_RULES.items():
+        picked = resolve_columns(rule, types)
+        if rule.get("dtype") == "numeric":
+            picked = [c for c in picked if _is_numeric(types[c])]
+        elif rule.get("dtype") == "date":
+            picked = [c for c in picked if c in date_fmts]
+        if not picked:
+            continue
+        if rule["check"] == "unique":
+            part = ", ".join(quote_ident(c) for c in picked)
+            groups = con.execute(f"SELECT count(*) FROM (SELECT DISTINCT {part} FROM {source_sql(path)})").fetchone()[0]
+            counts[pid] = int(rows - groups)
+            continue
+        conds = [f for f in (_rule_filter(rule, c, types[c], date_fmts.get(c), cutoff) for c in picked) if f]
+        if conds:
+            aggs.append(f"count(*) FILTER (WHERE {' OR '.join(conds)})")
+            pids.append(pid)
+    if aggs:
+        row = con.execute(f"SELECT {', '.join(aggs)} FROM {source_sql(path)}").fetchone()
+        counts.update({pid: int(v) for pid, v in zip(pids, row)})
+    return {pid: counts[pid] for pid in POLICY_RULES if pid in counts}
+
+
+def analyze_file_sql(path, con=None):
+    # Same keys as analyze_data: num_rows, schema, null_counts, null_percent,
+    # dup_rows, invalids, policy_violations, date_formats (near_dup_rows, an
+    # opt-in of the pandas engine, is not computed here). One aggregate scan
+    # and one DISTINCT scan, plus the policy checks (policy_violations_sql).
+    con = con or connect()
+    cols = describe(con, path)
+    src = source_sql(path, [c for c, _ in cols])
+    aggs = ["count(*)"] + [f"count(*) - count({quote_ident(c)})" for c, _ in cols]
+    names = [c for c, _ in cols]
+    if "email" in names:
+        aggs.append(f"count(*) FILTER (WHERE email IS NULL OR NOT regexp_matches(CAST(email AS VARCHAR), {quote_literal(EMAIL_PREFIX_RE)}))")
+    if "price" in names:
+        aggs.append("count(*) FILTER (WHERE TRY_CAST(price AS DOUBLE) < 0)")
+    row = con.execute(f"SELECT {', '.join(aggs)} FROM {src}").fetchone()
+    rows = int(row[0])
+    nulls = {c: int(v) for (c, _), v in zip(cols, row[1:1 + len(cols)])}
+    extra = list(row[1 + len(cols):])
+    distinct = con.execute(f"SELECT count(*) FROM (SELECT DISTINCT * FROM {src})").fetchone()[0]
+
+    profile = {}
+    profile["num_rows"] = rows
+    profile["date_formats"] = date_formats_sql(con, path, cols)
+    profile["schema"] = {c: _pandas_dtype(t, nulls[c] > 0, profile["date_formats"].get(c), file_format(path)) for c, t in cols}
+    profile["null_counts"] = nulls
+    profile["null_percent"] = {c: float(n / rows) if rows else float("nan") for c, n in nulls.items()}
+    profile["dup_rows"] = int(rows - distinct)
+    invalids = {}
+    if "email" in names:
+        invalids["email_invalid_count"] = int(extra.pop(0))
+    if "price" in names:
+        invalids["price_negative_count"] = int(extra.pop(0))
+    profile["invalids"] = invalids
+    profile["policy_violations"] = policy_violations_sql(con, path, cols, profile["date_formats"], rows)
+    return profile
+
+
+def numbered_source(con, path, columns):
+    # the file's columns plus __rn, the row's position in the file
+    cols = ", ".join(quote_ident(c) for c in columns)
+    if file_format(path) == "parquet":
+        return f"(SELECT {cols}, file_row_number AS __rn FROM read_parquet({quote_literal(path)}, file_row_number = true))"
+    # read_csv has no row number column: load the file into a temp table
+    # (insertion order is kept) and number rows by rowid
+    con.execute(f"CREATE OR REPLACE TEMP TABLE {SOURCE_TABLE} AS SELECT * FROM {source_sql(path)}")
+    return f"(SELECT {cols}, rowid AS __rn FROM {SOURCE_TABLE})"
+
+
+def fixes_sql(source, actions, types, skipped=None):
+    # Chain one CTE per action on top of source (numbered_source); __rn keeps
+    # the file's row order so drop_duplicates keeps the first occurrence like pandas.
+    # skipped: list the ids of fixes left out (regex without an RE2 form) are added to
+    types = dict(types)
+    ctes = [f"s0 AS (SELECT * FROM {source})"]
+
+    def step(select):
+        ctes.append(f"s{len(ctes)} AS ({select})")
+
+    for n, action in enumerate(actions):
+        # the CTE this action reads; literals are spliced in as they are,
+        # so nothing may run str.format over the SQL afterwards
+        prev = f"s{len(ctes) - 1}"
+        act = action.get("action")
+        params = action.get("params", {}) or {}
+        if act == "drop_duplicates":
+            subset = params.get("subset")
+            if subset:
+                subset = [c for c in subset if c in types]
+                if not subset:
+                    continue
+            part = ", ".join(quote_ident(c) for c in (subset or list(types)))
+            step(f"SELECT * FROM {prev} QUALIFY row_number() OVER (PARTITION BY {part} ORDER BY __rn) = 1")
+            continue
+        col = params.get("column", "email" if act == "normalize_email" else None)
+        if col not in types:
+            continue
+        q = quote_ident(col)
+        text = q if types[col] == "VARCHAR" else f"CAST({q} AS VARCHAR)"
+        if act == "impute_nulls":
+            strategy = params.get("strategy", "constant")
+            if strategy in ("mean", "median") and _is_numeric(types[col]):
+                agg = "avg" if strategy == "mean" else "median"
+                expr = f"coalesce({q}, (SELECT {agg}({q}) FROM {prev}))"
+            else:
+                value = params.get("value", "")
+                if isinstance(value, str) and types[col] != "VARCHAR":
+                    expr, types[col] = f"coalesce({text}, {quote_literal(value)})", "VARCHAR"
+                else:
+                    expr = f"coalesce({q}, {quote_literal(value)})"
+        elif act == "normalize_email":
+            expr, types[col] = f"lower(trim({text}))", "VARCHAR"
+        elif act == "regex_clean":
+            if not params.get("pattern"):
+                continue
+            # DuckDB runs RE2: the pattern and replacement are translated like
+            # safe_regex does; lookarounds, backreferences, \b ... have no RE2 form
+            translated = re2_translation(params["pattern"], params.get("repl", ""))
+            if translated is None:
+                print(f"[WARN] regex_clean {params['pattern']!r} on '{col}' skipped: no RE2 equivalent for DuckDB")
+                if skipped is not None:
+                    skipped.append(fix_id(action, n))
+                continue
+            expr = f"regexp_replace({text}, {quote_literal(translated[0])}, {quote_literal(translated[1])}, 'g')"
+            types[col] = "VARCHAR"
+        elif act == "remove_negative_values":
+            if not _is_numeric(types[col]):
+                continue
+            expr = f"CASE WHEN {q} < 0 THEN NULL ELSE {q} END"
+        elif act == "fix_future_dates":
+            # typed DATE/TIMESTAMP columns, or text that casts as ISO dates
+            typed = types[col].startswith(("DATE", "TIMESTAMP"))
+            ts = q if typed else f"TRY_CAST({text} AS TIMESTAMP)"
+            future = f"{ts} >= CAST(current_date + INTERVAL 1 DAY AS TIMESTAMP)"
+            if params.get("strategy") == "clip":
+                today = "current_date" if typed else "strftime(current_date, '%Y-%m-%d')"
+                expr = f"CASE WHEN {future} THEN {today} ELSE {q} END"
+            else:
+                expr = f"CASE WHEN {future} THEN NULL ELSE {q} END"
+        else:
+            continue
+        step(f"SELECT * REPLACE ({expr} AS {q}) FROM {prev}")
+
+    last = f"s{len(ctes) - 1}"
+    return f"WITH {', '.join(ctes)} SELECT * EXCLUDE (__rn) FROM {last} ORDER BY __rn"
+
+
+def apply_fixes_sql(in_path, out_path, actions, con=None, changes=None):
+    # Runs the generated query and streams the result straight to out_path.
+    # changes (dict): gets "skipped", the ids of fixes left out (see fixes_sql)
+    con = con or connect()
+    types = describe(con, in_path)
+    skipped = []
+    query = fixes_sql(numbered_source(con, in_path, [c for c, _ in types]), actions, types, skipped)
+    if changes is not None:
+        changes["skipped"] = skipped
+    if file_format(out_path) == "parquet":
+        options = "FORMAT PARQUET, COMPRESSION ZSTD"
+    elif file_format(out_path) == "csv":
+        options = "FORMAT CSV, HEADER"
+    else:
+        raise ValueError(f"DuckDB engine writes CSV or Parquet, not '{out_path}'")
+    tmp_path = out_path + ".tmp"
+    con.execute(f"COPY ({query}) TO {quote_literal(tmp_path)} ({options})")
+    con.execute(f"DROP TABLE IF EXISTS {SOURCE_TABLE}")
+    os.replace(tmp_path, out_path)
+    return out_path
@@ -0,0 +1,260 @@
+# fix_executor.py
+# Copy-free executor behind tools.apply_fixes.
+# - the input frame is never modified or copied: a column is replaced only
+#   when a fix touches it, untouched columns share memory with the input
+# - consecutive string fixes (normalize_email, regex_clean) on a column are
+#   fused into one pass over its non-null values; missing values stay missing
+#   and string dtypes (data_io.load_csv_typed) are kept. regex_clean
+#   runs column-wide through safe_regex (RE2 when the pattern allows it,
+#   otherwise Python's re under a per-column time budget). A fix whose
+#   regex runs out of the budget is skipped and reported in changes["skipped"]
+# - row filters (drop_duplicates, drop_near_duplicates) only update a keep
+#   mask, and rows are dropped once when the result is assembled
+import time
+import numpy as np
+import pandas as pd
+from dedup import keep_first_mask
+from near_dup import near_duplicate_keep_mask, text_columns
+from dates import fix_future_dates
+from safe_regex import compile_regex, RegexTimeout, TIME_BUDGET
+
+STRING_FIXES = {"normalize_email", "regex_clean"}
+ROW_FIXES = {"drop_duplicates", "drop_near_duplicates"}
+
+
+class _StringOp:
+    # a plain object rather than a lambda so plans can be sent to worker
+    # processes (parallel_fixes.py)
+    def __init__(self, act, params):
+        self.regex = None if act == "normalize_email" else compile_regex(params.get("pattern"), params.get("repl", ""))
+
+    def __call__(self, s):
+        if self.regex is None:
+            return s.strip().lower()
+        return self.regex(s)
+
+
+def _string_op(act, params):
+    return _StringOp(act, params)
+
+
+def _fix_column(act, params):
+    if act == "normalize_email":
+        return params.get("column", "email")
+    return params.get("column")
+
+
+def fix_id(action, n):
+    # the action's "id", or "<action>#<position>" without one
+    return str(action.get("id") or f"{action.get('action')}#{n}")
+
+
+def plan_fixes(df, actions):
+    # Turn the action list into steps:
+    #   ("string", col, [ops], [fix ids])      fused string pass
+    #   ("column", col, act, params, fix id)   other single-column fix
+    #   ("rows", act, params, fix id)          row filter
+    # String ops are queued per column and flushed right before anything
+    # else that reads that column, so fusing never reorders dependent fixes.
+    # Steps carry fix ids (fix_id).
+    steps = []
+    pending = {}
+
+    def flush(cols):
+        for col in [c for c in pending if c in cols]:
+            ops = pending.pop(col)
+            steps.append(("string", col, [op for op, _ in ops], [i for _, i in ops]))
+
+    for n, action in enumerate(actions):
+        act = action.get("action")
+        params = action.get("params", {}) or {}
+        if act in STRING_FIXES:
+            col = _fix_column(act, params)
+            if col not in df.columns or (act == "regex_clean" and not params.get("pattern")):
+                continue
+            pending.setdefault(col, []).append((_string_op(act, params), fix_id(action, n)))
+        elif act in ROW_FIXES:
+            subset = params.get("subset")
+            if subset:
+                subset = [c for c in subset if c in df.columns]
+                if not subset and act == "drop_duplicates":
+                    continue
+            if act == "drop_near_duplicates" and not text_columns(df, subset):
+                continue    # near-duplicates are judged on text only
+            flush(subset or list(df.columns))
+            steps.append(("rows", act, dict(params, subset=subset or None), fix_id(action, n)))
+        elif act in ("impute_nulls", "remove_negative_values", "fix_future_dates"):
+            col = params.get("column")
+            if col not in df.columns:
+                continue
+            flush([col])
+            steps.append(("column", col, act, params, fix_id(action, n)))
+        # unknown action - ignore
+    flush(list(pending))
+    return steps
+
+
+def _fused_string_pass(s, ops, fix_ids, skipped):
+    # skipped: list the ids of fixes dropped for the regex budget are added to
+    values = s.to_numpy(dtype=object)
+    present = ~pd.isna(values)
+    out = values.copy()
+    res = np.array([str(v) for v in values[present]], dtype=object)
+    deadline = time.monotonic() + TIME_BUDGET
+    for op, fid in zip(ops, fix_ids):
+        if op.regex is None:
+            res = np.array([op(v) for v in res], dtype=object)
+            continue
+        try:
+            res = op.regex.sub_values(res, deadline)
+        except RegexTimeout:
+            # over the column's budget: this fix is skipped, the column keeps its values
+            print(f"[WARN] regex_clean {op.regex.pattern!r} on '{s.name}' skipped: the column's {TIME_BUDGET:.0f}s regex budget is used up")
+            skipped.append(fid)
+    out[present] = res
+    out = pd.Series(out, index=s.index, name=s.name)
+    return out.astype(s.dtype) if pd.api.types.is_string_dtype(s.dtype) and s.dtype != object else out
+
+
+def _fill(s, value):
+    # compact typed columns (data_io.load_csv_typed) may need room for value
+    if isinstance(s.dtype, pd.CategoricalDtype) and not pd.isna(value) and value not in s.cat.categories:
+        s = s.cat.add_categories([value])
+    try:
+        return s.fillna(value)
+    except (TypeError, ValueError):
+        return s.astype("Float64" if isinstance(value, float) else object).fillna(value)
+
+
+def _changed(old, new):
+    # NA-safe: missing on both sides is unchanged, values are compared only
+    # where both are present (pd.NA in nullable/string dtypes has no truth value)
+    if all(isinstance(s.dtype, np.dtype) and s.dtype != object for s in (old, new)):
+        a, b = old.to_numpy(), new.to_numpy()
+    else:
+        a, b = old.to_numpy(dtype=object), new.to_numpy(dtype=object)
+    na_a, na_b = pd.isna(a), pd.isna(b)
+    out = na_a != na_b
+    both = ~(na_a | na_b)
+    out[both] = a[both] != b[both]
+    return out
+
+
+def _credit(owners, pos, fix_id):
+    # "FX1", then "FX1,FX3" when a later fix changes the same cell again
+    cur = owners[pos]
+    out = np.full(len(pos), fix_id, dtype=object)
+    seen = ~pd.isna(cur)
+    out[seen] = cur[seen] + ("," + fix_id)
+    owners[pos] = out
+
+
+class PlanRun:
+    # State of one plan execution: replaced columns, surviving rows and, when
+    # changes are tracked, the fix responsible for every changed cell and
+    # dropped row. parallel_fixes.py drives the same state from a pool.
+    def __init__(self, df, track=False):
+        self.df = df
+        self.cols = {}      # column -> replacement Series
+        self.keep = None    # surviving rows (None = all)
+        self.owners = {} if track else None    # column -> fix ids per row
+        self.dropped_by = np.full(len(df), None, dtype=object) if track else None
+        self.skipped = []   # fix ids skipped for the regex time budget
+
+    def current(self, col):
+        return self.cols[col] if col in self.cols else self.df[col]
+
+    def alive(self, col):
+        s = self.current(col)
+        return s if self.keep is None else s[self.keep]
+
+    def alive_positions(self):
+        return np.arange(len(self.df)) if self.keep is None else np.flatnonzero(self.keep)
+
+    def credit(self, col, pos, fix_id):
+        if self.owners is not None:
+            _credit(self.owners.setdefault(col, np.full(len(self.df), None, dtype=object)), pos, fix_id)
+
+    def replace(self, col, new, fix_id):
+        if self.owners is not None:
+            self.credit(col, np.flatnonzero(_changed(self.current(col), new)), fix_id)
+        self.cols[col] = new
+
+    def drop(self, m, fix_id):
+        # m: keep mask over the currently surviving rows
+        if self.dropped_by is not None:
+            self.dropped_by[self.alive_positions()[~m]] = fix_id
+        if self.keep is None:
+            self.keep = m
+        else:
+            self.keep = self.keep.copy()
+            self.keep[self.keep] = m
+
+    def run(self, step):
+        kind = step[0]
+        if kind == "string":
+            _, col, ops, fix_ids = step
+            skipped = []
+            new = _fused_string_pass(self.current(col), ops, fix_ids, skipped)
+            self.skipped += skipped
+            self.replace(col, new, ",".join(i for i in fix_ids if i not in skipped))
+
+        elif kind == "column":
+            _, col, act, params, fix_id = step
+            s = self.current(col)
+            if act == "impute_nulls":
+                strategy = params.get("strategy", "constant")
+                if strategy == "mean" and pd.api.types.is_numeric_dtype(s):
+                    self.replace(col, _fill(s, self.alive(col).mean()), fix_id)
+                elif strategy == "median" and pd.api.types.is_numeric_dtype(s):
+                    self.replace(col, _fill(s, self.alive(col).median()), fix_id)
+                else:
+                    self.replace(col, _fill(s, params.get("value", "")), fix_id)
+            elif act == "remove_negative_values":
+                if pd.api.types.is_numeric_dtype(s):
+                    self.replace(col, s.mask(s < 0), fix_id)  # Null out invalid negatives
+            elif act == "fix_future_dates":
+                self.replace(col, fix_future_dates(s, params.get("strategy", "null")), fix_id)
+
+        elif kind == "rows":
+            _, act, params, fix_id = step
+            names = params["subset"] or list(self.df.columns)
+            frame = pd.DataFrame({c: self.alive(c) for c in names}, copy=False)
+            if act == "drop_duplicates":
+                m = keep_first_mask(frame)
+            else:
+                threshold = float(params.get("threshold", 0.8))
+                m = near_duplicate_keep_mask(frame, params["subset"], threshold)
+            self.drop(m, fix_id)
+
+    def result(self, changes=None):
+        df, keep = self.df, self.keep
+        if changes is not None:
+            changes["skipped"] = list(self.skipped)
+            changes["dropped"] = np.flatnonzero(~keep) if keep is not None else np.empty(0, dtype=np.int64)
+            changes["dropped_fixes"] = self.dropped_by[changes["dropped"]]
+            changes["columns"] = {}
+            changes["column_fixes"] = {}
+            for col, new in self.cols.items():
+                diff = _changed(df[col], new)
+                if keep is not None:
+                    diff &= keep
+                changes["columns"][col] = np.flatnonzero(diff)
+                changes["column_fixes"][col] = self.owners[col][changes["columns"][col]]
+
+        out = pd.DataFrame({c: self.current(c) for c in df.columns}, copy=False)
+        if keep is not None:
+            out = out[keep]
+        return out
+
+
+def execute_plan(df, steps, changes=None):
+    # changes: optional dict filled with what the fixes touched, as positions
+    # in df: {"dropped": [...], "columns": {col: [changed rows]}}, plus the
+    # ids of the fixes responsible, aligned with those positions:
+    # {"dropped_fixes": [...], "column_fixes": {col: [...]}}, and "skipped":
+    # the fix ids not applied (regex time budget used up)
+    run = PlanRun(df, track=changes is not None)
+    for step in steps:
+        run.run(step)
+    return run.result(changes)
@@ -0,0 +1,203 @@
+# incremental.py
+# Incremental mode for append-only CSV inputs. A checkpoint beside the input
+# records how far it was processed (byte offset after the last complete
+# line, row count), the fix actions of the last full run, the mergeable
+# ProfileState and the row-hash sets used to de-duplicate against rows
+# already written. Later runs parse only the bytes after the offset, profile
+# and fix those rows and append them to the cleaned output, so a run costs
+# time proportional to what was appended.
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+from data_io import file_format
+from profiler import ProfileState, row_hashes
+from tools import apply_fixes
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+HASHES_SUFFIX = ".checkpoint.npz"      # ProfileState row hashes + dedup hash sets
+TAIL_BLOCK = 1 << 16
+
+
+def checkpoint_path(path):
+    return path + CHECKPOINT_SUFFIX
+
+
+def complete_end(path):
+    # byte offset just after the last newline: a line still being written
+    # by the producer is left for the next run
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - TAIL_BLOCK)
+            f.seek(start)
+            block = f.read(pos - start)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return start + i + 1
+            pos = start
+    return 0
+
+
+def _header(path):
+    with open(path, "rb") as f:
+        return f.readline().decode("utf-8", errors="replace")
+
+
+def read_rows(path, start, end, names):
+    # parse the CSV rows stored in bytes [start, end)
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if not data.strip():
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in names})
+    return pd.read_csv(io.BytesIO(data), header=None, names=names)
+
+
+def _align(df, dtypes):
+    # read_csv infers dtypes per batch; bring them in line with the full run
+    # (data_io.load_csv_typed) so hashes and the written text match
+    out = {}
+    for col, dtype in dtypes.items():
+        s = df[col]
+        if dtype.startswith("datetime64") and s.dtype == object:
+            parsed = pd.to_datetime(s, format="ISO8601", errors="coerce")
+            if parsed.notna().sum() == s.notna().sum():
+                out[col] = parsed
+        elif dtype.lower().startswith(("int", "uint")) and pd.api.types.is_float_dtype(s):
+            if (s.dropna() % 1 == 0).all():
+                out[col] = s.astype("Int64")   # no "5.0" for rows of an int column
+    return df.assign(**out) if out else df
+
+
+def _resolve_actions(actions, after_df):
+    # mean/median imputation is pinned to the value of the full run, so each
+    # batch is filled the same way and not with its own batch mean
+    resolved = []
+    for action in actions:
+        params = dict(action.get("params", {}) or {})
+        col = params.get("column")
+        if (action.get("action") == "impute_nulls" and params.get("strategy") in ("mean", "median")
+                and col in after_df.columns and pd.api.types.is_numeric_dtype(after_df[col])):
+            value = after_df[col].mean() if params["strategy"] == "mean" else after_df[col].median()
+            params.update(strategy="constant", value=None if pd.isna(value) else float(value))
+        resolved.append({"action": action.get("action"), "params": params})
+    return resolved
+
+
+def _dedup_subsets(actions, columns):
+    subsets = []
+    for action in actions:
+        if action.get("action") == "drop_duplicates":
+            subset = [c for c in (action.get("params", {}) or {}).get("subset") or [] if c in columns]
+            subsets.append(subset or None)
+    return subsets
+
+
+def _plain(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _state_json(state):
+    return {"num_rows": state.num_rows, "schema": state.schema, "null_counts": state.null_counts,
+            "mins": {c: _plain(v) for c, v in state.mins.items()},
+            "maxs": {c: _plain(v) for c, v in state.maxs.items()},
+            "email_invalid": state.email_invalid, "price_negative": state.price_negative}
+
+
+def _state_from_json(d, hashes, counts):
+    state = ProfileState()
+    state.num_rows = d["num_rows"]
+    state.schema = d["schema"]
+    state.null_counts = d["null_counts"]
+    state.mins, state.maxs = d["mins"], d["maxs"]
+    state.email_invalid, state.price_negative = d["email_invalid"], d["price_negative"]
+    state.hashes, state.counts = hashes, counts
+    return state
+
+
+def save_checkpoint(path, checkpoint, state, seen):
+    # hashes first, then the JSON via os.replace: the JSON is the commit point
+    state._compact()
+    arrays = {"hashes": state.hashes, "counts": state.counts}
+    arrays.update({f"seen_{i}": h for i, h in enumerate(seen)})
+    tmp = checkpoint_path(path) + ".tmp"
+    with open(tmp + ".npz", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp + ".npz", path + HASHES_SUFFIX)
+    checkpoint = dict(checkpoint, state=_state_json(state), output_bytes=os.path.getsize(checkpoint["output"]))
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, checkpoint_path(path))
+    return checkpoint
+
+
+def start_checkpoint(path, out_path, actions, before_df, after_df, offset, state=None):
+    # after a full run: before_df was read from bytes [0, offset) of path and
+    # after_df (fixed with actions) was written to out_path
+    if file_format(path) != "csv" or file_format(out_path) != "csv":
+        raise ValueError("incremental mode needs a CSV input and a CSV output")
+    state = state if state is not None else ProfileState().update(before_df)
+    actions = _resolve_actions(actions, after_df)
+    seen = [np.unique(row_hashes(after_df, subset)) for subset in _dedup_subsets(actions, after_df.columns)]
+    checkpoint = {"source": path, "output": out_path, "header": _header(path), "offset": int(offset),
+                  "rows": int(len(before_df)), "columns": list(before_df.columns),
+                  "dtypes": {c: str(t) for c, t in before_df.dtypes.items()}, "actions": actions}
+    return save_checkpoint(path, checkpoint, state, seen)
+
+
+def load_checkpoint(path, out_path=None):
+    # None when there is no usable checkpoint (a full run is needed): the
+    # input was rewritten (header changed or file shrank) or the output moved
+    try:
+        with open(checkpoint_path(path), "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    out = checkpoint.get("output")
+    if out_path is not None and out != out_path:
+        return None
+    if (not os.path.exists(path) or os.path.getsize(path) < checkpoint["offset"] or _header(path) != checkpoint["header"]
+            or not os.path.exists(out) or os.path.getsize(out) < checkpoint["output_bytes"]
+            or not os.path.exists(path + HASHES_SUFFIX)):
+        return None
+    return checkpoint
+
+
+def process_appended(path, checkpoint):
+    # Profile and fix the rows appended since the checkpoint and append them
+    # to the cleaned output. Rows matching an already written row on a
+    # drop_duplicates subset are dropped too. Near-duplicates are only
+    # detected within the batch.
+    end = complete_end(path)
+    result = {"rows": 0, "kept": 0, "start": checkpoint["offset"], "end": end}
+    if end <= checkpoint["offset"]:
+        return result
+    with np.load(path + HASHES_SUFFIX) as arrays:
+        state = _state_from_json(checkpoint["state"], arrays["hashes"], arrays["counts"])
+        subsets = _dedup_subsets(checkpoint["actions"], checkpoint["columns"])
+        seen = [arrays[f"seen_{i}"] for i in range(len(subsets))]
+
+    new_df = _align(read_rows(path, checkpoint["offset"], end, checkpoint["columns"]), checkpoint["dtypes"])
+    state.update(new_df)
+    fixed = apply_fixes(new_df, checkpoint["actions"])
+    keep = np.ones(len(fixed), dtype=bool)
+    batch = [row_hashes(fixed, subset) for subset in subsets]
+    for h, old in zip(batch, seen):
+        keep &= ~np.isin(h, old)
+    fixed = fixed[keep]
+    seen = [np.union1d(old, h[keep]) for h, old in zip(batch, seen)]
+
+    out = checkpoint["output"]
+    # drop anything a crashed run appended after the last checkpoint
+    with open(out, "r+b") as f:
+        f.truncate(checkpoint["output_bytes"])
+    fixed.to_csv(out, mode="a", header=False, index=False)
+
+    checkpoint = dict(checkpoint, offset=int(end), rows=int(checkpoint["rows"] + len(new_df)))
+    save_checkpoint(path, checkpoint, state, seen)
+    result.update(rows=int(len(new_df)), kept=int(len(fixed)), profile=state.to_profile(),
+                  new_df=new_df, fixed_df=fixed)
+    return result
@@ -1,17 +1,33 @@
 # main.py
 import os
 import json
-from tools import load_data, analyze_data, backup_csv, restore_csv, apply_fixes, evaluate_improvement
+from tools import (load_data, save_data, memory_summary, analyze_data, analyze_data_state, analyze_file, backup_csv, restore_csv, apply_fixes,
+                   apply_fixes_file, skipped_fixes, evaluate_improvement, evaluate_file_improvement)
 from planner import planner_agent
 from reasoner import reasoner_agent
 from critic import critic_validate_plan, critic_validate_results
-from memory import load_memory, save_memory
+from memory import updating_memory, profile_signature, find_cached_plan, record_plan_lookup
 from rag import ingest_text
+from incremental import complete_end, load_checkpoint, start_checkpoint, process_appended
+from changeset import write_changeset, merge_changes
+from retry_scheduler import RetryScheduler
+from sketches import sketch_frame, sketch_file, load_runs, save_run, drift_report
 import time
 
-CSV_PATH = "data/sample.csv"
+CSV_PATH = "data/sample.csv"  # .parquet / .feather inputs are also supported
+OUTPUT_PATH = "data/cleaned_output.csv"  # output format follows the extension
+OUTPUT_MODE = "full"  # "changeset": write only the changed cells to CHANGESET_PATH (see changeset.py)
+CHANGESET_PATH = "data/cleaned_output.changes.parquet"
 SAFETY_MODE = "C"  # default: retry
 MAX_RETRIES = 2
+RETRY_TIME_BUDGET = 900  # safety B: seconds and LLM tokens for all retries of a run (retry_scheduler.py)
+RETRY_TOKEN_BUDGET = 30_000
+SAMPLE_ROWS = None  # e.g. 100_000: approximate triage profile (estimates + CIs) for very large inputs
+ENGINE = "pandas"  # "duckdb": profile and fix in SQL over the file (CSV/Parquet), nothing loaded into pandas
+FIX_WORKERS = 1  # >1: apply fixes over row partitions in a process pool (same result as serial)
+INCREMENTAL = False  # append-only CSV input: after one full run, only rows appended since the checkpoint are processed
+NEAR_DUPS = False  # also count fuzzy duplicate rows (MinHash-LSH, near_dup.py); slow on large inputs
+SKETCHES = True  # keep per-column sketches of each input and report drift since the last run to the planner (sketches.py)
 
 def ingest_docs_if_needed():
     docs_path = "docs/dq_best_practices.txt"
@@ -19,47 +35,130 @@ def ingest_docs_if_needed():
         text = open(docs_path, "r", encoding="utf-8").read()
         ingest_text("dq_policies", text)
 
-def main():
-    ingest_docs_if_needed()
+def write_output(before_df, after_df, changes):
+    if OUTPUT_MODE == "changeset":
+        n = write_changeset(CHANGESET_PATH, before_df, after_df, changes, CSV_PATH)
+        print(f"[INFO] {n} cell/row changes written to {CHANGESET_PATH}. "
+              f"Materialize with: python changeset.py {CHANGESET_PATH} {OUTPUT_PATH}")
+    else:
+        save_data(after_df, OUTPUT_PATH)
+        print(f"[INFO] Applied fixes. Saved to {OUTPUT_PATH}")
+
+def run_incremental(checkpoint):
+    # fix and append the new rows with the checkpointed actions; no LLM calls
+    result = process_appended(CSV_PATH, checkpoint)
+    if not result["rows"]:
+        print("[INFO] No rows appended since the checkpoint.")
+        return "done"
+    print(f"[INFO] Incremental: {result['rows']} new rows (bytes {result['start']}-{result['end']}), "
+          f"{result['kept']} appended to {checkpoint['output']}")
+    print("[INFO] Dataset profile (all rows so far):")
+    print(json.dumps(result["profile"], indent=2))
+    eval_result = evaluate_improvement(result["new_df"], result["fixed_df"])
+    print("[INFO] Improvement evaluation (new rows):")
+    print(json.dumps({k: v for k, v in eval_result.items() if not k.endswith("_profile")}, indent=2))
+    print("[DONE] All complete.")
+    return "done"
+
+def _without_fixes(out, key, skipped):
+    # out[key] without the skipped fixes, so a cached plan does not replay them
+    ids = {f.get("id") for f in skipped if f.get("id") is not None}
+    return dict(out, **{key: [f for f in out.get(key, [])
+                              if f.get("id") not in ids and not any(f is s for s in skipped)]})
+
+def main(approve=None, ingest=True):
+    # approve(fixes) -> bool replaces the console prompt (service.py); ingest=False
+    # when the policy docs are already in the vector store. Returns the outcome:
+    # "done", "no_fixes", "rejected" (critic or approval) or "rolled_back".
+    if ingest:
+        ingest_docs_if_needed()
+
+    if INCREMENTAL and ENGINE == "pandas":
+        checkpoint = load_checkpoint(CSV_PATH, OUTPUT_PATH)
+        if checkpoint is not None:
+            return run_incremental(checkpoint)
+        print("[INFO] No usable checkpoint; running a full pass.")
 
     backup_path = backup_csv(CSV_PATH)
     print(f"[INFO] Backup created at {backup_path}")
 
-    df = load_data(CSV_PATH)
-    profile = analyze_data(df)
+    if ENGINE == "duckdb":
+        df, profile_state = None, None
+        profile = analyze_file(CSV_PATH, engine="duckdb")
+    else:
+        mem_report = {}
+        # offset the checkpoint will start from (only complete lines count)
+        input_end, input_size = (complete_end(CSV_PATH), os.path.getsize(CSV_PATH)) if INCREMENTAL else (None, None)
+        df = load_data(CSV_PATH, report=mem_report)
+        if mem_report:
+            print("[INFO] Memory:", memory_summary(mem_report))
+        if SAMPLE_ROWS:
+            profile, profile_state = analyze_data(df, sample_rows=SAMPLE_ROWS), None
+        else:
+            profile, profile_state = analyze_data_state(df, near_dups=NEAR_DUPS)
     print("[INFO] Dataset profile:")
     print(json.dumps(profile, indent=2))
 
     dataset_name = os.path.basename(CSV_PATH)
 
-    # Planner: produce steps (no fixes)
-    plan = planner_agent(profile)
-    print("[INFO] Planner steps:")
-    print(json.dumps(plan, indent=2))
+    # compare this input with the last run's from column sketches alone
+    drift = []
+    if SKETCHES:
+        current = sketch_frame(df) if df is not None else sketch_file(CSV_PATH)
+        runs = load_runs(dataset_name)
+        drift = [f["message"] for f in drift_report(runs[-1], current)] if runs else []
+        save_run(dataset_name, current)
+        if drift:
+            print("[INFO] Drift since the last run:")
+            for message in drift:
+                print("-", message)
+
+    # Same dataset shape as an earlier accepted run: reuse its plan, no LLM calls
+    signature = profile_signature(profile)
+    with updating_memory() as mem:
+        cached = find_cached_plan(mem, signature)
+        stats = record_plan_lookup(mem, cached)
+    print(f"[INFO] Plan cache {'hit' if cached else 'miss'} ({stats['hits']}/{stats['lookups']} runs, hit rate {stats['hit_rate']:.0%})")
 
-    # Reasoner: produce conservative fixes (must consult RAG)
-    reasoner_out = reasoner_agent(profile, plan.get("steps", []), dataset_name=dataset_name)
-    print("[INFO] Reasoner proposed:")
-    print(json.dumps(reasoner_out, indent=2))
+    if cached:
+        reasoner_out, validated = cached["plan"], cached["validated"]
+        print("[INFO] Reusing plan accepted for the same profile signature at", cached.get("timestamp"))
+        print(json.dumps(reasoner_out, indent=2))
+    else:
+        # Planner: produce steps (no fixes)
+        plan = planner_agent(profile, drift=drift)
+        print("[INFO] Planner steps:")
+        print(json.dumps(plan, indent=2))
 
-    # Critic validates plan BEFORE execution
-    validated = critic_validate_plan(profile, reasoner_out, dataset_name=dataset_name)
-    print("[INFO] Critic validation (pre-exec):")
-    print(json.dumps(validated, indent=2))
+        # Reasoner: produce conservative fixes (must consult RAG)
+        reasoner_out = reasoner_agent(profile, plan.get("steps", []), dataset_name=dataset_name)
+        print("[INFO] Reasoner proposed:")
+        print(json.dumps(reasoner_out, indent=2))
+
+        # Critic validates plan BEFORE execution
+        validated = critic_validate_plan(profile, reasoner_out, dataset_name=dataset_name)
+        print("[INFO] Critic validation (pre-exec):")
+        print(json.dumps(validated, indent=2))
+
+    # one time/token budget for every safety-B retry of this run
+    scheduler = RetryScheduler(max_rounds=MAX_RETRIES, time_budget=RETRY_TIME_BUDGET, token_budget=RETRY_TOKEN_BUDGET)
 
     if validated.get("overall_decision") != "accept":
         print("[WARN] Plan requires revision according to critic.")
         if SAFETY_MODE == "A":
             print("[INFO] Stopping due to safety mode A.")
-            return
+            return "rejected"
         elif SAFETY_MODE == "B":
-            print("[INFO] Requesting reasoner re-plan (safety B).")
-            # Use critic suggested_changes to guide reasoner (pass as extra context)
-            reasoner_out = reasoner_agent(profile, plan.get("steps", []), dataset_name=dataset_name)
-            validated = critic_validate_plan(profile, reasoner_out, dataset_name=dataset_name)
+            print("[INFO] Re-asking the reasoner for the rejected fixes only (safety B).")
+            # accepted fixes are kept; each rejected one goes back with the critic's notes
+            reasoner_out, validated = scheduler.revise(profile, reasoner_out, validated, dataset_name=dataset_name)
+            print(json.dumps(validated, indent=2))
+            print("[INFO] Retry budget used:", scheduler.stats())
             if validated.get("overall_decision") != "accept":
                 print("[ERROR] Revised plan still not accepted. Exiting.")
-                return
+                return "rejected"
+            if validated.get("dropped"):
+                print("[WARN] Dropped fixes the critic still rejects:", validated["dropped"])
         else:
             print("[WARN] Proceeding despite critic objections (safety C).")
 
@@ -67,35 +166,57 @@ def main():
     fixes = [f for f in validated.get("validated_fixes", []) if f.get("status") == "accepted"]
     if not fixes:
         print("[INFO] No accepted fixes; nothing to apply.")
-        return
+        return "no_fixes"
 
     print("[INFO] Accepted fixes to apply:")
     print(fixes)
     for f in fixes:
         print("-", f.get("description"))
 
-    approval = input("Apply fixes? (Y/N): ").strip().lower()
-    if approval != "y":
+    approved = approve(fixes) if approve else input("Apply fixes? (Y/N): ").strip().lower() == "y"
+    if not approved:
         print("[INFO] Execution aborted by user.")
-        return
+        return "rejected"
 
     # Convert fixes to actions list for tools.apply_fixes
     actions = []
     for f in fixes:
-        actions.append({"action": f.get("action"), "params": f.get("params", {})})
+        actions.append({"id": f.get("id"), "action": f.get("action"), "params": f.get("params", {})})
 
-    before_df = df.copy()
+    # apply_fixes never modifies df, so it can serve as the "before" frame as is
+    before_df = df
     try:
-        after_df = apply_fixes(df, actions)
-        after_df.to_csv("data/cleaned_output.csv", index=False)
-        print("[INFO] Applied fixes. Saved to data/cleaned_output.csv")
+        changes = {}
+        if ENGINE == "duckdb":
+            after_df = None
+            apply_fixes_file(CSV_PATH, OUTPUT_PATH, actions, changes=changes)
+            print(f"[INFO] Applied fixes. Saved to {OUTPUT_PATH}")
+        else:
+            after_df = apply_fixes(df, actions, changes=changes, workers=FIX_WORKERS)
+            write_output(df, after_df, changes)
+        # fixes skipped by the executor (regex time budget, no RE2 form for DuckDB)
+        # are not recorded as applied
+        skip = skipped_fixes(actions, changes)
+        skipped = [fixes[n] for n in sorted(skip)]
+        applied_actions = [a for n, a in enumerate(actions) if n not in skip]
+        final_df, total_changes = after_df, changes
+        if skipped:
+            print("[WARN] Fixes skipped, not applied:", [f.get("id") for f in skipped])
     except Exception as e:
         print("[ERROR] Exception during execution:", e)
         restore_csv(backup_path, CSV_PATH)
         print("[INFO] Rolled back CSV to backup.")
-        return
+        return "rolled_back"
 
-    eval_result = evaluate_improvement(before_df, after_df)
+    # delta evaluation: reuse the pre-fix profile, re-read only what changed
+    if ENGINE == "duckdb":
+        eval_result = evaluate_file_improvement(CSV_PATH, OUTPUT_PATH, before_profile=profile)
+    elif profile.get("approximate"):
+        # estimates cannot be delta-updated; measure before/after exactly
+        eval_result = evaluate_improvement(before_df, after_df, near_dups=NEAR_DUPS)
+    else:
+        eval_result = evaluate_improvement(before_df, after_df, before_profile=profile,
+                                           changes=changes, before_state=profile_state)
     print("[INFO] Improvement evaluation:")
     print(json.dumps(eval_result, indent=2))
 
@@ -108,23 +229,51 @@ def main():
         if SAFETY_MODE == "A":
             restore_csv(backup_path, CSV_PATH)
             print("[INFO] Rolled back due to safety A.")
-            return
+            return "rolled_back"
         elif SAFETY_MODE == "B":
             retries = 0
             success = False
             while retries < MAX_RETRIES and not success:
                 print(f"[INFO] Retry attempt {retries+1}/{MAX_RETRIES}")
-                # Use after_profile to replan
-                plan = planner_agent(eval_result["after_profile"])
-                reasoner_out = reasoner_agent(eval_result["after_profile"], plan.get("steps", []), dataset_name=dataset_name)
-                validated = critic_validate_plan(eval_result["after_profile"], reasoner_out, dataset_name=dataset_name)
+                if scheduler.exhausted():
+                    print("[WARN] Retry time/token budget used up:", scheduler.stats())
+                    break
+                signature = None  # the final plan no longer answers the original profile alone
+                # re-ask only for the fixes behind the failed policies; re-plan from
+                # the after_profile when no fix is implicated
+                revised = scheduler.revise_results(eval_result["after_profile"], reasoner_out, post_validation,
+                                                   dataset_name=dataset_name)
+                if revised is not None:
+                    reasoner_out, validated = revised
+                else:
+                    usage = {}
+                    plan = planner_agent(eval_result["after_profile"], usage=usage)
+                    reasoner_out = reasoner_agent(eval_result["after_profile"], plan.get("steps", []),
+                                                  dataset_name=dataset_name, usage=usage)
+                    scheduler.charge(usage)
+                    validated = critic_validate_plan(eval_result["after_profile"], reasoner_out, dataset_name=dataset_name)
+                print("[INFO] Retry budget used:", scheduler.stats())
                 if validated.get("overall_decision") == "accept":
                     fixes = [f for f in validated.get("validated_fixes", []) if f.get("status") == "accepted"]
-                    actions = [{"action": f.get("action"), "params": f.get("params", {})} for f in fixes]
+                    actions = [{"id": f.get("id"), "action": f.get("action"), "params": f.get("params", {})} for f in fixes]
                     try:
-                        new_after = apply_fixes(after_df, actions)
-                        new_after.to_csv("data/cleaned_output.csv", index=False)
-                        eval_result = evaluate_improvement(after_df, new_after)
+                        changes = {}
+                        if ENGINE == "duckdb":
+                            new_after = None
+                            apply_fixes_file(OUTPUT_PATH, OUTPUT_PATH, actions, changes=changes)
+                            skipped += [fixes[n] for n in sorted(skipped_fixes(actions, changes))]
+                            eval_result = evaluate_file_improvement(OUTPUT_PATH, OUTPUT_PATH,
+                                                                    before_profile=eval_result["after_profile"])
+                        else:
+                            new_after = apply_fixes(after_df, actions, changes=changes, workers=FIX_WORKERS)
+                            total_changes = merge_changes(total_changes, changes, len(df))
+                            write_output(df, new_after, total_changes)
+                            skip = skipped_fixes(actions, changes)
+                            skipped += [fixes[n] for n in sorted(skip)]
+                            applied_actions = applied_actions + [a for n, a in enumerate(actions) if n not in skip]
+                            final_df = new_after
+                            eval_result = evaluate_improvement(after_df, new_after, before_profile=eval_result["after_profile"],
+                                                               changes=changes)
                         post_validation = critic_validate_results(eval_result["before_profile"], eval_result["after_profile"], reasoner_out, dataset_name=dataset_name)
                         if post_validation.get("accepted", False):
                             print("[INFO] Retry successful.")
@@ -138,21 +287,34 @@ def main():
             if not success:
                 print("[ERROR] Retries exhausted. Rolling back to backup.")
                 restore_csv(backup_path, CSV_PATH)
-                return
+                return "rolled_back"
         else:
             print("[WARN] Proceeding despite failed post-validation (safety C).")
 
     # record memory
-    mem = load_memory()
-    mem.setdefault("fix_history", []).append({
-        "dataset": dataset_name,
-        "timestamp": int(time.time()),
-        "plan": reasoner_out,
-        "post_validation": post_validation
-    })
-    save_memory(mem)
+    with updating_memory() as mem:
+        mem.setdefault("fix_history", []).append({
+            "dataset": dataset_name,
+            "timestamp": int(time.time()),
+            "plan": _without_fixes(reasoner_out, "proposed_fixes", skipped),
+            "post_validation": post_validation,
+            "signature": signature,
+            "validated": _without_fixes(validated, "validated_fixes", skipped),
+            "skipped": [f.get("id") for f in skipped],
+            "cached": bool(cached),
+            "drift": drift
+        })
     print("[INFO] Memory updated with fix history.")
+
+    if INCREMENTAL and ENGINE == "pandas" and OUTPUT_MODE == "full":
+        if input_end != input_size:
+            print("[WARN] Input ended mid-line while loading; no checkpoint written.")
+        else:
+            start_checkpoint(CSV_PATH, OUTPUT_PATH, applied_actions, df, final_df, input_end,
+                             state=profile_state)
+            print(f"[INFO] Checkpoint written at byte {input_end}; next runs process appended rows only.")
     print("[DONE] All complete.")
+    return "done"
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,8 @@
 # memory.py
 import json
 import os
+import contextlib
+import hashlib
 
 MEM_PATH = "memory_store/memory.json"
 if not os.path.exists("memory_store"):
@@ -8,9 +10,85 @@ if not os.path.exists("memory_store"):
 
 def load_memory():
     if os.path.exists(MEM_PATH):
-        return json.load(open(MEM_PATH, "r", encoding="utf-8"))
+        with open(MEM_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
     return {}
 
 def save_memory(mem):
-    with open(MEM_PATH, "w", encoding="utf-8") as f:
+    # tmp + replace: a concurrent reader never sees a half-written file
+    tmp = f"{MEM_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(mem, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, MEM_PATH)
+
+@contextlib.contextmanager
+def file_lock(path):
+    # exclusive lock on path + ".lock" across processes (service.py workers,
+    # concurrent runs); a no-op where flock is unavailable
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def updating_memory():
+    # load, let the caller change it, save - under the memory lock so
+    # concurrent runs do not drop each other's updates
+    with file_lock(MEM_PATH):
+        mem = load_memory()
+        yield mem
+        save_memory(mem)
+
+
+# Plan memoization: a run whose profile has the same signature as an earlier
+# run (same schema, same kinds of issues) reuses that run's critic-accepted
+# plan instead of calling the planner/reasoner LLMs again.
+NULL_HEAVY = 0.05   # share of nulls above which a column counts as null-heavy
+
+
+def _dtype_kind(dtype):
+    # int8/Int16/int64 etc. are the same for planning purposes
+    dtype = str(dtype).lower()
+    for kind in ("int", "float", "bool", "datetime"):
+        if dtype.startswith(kind) or dtype.startswith("u" + kind):
+            return kind
+    return "text"
+
+
+def profile_signature(profile):
+    # schema, which invalid categories / policies are non-zero, duplicate
+    # presence and null-heavy columns; counts themselves are left out
+    parts = {
+        "schema": sorted((c, _dtype_kind(t)) for c, t in profile.get("schema", {}).items()),
+        "invalids": sorted(k for k, v in profile.get("invalids", {}).items() if v),
+        "policies": sorted(k for k, v in profile.get("policy_violations", {}).items() if v),
+        "dups": bool(profile.get("dup_rows")),
+        "near_dups": bool(profile.get("near_dup_rows")),
+        "null_heavy": sorted(c for c, p in profile.get("null_percent", {}).items() if p == p and p > NULL_HEAVY),
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def find_cached_plan(mem, signature):
+    # latest run with this signature whose plan the critic accepted before
+    # and after execution; None if the profile is new
+    for entry in reversed(mem.get("fix_history", [])):
+        if (entry.get("signature") == signature and entry.get("validated", {}).get("overall_decision") == "accept"
+                and entry.get("post_validation", {}).get("accepted")):
+            return entry
+    return None
+
+
+def record_plan_lookup(mem, hit):
+    stats = mem.setdefault("plan_cache", {"lookups": 0, "hits": 0})
+    stats["lookups"] += 1
+    stats["hits"] += int(bool(hit))
+    stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4)
+    return stats
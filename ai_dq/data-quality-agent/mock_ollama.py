@@ -0,0 +1,247 @@
+# mock_ollama.py
+# Local stand-in for the Ollama server the agents call, for offline runs
+# and benchmarks (bench_flow.py). It replays recorded responses from
+# RESPONSES_PATH on the two endpoints in use:
+#   POST /v1/chat/completions   OpenAI-style (planner.py / reasoner.py); "stream": true -> SSE
+#   POST /api/generate          native Ollama; streams NDJSON unless "stream": false
+# plus GET /api/tags and GET / for health checks. A response is picked by
+# the prompt's sha1 (exact replay of a recording) or else by the first
+# entry whose "contains" text occurs in the prompt. Timing follows a simple
+# model: `latency` seconds to the first token, then `tokens_per_s` (words
+# and punctuation count as tokens), both varied by +-`jitter`.
+# With an upstream URL, unmatched prompts are forwarded there and the
+# answer is recorded into the responses file.
+# Usage: python mock_ollama.py [port] [latency_s] [tokens_per_s] [upstream_url]
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RESPONSES_PATH = "data/mock_llm_responses.json"
+PORT = 11434
+MODEL = "llama3:latest"
+TOKEN = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+def _tokens(text):
+    # whitespace rides along with the token before it
+    out = []
+    for t in TOKEN.findall(text):
+        if t.isspace() and out:
+            out[-1] += t
+        else:
+            out.append(t)
+    return out
+
+
+def _prompt_key(prompt):
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+class MockOllama:
+    def __init__(self, responses_path=RESPONSES_PATH, latency=0.0, tokens_per_s=0.0, jitter=0.0,
+                 upstream=None, seed=0):
+        self.responses_path = responses_path
+        with open(responses_path, "r", encoding="utf-8") as f:
+            self.responses = json.load(f)["responses"]
+        self.latency = latency
+        self.tokens_per_s = tokens_per_s      # 0 = unlimited
+        self.jitter = jitter
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _vary(self, seconds):
+        if not self.jitter or not seconds:
+            return seconds
+        with self.lock:
+            return seconds * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def first_token_delay(self):
+        return self._vary(self.latency)
+
+    def token_delay(self):
+        return self._vary(1 / self.tokens_per_s) if self.tokens_per_s else 0.0
+
+    def response_time(self, n_tokens):
+        # a whole non-streamed answer
+        return self.first_token_delay() + (self._vary(n_tokens / self.tokens_per_s) if self.tokens_per_s else 0.0)
+
+    def _record(self, prompt, content):
+        with self.lock:
+            self.responses.insert(0, {"prompt_sha1": _prompt_key(prompt), "content": content})
+            with open(self.responses_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"responses": self.responses}, f, indent=2)
+            os.replace(self.responses_path + ".tmp", self.responses_path)
+
+    def _forward(self, prompt):
+        body = json.dumps({"model": MODEL, "messages": [{"role": "user", "content": prompt}]}).encode("utf-8")
+        req = urllib.request.Request(self.upstream + "/v1/chat/completions", data=body,
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            content = json.load(resp)["choices"][0]["message"]["content"]
+        self._record(prompt, content)
+        return content
+
+    def reply(self, prompt):
+        # recorded content for prompt; None when nothing matches
+        with self.lock:
+            self.calls += 1
+        key = _prompt_key(prompt)
+        for entry in self.responses:
+            if entry.get("prompt_sha1") == key:
+                return entry["content"]
+        for entry in self.responses:
+            if entry.get("contains") and entry["contains"] in prompt:
+                return entry["content"]
+        if self.upstream:
+            return self._forward(prompt)
+        return None
+
+
+def _chat_prompt(messages):
+    return "\n".join(m.get("content", "") for m in messages if isinstance(m.get("content"), str))
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass    # quiet: benchmarks run thousands of requests
+
+        def _send(self, status, payload, content_type="application/json"):
+            data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _start_stream(self, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send(200, {"models": [{"name": MODEL, "model": MODEL}]})
+            elif self.path == "/":
+                self._send(200, b"Ollama is running", "text/plain")
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._send(400, {"error": "invalid JSON body"})
+                return
+            if self.path == "/v1/chat/completions":
+                self._chat(body)
+            elif self.path == "/api/generate":
+                self._generate(body)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _content(self, prompt):
+            content = mock.reply(prompt)
+            if content is None:
+                self._send(500, {"error": "mock_ollama: no recorded response matches the prompt"})
+            return content
+
+        def _tokens_paced(self, content):
+            time.sleep(mock.first_token_delay())
+            for tok in _tokens(content):
+                yield tok
+                time.sleep(mock.token_delay())
+
+        def _chat(self, body):
+            prompt = _chat_prompt(body.get("messages", []))
+            content = self._content(prompt)
+            if content is None:
+                return
+            model, created, cid = body.get("model", MODEL), int(time.time()), f"chatcmpl-{mock.calls}"
+            usage = {"prompt_tokens": len(_tokens(prompt)), "completion_tokens": len(_tokens(content))}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            if body.get("stream"):
+                self._start_stream("text/event-stream")
+                for tok in self._tokens_paced(content):
+                    chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"role": "assistant", "content": tok}, "finish_reason": None}]}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self._chunk(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self._chunk(b"")
+                return
+            time.sleep(mock.response_time(usage["completion_tokens"]))
+            self._send(200, {"id": cid, "object": "chat.completion", "created": created, "model": model,
+                             "system_fingerprint": "fp_ollama",
+                             "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                          "finish_reason": "stop"}],
+                             "usage": usage})
+
+        def _generate(self, body):
+            prompt = body.get("prompt", "")
+            content = self._content(prompt)
+            if content is None:
+                return
+            model = body.get("model", MODEL)
+            t0 = time.perf_counter_ns()
+
+            def final(text):
+                total = time.perf_counter_ns() - t0
+                return {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        "response": text, "done": True, "done_reason": "stop", "total_duration": total,
+                        "load_duration": 0, "prompt_eval_count": len(_tokens(prompt)), "prompt_eval_duration": 0,
+                        "eval_count": len(_tokens(content)), "eval_duration": total}
+
+            if body.get("stream", True):
+                self._start_stream("application/x-ndjson")
+                for tok in self._tokens_paced(content):
+                    line = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                            "response": tok, "done": False}
+                    self._chunk((json.dumps(line) + "\n").encode("utf-8"))
+                self._chunk((json.dumps(final("")) + "\n").encode("utf-8"))
+                self._chunk(b"")
+                return
+            time.sleep(mock.response_time(len(_tokens(content))))
+            self._send(200, final(content))
+
+    return Handler
+
+
+def serve_in_background(port=PORT, **kwargs):
+    # start the mock on 127.0.0.1:port in a daemon thread; returns the
+    # server (server.mock is the MockOllama; stop with server.shutdown())
+    mock = MockOllama(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(mock))
+    server.daemon_threads = True
+    server.mock = mock
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    port = int(args[0]) if args else PORT
+    mock = MockOllama(latency=float(args[1]) if len(args) > 1 else 0.0,
+                      tokens_per_s=float(args[2]) if len(args) > 2 else 0.0,
+                      upstream=args[3] if len(args) > 3 else None)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(mock))
+    server.daemon_threads = True
+    print(f"[INFO] Mock Ollama on http://127.0.0.1:{port} ({len(mock.responses)} recorded responses)")
+    server.serve_forever()
@@ -0,0 +1,166 @@
+# near_dup.py
+# Near-duplicate (fuzzy) row detection: character shingles -> MinHash
+# signatures -> LSH banding for candidate pairs -> exact Jaccard check on
+# the candidates -> union-find clusters. Cost is near-linear in rows since
+# only rows sharing a band bucket are ever compared.
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+SHINGLE_K = 3
+NUM_BANDS = 16
+BAND_ROWS = 6                    # 96 MinHash permutations; LSH threshold ~ (1/16)^(1/6) = 0.63
+THRESHOLD = 0.8                  # Jaccard similarity needed to call two rows near-duplicates
+SIG_MARGIN = 0.15                # candidates whose MinHash estimate is below threshold - margin are dropped
+BLOCK_ROWS = 4096                # rows hashed per block (bounds memory)
+MAX_BUCKET_PAIRS = 50            # above this bucket size compare members to the first only
+SEED = 7
+
+
+def is_text(s):
+    # object, pandas/Arrow string and categorical columns all hold text
+    return s.dtype == object or pd.api.types.is_string_dtype(s.dtype) or isinstance(s.dtype, pd.CategoricalDtype)
+
+
+def text_columns(df, subset=None):
+    # the text columns of subset (all columns when None); others are ignored
+    return [c for c in (subset or df.columns) if c in df.columns and is_text(df[c])]
+
+
+def _has_text(df, cols):
+    # rows with at least one non-blank value in cols; empty and all-null rows
+    # would otherwise all shingle to the same text and form one big cluster
+    mask = np.zeros(len(df), dtype=bool)
+    for c in cols:
+        mask |= (df[c].astype(object).fillna("").astype(str).str.strip() != "").to_numpy()
+    return mask
+
+
+def row_text(df, subset=None):
+    # Normalised text per row: string columns joined, lowercased, whitespace collapsed.
+    cols = text_columns(df, subset)
+    if not cols:
+        return pd.Series([""] * len(df), index=df.index)
+    text = df[cols[0]].astype(object).fillna("").astype(str)
+    for c in cols[1:]:
+        text = text + " | " + df[c].astype(object).fillna("").astype(str)
+    return text.str.lower().str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+@lru_cache(maxsize=100_000)
+def _shingles(text):
+    if len(text) < SHINGLE_K:
+        return frozenset([text])
+    return frozenset(text[i:i + SHINGLE_K] for i in range(len(text) - SHINGLE_K + 1))
+
+
+def jaccard(a, b):
+    sa, sb = _shingles(a), _shingles(b)
+    return len(sa & sb) / len(sa | sb) if (sa or sb) else 1.0
+
+
+def minhash_signatures(texts, num_perm=NUM_BANDS * BAND_ROWS, seed=SEED):
+    # multiply-shift hashing: h(x) = (a * x + b) mod 2^64 >> 32, a odd
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+    sigs = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for start in range(0, len(texts), BLOCK_ROWS):
+        shs = [_shingles(t) for t in texts[start:start + BLOCK_ROWS]]
+        flat = [g for sh in shs for g in sh]
+        x = pd.util.hash_array(np.array(flat, dtype=object)) & np.uint64(0xFFFFFFFF)
+        with np.errstate(over="ignore"):
+            h = (a[:, None] * x + b[:, None]) >> np.uint64(32)   # (num_perm, shingles), row-contiguous
+        lens = np.fromiter((len(sh) for sh in shs), dtype=np.int64, count=len(shs))
+        starts = np.concatenate(([0], np.cumsum(lens)[:-1]))
+        sigs[start:start + len(shs)] = np.minimum.reduceat(h, starts, axis=1).T
+    return sigs
+
+
+def _band_keys(sigs, band):
+    cols = sigs[:, band * BAND_ROWS:(band + 1) * BAND_ROWS]
+    key = np.zeros(len(sigs), dtype=np.uint64)
+    for j in range(cols.shape[1]):
+        key = key * np.uint64(1_000_003) + cols[:, j]   # wraps mod 2^64; collisions are re-verified
+    return key
+
+
+def candidate_pairs(sigs):
+    # (i, j) arrays with i < j for rows sharing at least one band bucket
+    left, right = [], []
+    for band in range(NUM_BANDS):
+        key = _band_keys(sigs, band)
+        order = np.argsort(key, kind="stable")
+        sk = key[order]
+        bounds = np.flatnonzero(sk[1:] != sk[:-1]) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(sk)]))
+        size = ends - starts
+        # buckets of exactly two rows (the common case) in one vectorized step
+        pair = starts[size == 2]
+        a, b = order[pair], order[pair + 1]
+        left.append(np.minimum(a, b))
+        right.append(np.maximum(a, b))
+        multi = size > 2
+        for s, e in zip(starts[multi], ends[multi]):
+            members = np.sort(order[s:e])
+            if len(members) <= MAX_BUCKET_PAIRS:
+                i, j = np.triu_indices(len(members), k=1)
+                left.append(members[i])
+                right.append(members[j])
+            else:
+                left.append(np.full(len(members) - 1, members[0]))
+                right.append(members[1:])
+    n = np.int64(len(sigs))
+    code = np.unique(np.concatenate(left).astype(np.int64) * n + np.concatenate(right))
+    return code // n, code % n
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_clusters(df, subset=None, threshold=THRESHOLD):
+    # Cluster label per row = position of the earliest row in its cluster.
+    # Rows without any text (and all rows when there are no text columns)
+    # are their own cluster.
+    labels = np.arange(len(df))
+    cols = text_columns(df, subset)
+    if not cols:
+        return labels
+    rows = np.flatnonzero(_has_text(df, cols))
+    texts = row_text(df.iloc[rows], cols).tolist()
+    n = len(texts)
+    parent = np.arange(n)
+    if n < 2:
+        return labels
+    sigs = minhash_signatures(texts)
+    left, right = candidate_pairs(sigs)
+    # cheap vectorized pre-filter on the MinHash estimate (in blocks of
+    # pairs to bound memory), exact Jaccard on the rest
+    keep = np.empty(len(left), dtype=bool)
+    for start in range(0, len(left), BLOCK_ROWS * 16):
+        block = slice(start, start + BLOCK_ROWS * 16)
+        est = (sigs[left[block]] == sigs[right[block]]).mean(axis=1)
+        keep[block] = est >= threshold - SIG_MARGIN
+    for i, j in zip(left[keep].tolist(), right[keep].tolist()):
+        if jaccard(texts[i], texts[j]) >= threshold:
+            ri, rj = _find(parent, i), _find(parent, j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+    labels[rows] = rows[[_find(parent, i) for i in range(n)]]
+    return labels
+
+
+def near_duplicate_count(df, subset=None, threshold=THRESHOLD):
+    # rows that are a near (or exact) duplicate of an earlier row
+    labels = near_duplicate_clusters(df, subset, threshold)
+    return int(len(labels) - len(np.unique(labels)))
+
+
+def near_duplicate_keep_mask(df, subset=None, threshold=THRESHOLD):
+    labels = near_duplicate_clusters(df, subset, threshold)
+    return labels == np.arange(len(labels))
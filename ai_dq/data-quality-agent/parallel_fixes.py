@@ -0,0 +1,196 @@
+# parallel_fixes.py
+# Process-pool variant of fix_executor.execute_plan for large frames.
+# Rows are split into contiguous partitions. Runs of row-local steps
+# (string passes, constant imputation, remove_negative_values) go to the
+# workers as one task per partition carrying only the columns they touch.
+# Global steps run in two phases:
+#   - mean/median imputation: per-partition partial aggregates (sum/count,
+#     value counts) are combined into the fill value, which is then applied
+#     as a row-local constant fill
+#   - drop_duplicates: each partition hashes its surviving rows on the
+#     subset and routes (hash, row) to buckets by the top hash bits; each
+#     bucket keeps the lowest row per hash (keep-first, as in the serial path)
+# drop_near_duplicates, fix_future_dates and string passes with a regex on
+# Python's engine (one time budget per column, so a fix is skipped for the
+# whole column or not at all) run in the parent. Output and the changes dict
+# match execute_plan.
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dedup import row_hashes128, RECORD
+from fix_executor import PlanRun, _fused_string_pass, _fill, _changed
+
+WORKERS = min(8, os.cpu_count() or 1)
+MIN_PARTITION_ROWS = 200_000    # smaller frames are not worth shipping to workers
+
+
+def _is_local(step):
+    if step[0] == "string":
+        return not any(op.regex is not None and op.regex.budgeted for op in step[2])
+    if step[0] == "column":
+        act, params = step[2], step[3]
+        return act == "remove_negative_values" or (
+            act == "impute_nulls" and params.get("strategy", "constant") not in ("mean", "median"))
+    return False
+
+
+def _local_step(step, s):
+    # same operations as PlanRun.run for the row-local steps; None = no-op
+    if step[0] == "string":
+        return _fused_string_pass(s, step[2], step[3], [])    # RE2 only: nothing is skipped
+    act, params = step[2], step[3]
+    if act == "impute_nulls":
+        return _fill(s, params.get("value", ""))
+    if pd.api.types.is_numeric_dtype(s):
+        return s.mask(s < 0)
+    return None
+
+
+def _step_id(step):
+    return ",".join(step[3]) if step[0] == "string" else step[-1]
+
+
+def _run_local(frame, steps, offset, track):
+    # worker: apply the row-local steps to one partition; returns the new
+    # columns and, per step, the changed positions (global row numbers)
+    cols, credits = {}, []
+    for step in steps:
+        col = step[1]
+        s = cols.get(col, frame[col])
+        new = _local_step(step, s)
+        if new is None:
+            credits.append(None)
+            continue
+        credits.append(np.flatnonzero(_changed(s, new)) + offset if track else None)
+        cols[col] = new
+    return cols, credits
+
+
+def _partial(s, strategy):
+    # worker: partial aggregate of one partition's surviving values
+    values = s.dropna()
+    if strategy == "mean":
+        return float(values.sum()), int(len(values))
+    return values.value_counts(sort=False)
+
+
+def _combine(partials, strategy):
+    if strategy == "mean":
+        total, count = sum(p[0] for p in partials), sum(p[1] for p in partials)
+        return total / count if count else np.nan
+    counts = pd.concat(partials).groupby(level=0).sum().sort_index()
+    n = int(counts.sum())
+    if not n:
+        return np.nan
+    ends = counts.cumsum().to_numpy()
+    lo = counts.index[np.searchsorted(ends, (n - 1) // 2, side="right")]
+    hi = counts.index[np.searchsorted(ends, n // 2, side="right")]
+    return (float(lo) + float(hi)) / 2
+
+
+def _hash_partition(frame, rows, bits):
+    # worker, dedup phase 1: (h1, h2, global row) records grouped by bucket
+    h1, h2 = row_hashes128(frame)
+    rec = np.empty(len(frame), dtype=RECORD)
+    rec["h1"], rec["h2"], rec["row"] = h1, h2, rows
+    bucket = (h1 >> np.uint64(64 - bits)).astype(np.int64) if bits else np.zeros(len(rec), dtype=np.int64)
+    order = np.argsort(bucket, kind="stable")
+    rec, bucket = rec[order], bucket[order]
+    cuts = np.searchsorted(bucket, np.arange(1 << bits))
+    return np.split(rec, cuts[1:])
+
+
+def _bucket_duplicates(parts):
+    # worker, dedup phase 2: global rows of every non-first occurrence
+    rec = np.concatenate(parts)
+    rec = rec[np.lexsort((rec["row"], rec["h2"], rec["h1"]))]
+    same = (rec["h1"][1:] == rec["h1"][:-1]) & (rec["h2"][1:] == rec["h2"][:-1])
+    return rec["row"][1:][same]
+
+
+class ParallelPlanRun(PlanRun):
+    def __init__(self, df, pool, partitions, track=False):
+        super().__init__(df, track)
+        self.pool = pool
+        self.bounds = np.linspace(0, len(df), partitions + 1).astype(np.int64)
+        self.bits = max(0, int(np.ceil(np.log2(partitions))))
+
+    def _parts(self):
+        return zip(self.bounds[:-1], self.bounds[1:])
+
+    def run_local(self, steps):
+        names = list(dict.fromkeys(step[1] for step in steps))
+        track = self.owners is not None
+        futures = [self.pool.submit(_run_local, pd.DataFrame({c: self.current(c).iloc[lo:hi] for c in names}, copy=False),
+                                    steps, lo, track) for lo, hi in self._parts()]
+        results = [f.result() for f in futures]
+        for i, step in enumerate(steps):
+            if track and results[0][1][i] is not None:
+                self.credit(step[1], np.concatenate([credits[i] for _, credits in results]), _step_id(step))
+        for col in names:
+            if col in results[0][0]:
+                self.cols[col] = pd.concat([cols[col] for cols, _ in results])
+
+    def resolve(self, step):
+        # mean/median imputation -> constant fill with the global value
+        _, col, act, params, fix_id = step
+        strategy = params.get("strategy")
+        if not pd.api.types.is_numeric_dtype(self.current(col)):
+            return ("column", col, act, dict(params, strategy="constant"), fix_id)
+        s, keep = self.current(col), self.keep
+        futures = [self.pool.submit(_partial, s.iloc[lo:hi] if keep is None else s.iloc[lo:hi][keep[lo:hi]], strategy)
+                   for lo, hi in self._parts()]
+        value = _combine([f.result() for f in futures], strategy)
+        return ("column", col, act, dict(params, strategy="constant", value=value), fix_id)
+
+    def drop_duplicates(self, step):
+        _, act, params, fix_id = step
+        names = params["subset"] or list(self.df.columns)
+        alive = self.alive_positions()
+        futures = []
+        for lo, hi in self._parts():
+            a, b = np.searchsorted(alive, [lo, hi])
+            rows = alive[a:b]
+            frame = pd.DataFrame({c: self.current(c).iloc[rows] for c in names}, copy=False)
+            futures.append(self.pool.submit(_hash_partition, frame, rows, self.bits))
+        shuffled = [f.result() for f in futures]
+        buckets = [self.pool.submit(_bucket_duplicates, [parts[b] for parts in shuffled]) for b in range(1 << self.bits)]
+        dups = np.concatenate([f.result() for f in buckets])
+        m = np.ones(len(alive), dtype=bool)
+        m[np.searchsorted(alive, dups)] = False
+        self.drop(m, fix_id)
+
+
+def execute_plan_parallel(df, steps, changes=None, workers=WORKERS, partitions=None):
+    # partitions defaults to workers; small frames run serially
+    partitions = partitions or workers
+    if workers <= 1 or partitions <= 1 or len(df) < partitions * MIN_PARTITION_ROWS:
+        run = PlanRun(df, track=changes is not None)
+        for step in steps:
+            run.run(step)
+        return run.result(changes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        run = ParallelPlanRun(df, pool, partitions, track=changes is not None)
+        segment = []
+        for step in steps:
+            # a column step's outcome depends on the dtype earlier steps left
+            # behind, so the segment is flushed before it reads such a column
+            if segment and step[0] == "column" and step[1] in {s[1] for s in segment}:
+                run.run_local(segment)
+                segment = []
+            if step[0] == "column" and step[2] == "impute_nulls" and step[3].get("strategy") in ("mean", "median"):
+                step = run.resolve(step)
+            if _is_local(step):
+                segment.append(step)
+                continue
+            if segment:
+                run.run_local(segment)
+                segment = []
+            if step[0] == "rows" and step[1] == "drop_duplicates":
+                run.drop_duplicates(step)
+            else:
+                run.run(step)
+        if segment:
+            run.run_local(segment)
+        return run.result(changes)
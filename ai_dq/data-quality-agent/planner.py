@@ -5,9 +5,19 @@ import requests
 import json
 from prompts import PLANNER_SYSTEM_PROMPT
 
-def llama_run(prompt_text):
+# Ollama server; point OLLAMA_HOST at mock_ollama.py for offline runs
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
+def count_usage(usage, data, prompt_text, content):
+    # token counts from the response, ~4 characters per token if it has none
+    counts = data.get("usage") or {}
+    usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + int(counts.get("prompt_tokens", len(prompt_text) // 4))
+    usage["completion_tokens"] = usage.get("completion_tokens", 0) + int(counts.get("completion_tokens", len(content) // 4))
+
+def llama_run(prompt_text, usage=None):
+    # usage (dict): prompt/completion token counts are added to it
     try:
-        new_api_url = "http://localhost:11434/v1/chat/completions"
+        new_api_url = f"{OLLAMA_HOST}/v1/chat/completions"
         response = requests.post(
             new_api_url,
             json={
@@ -22,22 +32,29 @@ def llama_run(prompt_text):
         if response.status_code == 200:
             data = response.json()
             print(data)
-            return data["choices"][0]["message"]["content"].strip()
+            content = data["choices"][0]["message"]["content"].strip()
+            if usage is not None:
+                count_usage(usage, data, prompt_text, content)
+            return content
 
     except Exception as e:
         print(e)
     
 
-def planner_agent(profile):
+def planner_agent(profile, drift=None, usage=None):
+    # drift: messages from sketches.drift_report against the previous run
+    drift_text = ""
+    if drift:
+        drift_text = "\nDRIFT SINCE THE LAST RUN:\n" + "\n".join(f"- {m}" for m in drift) + "\n"
     prompt = f"""
 {PLANNER_SYSTEM_PROMPT}
 
 DATASET PROFILE:
 {json.dumps(profile, indent=2)}
-
+{drift_text}
 Return the JSON only.
 """
-    res = llama_run(prompt)
+    res = llama_run(prompt, usage=usage)
     # parse JSON robustly
     try:
         return json.loads(res)
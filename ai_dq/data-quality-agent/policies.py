@@ -14,3 +14,24 @@ KNOWN_POLICIES = {
 
 # Convenience: lowercased canonical phrases for substring matching
 KNOWN_POLICIES_LOWER = {k: v.lower() for k, v in KNOWN_POLICIES.items()}
+
+# Declarative, machine-checkable form of each policy (compiled by rules.py).
+# Column selection:
+#   "columns": exact names, "name_contains": substrings of the column name,
+#   "dtype": "numeric" for every numeric column, "date" for every date-like
+#   column (dates.is_date_like); "exclude" removes names.
+# Checks:
+#   "pattern"      non-null values must fully match "pattern"
+#   "not_null"     values must not be null
+#   "unique"       no duplicate rows over the selected columns (keep-first)
+#   "non_negative" numeric values must be >= 0
+#   "not_future"   dates must not be later than today
+POLICY_RULES = {
+    "RAG-P1": {"check": "pattern", "name_contains": ["email"], "pattern": r"[^@\s]+@[^@\s]+\.[^@\s]+"},
+    "RAG-P2": {"check": "pattern", "name_contains": ["phone"], "pattern": r"[0-9\s\-()]+"},
+    "RAG-P3": {"check": "not_null", "columns": ["email", "phone"]},
+    "RAG-P4": {"check": "unique", "columns": ["id"]},
+    "RAG-P5": {"check": "non_negative", "dtype": "numeric", "exclude": ["id"]},
+    "RAG-P6": {"check": "not_future", "dtype": "date"},
+    "RAG-P7": {"check": "not_null", "dtype": "any"},
+}
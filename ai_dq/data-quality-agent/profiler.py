@@ -0,0 +1,238 @@
+# profiler.py
+# Single-pass, mergeable profiler behind analyze_data.
+# Each chunk is reduced to a ProfileState (counts, min/max, null counts and
+# the set of row hashes); states merge across chunks and worker processes,
+# so a file of any size is profiled with one streaming scan.
+import copy
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from data_io import iter_batches, BATCH_ROWS
+
+EMAIL_PATTERN = r"[^@]+@[^@]+\.[^@]+"
+
+
+def email_invalid_count(s):
+    # treat NaN as invalid for format counts
+    return int((~s.astype(str).str.match(EMAIL_PATTERN)).sum())
+
+
+def price_negative_count(s):
+    # per value: a non-numeric entry (e.g. an imputed "") must not hide the
+    # negatives elsewhere in the column, or delta and full profiles disagree
+    return int((pd.to_numeric(s, errors="coerce") < 0).sum())
+
+
+def row_hashes(df, subset=None):
+    # 64-bit hash per row. Numeric columns are hashed as float64 (+0.0 folds
+    # -0.0 into 0.0) so equal values hash identically when chunks infer int vs float.
+    frame = df[subset] if subset else df
+    norm = {}
+    for col in frame.columns:
+        s = frame[col]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            norm[col] = s.astype("float64") + 0.0
+    if norm:
+        frame = frame.assign(**norm)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _merge_dtype(a, b):
+    if a is None or a == b:
+        return b
+    try:
+        return str(np.promote_types(np.dtype(a), np.dtype(b)))
+    except TypeError:
+        pass
+    # nullable ints from typed CSV loading: Int8 + int64 -> Int64
+    if a.lower().startswith("int") and b.lower().startswith("int"):
+        return str(np.promote_types(a.lower(), b.lower())).capitalize()
+    return "object"
+
+
+class ProfileState:
+    def __init__(self, track_hashes=True):
+        self.num_rows = 0
+        self.track_hashes = track_hashes
+        self.schema = {}
+        self.null_counts = {}
+        self.mins = {}
+        self.maxs = {}
+        self.hashes = np.empty(0, dtype=np.uint64)   # distinct row hashes (sorted)
+        self.counts = np.empty(0, dtype=np.int64)    # rows per distinct hash
+        self._pending = []                           # per-chunk (hashes, counts) not yet merged
+        self._pending_len = 0
+        self.email_invalid = None
+        self.price_negative = None
+
+    def update(self, df):
+        self.num_rows += int(len(df))
+        for col in df.columns:
+            s = df[col]
+            self.schema[col] = _merge_dtype(self.schema.get(col), str(s.dtype))
+            self.null_counts[col] = self.null_counts.get(col, 0) + int(s.isna().sum())
+            if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) and s.notna().any():
+                lo, hi = s.min(), s.max()
+                self.mins[col] = lo if col not in self.mins else min(self.mins[col], lo)
+                self.maxs[col] = hi if col not in self.maxs else max(self.maxs[col], hi)
+            if col == "email":
+                self.email_invalid = (self.email_invalid or 0) + email_invalid_count(s)
+            elif col == "price":
+                self.price_negative = (self.price_negative or 0) + price_negative_count(s)
+        if self.track_hashes:
+            self._add_hashes(*np.unique(row_hashes(df), return_counts=True))
+        return self
+
+    def _add_hashes(self, arr, counts):
+        # Buffer chunk hashes and compact once the buffer outgrows the merged
+        # set, so the total sort cost stays O(n log n) over the whole scan.
+        self._pending.append((arr, counts))
+        self._pending_len += len(arr)
+        if self._pending_len > len(self.hashes):
+            self._compact()
+
+    def _compact(self):
+        if self._pending:
+            h = np.concatenate([self.hashes] + [p[0] for p in self._pending])
+            c = np.concatenate([self.counts] + [p[1] for p in self._pending])
+            self.hashes, inv = np.unique(h, return_inverse=True)
+            self.counts = np.bincount(inv, weights=c, minlength=len(self.hashes)).astype(np.int64)
+            self._pending = []
+            self._pending_len = 0
+        return self.hashes
+
+    def hash_counts(self, hashes):
+        # rows currently holding each of the given hashes (0 if unseen)
+        self._compact()
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return np.where(self.hashes[pos] == hashes, self.counts[pos], 0)
+
+    def distinct_rows(self):
+        return len(self._compact())
+
+    def merge(self, other):
+        self.num_rows += other.num_rows
+        for col, dt in other.schema.items():
+            self.schema[col] = _merge_dtype(self.schema.get(col), dt)
+        for col, n in other.null_counts.items():
+            self.null_counts[col] = self.null_counts.get(col, 0) + n
+        for col, v in other.mins.items():
+            self.mins[col] = v if col not in self.mins else min(self.mins[col], v)
+        for col, v in other.maxs.items():
+            self.maxs[col] = v if col not in self.maxs else max(self.maxs[col], v)
+        if self.track_hashes:
+            other._compact()
+            self._add_hashes(other.hashes, other.counts)
+        if other.email_invalid is not None:
+            self.email_invalid = (self.email_invalid or 0) + other.email_invalid
+        if other.price_negative is not None:
+            self.price_negative = (self.price_negative or 0) + other.price_negative
+        return self
+
+    def to_profile(self):
+        rows = self.num_rows
+        profile = {}
+        profile["num_rows"] = int(rows)
+        profile["schema"] = dict(self.schema)
+        profile["null_counts"] = {col: int(n) for col, n in self.null_counts.items()}
+        profile["null_percent"] = {col: float(n / rows) if rows else float("nan") for col, n in self.null_counts.items()}
+        profile["dup_rows"] = int(rows - self.distinct_rows()) if self.track_hashes else None
+        invalids = {}
+        if self.email_invalid is not None:
+            invalids["email_invalid_count"] = int(self.email_invalid)
+        if self.price_negative is not None:
+            invalids["price_negative_count"] = int(self.price_negative)
+        profile["invalids"] = invalids
+        return profile
+
+
+def _profile_chunk(df, track_hashes=True):
+    return ProfileState(track_hashes).update(df)
+
+
+def profile_frame(df, chunk_rows=BATCH_ROWS):
+    state = ProfileState()
+    if len(df) <= chunk_rows:
+        return state.update(df)
+    for start in range(0, len(df), chunk_rows):
+        state.update(df.iloc[start:start + chunk_rows])
+    return state
+
+
+def profile_file(path, columns=None, batch_rows=BATCH_ROWS, workers=1, track_hashes=True):
+    # One streaming scan over the file; with workers > 1 chunks are profiled
+    # in a process pool (at most 2 * workers chunks in flight) and merged.
+    state = ProfileState(track_hashes)
+    if workers <= 1:
+        for chunk in iter_batches(path, columns=columns, batch_rows=batch_rows):
+            state.update(chunk)
+        return state
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in iter_batches(path, columns=columns, batch_rows=batch_rows):
+            pending.append(pool.submit(_profile_chunk, chunk, track_hashes))
+            if len(pending) >= 2 * workers:
+                state.merge(pending.pop(0).result())
+        for fut in pending:
+            state.merge(fut.result())
+    return state
+
+
+def _dtype_family_changed(before, after):
+    # hashes stay comparable across int/float changes, not across numeric <-> object
+    num = pd.api.types.is_numeric_dtype
+    return str(before.dtype) != str(after.dtype) and not (num(before) and num(after))
+
+
+def delta_profile(before_profile, before_df, after_df, changes, before_state=None):
+    # Update an existing profile for what apply_fixes changed instead of
+    # re-profiling after_df: only dropped rows and changed cells are read.
+    # changes: {"dropped": positions in before_df, "columns": {col: positions}}
+    n_before = len(before_df)
+    dropped = np.asarray(changes.get("dropped", []), dtype=np.int64)
+    changed = {c: np.asarray(p, dtype=np.int64) for c, p in changes.get("columns", {}).items()}
+    kept = np.ones(n_before, dtype=bool)
+    kept[dropped] = False
+    kept_pos = np.flatnonzero(kept)
+
+    def after_rows(col, pos):
+        # before positions -> values in after_df
+        return after_df[col].iloc[np.searchsorted(kept_pos, pos)]
+
+    profile = copy.deepcopy(before_profile)
+    rows = int(len(kept_pos))
+    profile["num_rows"] = rows
+    for col in before_df.columns:
+        pos = changed.get(col, np.empty(0, dtype=np.int64))
+        n = profile["null_counts"][col] - int(before_df[col].iloc[dropped].isna().sum())
+        n += int(after_rows(col, pos).isna().sum()) - int(before_df[col].iloc[pos].isna().sum())
+        profile["null_counts"][col] = n
+        profile["null_percent"][col] = float(n / rows) if rows else float("nan")
+        if col in changed:
+            profile["schema"][col] = str(after_df[col].dtype)
+
+    for key, col, count in (("email_invalid_count", "email", email_invalid_count),
+                            ("price_negative_count", "price", price_negative_count)):
+        if key in profile.get("invalids", {}):
+            pos = changed.get(col, np.empty(0, dtype=np.int64))
+            gone = before_df[col].iloc[np.concatenate([dropped, pos])]
+            profile["invalids"][key] += count(after_rows(col, pos)) - count(gone)
+
+    # duplicates: adjust the per-hash row counts for the affected rows only
+    if before_state is None or not before_state.track_hashes or any(
+            _dtype_family_changed(before_df[c], after_df[c]) for c in changed):
+        profile["dup_rows"] = int(rows - len(np.unique(row_hashes(after_df))))
+        return profile
+    touched = np.unique(np.concatenate([dropped] + list(changed.values())))
+    readded = touched[kept[touched]]
+    removed = row_hashes(before_df.iloc[touched])
+    added = row_hashes(after_df.iloc[np.searchsorted(kept_pos, readded)])
+    keys, inv = np.unique(np.concatenate([removed, added]), return_inverse=True)
+    delta = np.bincount(inv[len(removed):], minlength=len(keys)) - np.bincount(inv[:len(removed)], minlength=len(keys))
+    old = before_state.hash_counts(keys)
+    new = old + delta
+    distinct = before_state.distinct_rows() - int(((old > 0) & (new == 0)).sum()) + int(((old == 0) & (new > 0)).sum())
+    profile["dup_rows"] = int(rows - distinct)
+    return profile
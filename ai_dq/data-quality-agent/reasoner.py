@@ -1,15 +1,21 @@
 # reasoner.py
+import os
 import subprocess
 import json
 import re
 import requests
-from prompts import REASONER_SYSTEM_PROMPT
+from prompts import REASONER_SYSTEM_PROMPT, REVISE_SYSTEM_PROMPT
 from rag import get_combined_rag_text, rag_query
 from policies import KNOWN_POLICIES, KNOWN_POLICIES_LOWER
+from planner import count_usage
 
-def llama_run(prompt_text):
+# Ollama server; point OLLAMA_HOST at mock_ollama.py for offline runs
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
+def llama_run(prompt_text, usage=None, timeout=300):
+    # usage (dict): prompt/completion token counts are added to it
     try:
-        new_api_url = "http://localhost:11434/v1/chat/completions"
+        new_api_url = f"{OLLAMA_HOST}/v1/chat/completions"
         response = requests.post(
             new_api_url,
             json={
@@ -18,13 +24,16 @@ def llama_run(prompt_text):
                     {"role": "user", "content": prompt_text}
                 ]
             },
-            timeout=300
+            timeout=timeout
         )
 
         if response.status_code == 200:
             data = response.json()
             print(data)
-            return data["choices"][0]["message"]["content"].strip()
+            content = data["choices"][0]["message"]["content"].strip()
+            if usage is not None:
+                count_usage(usage, data, prompt_text, content)
+            return content
 
     except Exception as e:
         print(e)
@@ -67,7 +76,28 @@ def _validate_proposed_schema(obj):
                 return False
     return True
 
-def reasoner_agent(profile, plan_steps, dataset_name=None):
+def _policy_context(dataset_name=None):
+    # combined RAG text relevant to the dataset, and the inventory of known
+    # policy quotes found in it ("RAG-P1: ..." lines)
+    query = f"data quality best practices for dataset: {dataset_name}" if dataset_name else "data quality best practices"
+    rag_text = get_combined_rag_text(query=query, n_results=6).strip()
+    rag_text_lower = rag_text.lower()
+    inventory_lines = [f"{pid}: {KNOWN_POLICIES[pid]}" for pid, phrase_lower in KNOWN_POLICIES_LOWER.items()
+                       if phrase_lower in rag_text_lower]
+    inventory_text = "\n".join(inventory_lines) if inventory_lines else "No direct policy quotes found."
+    return rag_text, inventory_text
+
+
+def _ground_refs(candidate, rag_text_lower):
+    # keep only policy_refs whose known quote exists in the RAG text
+    for fx in candidate["proposed_fixes"]:
+        fx["policy_refs"] = [pr for pr in fx.get("policy_refs", [])
+                             if pr.get("policy_id") in KNOWN_POLICIES
+                             and KNOWN_POLICIES[pr.get("policy_id")].lower() in rag_text_lower]
+    return candidate
+
+
+def reasoner_agent(profile, plan_steps, dataset_name=None, usage=None):
     """
     Steps:
     1) Obtain combined RAG text relevant to dataset
@@ -75,23 +105,11 @@ def reasoner_agent(profile, plan_steps, dataset_name=None):
     3) Pass profile + plan + matched policy phrases to LLM and ask for JSON
     4) Validate schema and ensure every policy_ref quote actually exists in combined text.
     """
-    # 1) retrieve RAG context relevant to dataset or generic DQ
-    query = f"data quality best practices for dataset: {dataset_name}" if dataset_name else "data quality best practices"
-    rag_text = get_combined_rag_text(query=query, n_results=6).strip()
+    # 1-2) RAG context relevant to dataset or generic DQ, and the known
+    # policy phrases it contains (exact substring, lowercase)
+    rag_text, inventory_text = _policy_context(dataset_name)
     rag_text_lower = rag_text.lower()
 
-    # 2) match known policies by exact substring (lowercase)
-    matched_policies = []
-    for pid, phrase_lower in KNOWN_POLICIES_LOWER.items():
-        if phrase_lower in rag_text_lower:
-            matched_policies.append({"policy_id": pid, "quote": KNOWN_POLICIES[pid]})
-
-    # Build inventory string for the model to use (explicit list)
-    inventory_lines = []
-    for mp in matched_policies:
-        inventory_lines.append(f"{mp['policy_id']}: {mp['quote']}")
-    inventory_text = "\n".join(inventory_lines) if inventory_lines else "No direct policy quotes found."
-
     prompt = f"""
 {REASONER_SYSTEM_PROMPT}
 
@@ -113,7 +131,7 @@ Instructions:
 - If no matched policy supports a needed fix, do NOT propose it; instead add to questions_to_user.
 - Output STRICT JSON only, matching the schema defined earlier.
 """
-    raw = llama_run(prompt)
+    raw = llama_run(prompt, usage=usage)
 
     # Attempt to parse JSON out of output robustly
     try:
@@ -144,13 +162,59 @@ Instructions:
         return {"proposed_fixes": [], "questions_to_user": [{"question": "No conservative fix could be produced with policy grounding; please advise.", "related_columns": []}]}
 
     # Final sanity: ensure every quote exists in rag_text (case-insensitive)
-    for fx in candidate["proposed_fixes"]:
-        valid_refs = []
-        for pr in fx.get("policy_refs", []):
-            pid = pr.get("policy_id")
-            quote = pr.get("quote", "")
-            if pid in KNOWN_POLICIES and KNOWN_POLICIES[pid].lower() in rag_text_lower:
-                valid_refs.append(pr)
-        fx["policy_refs"] = valid_refs
+    return _ground_refs(candidate, rag_text_lower)
 
-    return candidate
+
+def _fix_columns(fixes):
+    cols = []
+    for fx in fixes:
+        params = fx.get("params") or {}
+        cols += [params["column"]] if params.get("column") else []
+        cols += list(params.get("subset") or [])
+    return cols
+
+
+def _profile_excerpt(profile, columns):
+    # the profile restricted to the given columns: per-column maps are
+    # filtered, dataset-level counts kept
+    out = {}
+    columns = set(columns) or set(profile.get("schema", {}))
+    for key, value in profile.items():
+        if isinstance(value, dict) and set(value) & set(profile.get("schema", {})):
+            out[key] = {c: v for c, v in value.items() if c in columns}
+        elif not isinstance(value, (dict, list)) or key in ("invalids", "policy_violations"):
+            out[key] = value
+    return out
+
+
+def reasoner_revise(profile, fixes, dataset_name=None, usage=None, timeout=300):
+    """
+    Re-ask only for fixes the critic rejected. Each fix carries the critic's
+    notes under "critic_notes"; the prompt holds those fixes, the profile of
+    the columns they touch and the policy inventory, not the whole profile
+    and RAG snippets. Returns the reasoner schema with the revised fixes
+    (same ids); fixes the model gives up on come back as questions.
+    """
+    rag_text, inventory_text = _policy_context(dataset_name)
+    prompt = f"""
+{REVISE_SYSTEM_PROMPT}
+
+REJECTED FIXES:
+{json.dumps(fixes, indent=2)}
+
+DATASET PROFILE (columns of these fixes):
+{json.dumps(_profile_excerpt(profile, _fix_columns(fixes)), indent=2)}
+
+MATCHED_POLICY_INVENTORY:
+{inventory_text}
+"""
+    raw = llama_run(prompt, usage=usage, timeout=timeout)
+    candidate = extract_json(raw)
+    if not candidate or not _validate_proposed_schema(candidate):
+        return {"proposed_fixes": [], "questions_to_user": [
+            {"question": f"Fix {fx.get('id')} could not be revised: {fx.get('critic_notes', '')}", "related_columns": _fix_columns([fx])}
+            for fx in fixes]}
+    ids = {fx.get("id") for fx in fixes}
+    candidate["proposed_fixes"] = [fx for fx in candidate["proposed_fixes"] if fx.get("id") in ids]
+    candidate.setdefault("questions_to_user", [])
+    return _ground_refs(candidate, rag_text.lower())
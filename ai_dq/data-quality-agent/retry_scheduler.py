@@ -0,0 +1,131 @@
+# retry_scheduler.py
+# Bounded retries for safety mode B. Instead of running planner + reasoner +
+# critic again on the whole plan, only the fixes the critic rejected go back
+# to the reasoner (reasoner_revise), one request per fix carrying that fix's
+# critic notes, sent concurrently. Accepted fixes are kept as they are.
+# Rounds stop when nothing is rejected, after max_rounds, or when the time
+# or token budget of the scheduler (shared by every retry of one run) is
+# used up; fixes still rejected then are dropped from the plan and listed
+# as questions for the user.
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from reasoner import reasoner_revise
+from critic import critic_validate_plan
+
+MAX_ROUNDS = 2
+TIME_BUDGET = 900.0         # seconds for all retries of a run
+TOKEN_BUDGET = 30_000       # prompt + completion tokens for all retries of a run
+WORKERS = 4                 # concurrent re-asks
+EST_TOKENS = 1_500          # expected tokens per re-ask until one has been measured
+
+
+class RetryScheduler:
+    def __init__(self, max_rounds=MAX_ROUNDS, time_budget=TIME_BUDGET, token_budget=TOKEN_BUDGET, workers=WORKERS):
+        self.max_rounds = max_rounds
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+        self.workers = workers
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.requests = 0
+        self.rounds = 0
+
+    def remaining_time(self):
+        return self.time_budget - (time.monotonic() - self.started)
+
+    def remaining_tokens(self):
+        return self.token_budget - self.tokens
+
+    def exhausted(self):
+        return self.remaining_time() <= 0 or self.remaining_tokens() <= 0
+
+    def charge(self, usage):
+        # usage: token counts filled in by llama_run
+        self.tokens += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+    def stats(self):
+        return {"rounds": self.rounds, "requests": self.requests, "tokens": self.tokens,
+                "seconds": round(time.monotonic() - self.started, 1)}
+
+    def _per_request(self):
+        return self.tokens / self.requests if self.requests else EST_TOKENS
+
+    def _ask(self, profile, fix, dataset_name):
+        usage = {}
+        out = reasoner_revise(profile, [fix], dataset_name=dataset_name, usage=usage,
+                              timeout=max(1.0, self.remaining_time()))
+        return out, usage
+
+    def _rounds(self, profile, rejected, dataset_name):
+        # rejected: fixes with their critic notes under "critic_notes".
+        # Returns (accepted fixes, their critic entries, fixes still
+        # rejected, questions from the reasoner).
+        accepted, entries, questions, gave_up = [], [], [], []
+        while rejected and self.rounds < self.max_rounds and not self.exhausted():
+            # as many re-asks as the token budget is expected to cover
+            batch = rejected[:max(0, int(self.remaining_tokens() // self._per_request()))]
+            if not batch:
+                break
+            self.rounds += 1
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batch))) as pool:
+                futures = [pool.submit(self._ask, profile, fx, dataset_name) for fx in batch]
+                results = [f.result() for f in futures]
+            revised = []
+            for out, usage in results:
+                self.requests += 1
+                self.charge(usage)
+                revised += out.get("proposed_fixes", [])
+                questions += out.get("questions_to_user", [])
+            validated = critic_validate_plan(profile, {"proposed_fixes": revised}, dataset_name=dataset_name)
+            verdicts = {v.get("id"): v for v in validated.get("validated_fixes", [])}
+            ids = Counter(fx.get("id") for fx in revised)
+            still = []
+            for fx in revised:
+                # a verdict is only trusted for a fix it names unambiguously;
+                # no id, a duplicate id or no verdict -> still rejected
+                v = verdicts.get(fx.get("id")) if fx.get("id") is not None and ids[fx.get("id")] == 1 else None
+                if v is not None and v.get("status") == "accepted":
+                    accepted.append(fx)
+                    entries.append(v)
+                elif v is not None:
+                    still.append(dict(fx, critic_notes=v.get("notes")))
+                else:
+                    still.append(dict(fx, critic_notes="no critic verdict for this fix (missing or duplicate id)"))
+            # left out by the reasoner: no policy supports them, not asked again
+            gave_up += [fx for fx in batch if fx.get("id") not in ids]
+            # not sent this round (budget) -> still rejected as they were
+            rejected = still + rejected[len(batch):]
+        return accepted, entries, rejected + gave_up, questions
+
+    def revise(self, profile, plan, validated, dataset_name=None):
+        # Pre-execution: plan is the reasoner output, validated the critic's
+        # verdict on it. Returns (plan, validated) for the kept and revised
+        # fixes; "dropped" lists the ids given up on.
+        proposed = {fx.get("id"): fx for fx in plan.get("proposed_fixes", [])}
+        kept = [v for v in validated.get("validated_fixes", []) if v.get("status") == "accepted"]
+        rejected = [dict(proposed.get(v.get("id"), v), critic_notes=v.get("notes"))
+                    for v in validated.get("validated_fixes", []) if v.get("status") != "accepted"]
+        accepted, entries, still, questions = self._rounds(profile, rejected, dataset_name)
+        fixes = [proposed[v.get("id")] for v in kept if v.get("id") in proposed] + accepted
+        questions = list(plan.get("questions_to_user", [])) + questions + [
+            {"question": f"Fix {fx.get('id')} ({fx.get('action')}) is still rejected: {fx.get('critic_notes')}",
+             "related_columns": []} for fx in still]
+        return ({"proposed_fixes": fixes, "questions_to_user": questions},
+                {"validated_fixes": kept + entries, "overall_decision": "accept" if fixes else "revise",
+                 "suggested_changes": validated.get("suggested_changes", []), "dropped": [fx.get("id") for fx in still]})
+
+    def revise_results(self, profile, plan, post_validation, dataset_name=None):
+        # Post-execution: re-ask for the fixes that cited a policy the result
+        # check failed on, with its notes; profile is the post-fix profile.
+        # Returns (plan, validated) for the revised fixes only, or None when
+        # no fix is implicated (the caller re-plans from scratch).
+        failed = set(post_validation.get("failed_policies", []))
+        implicated = [dict(fx, critic_notes=post_validation.get("notes")) for fx in plan.get("proposed_fixes", [])
+                      if failed & {pr.get("policy_id") for pr in fx.get("policy_refs", [])}]
+        if not implicated:
+            return None
+        accepted, entries, still, questions = self._rounds(profile, implicated, dataset_name)
+        return ({"proposed_fixes": accepted, "questions_to_user": questions},
+                {"validated_fixes": entries, "overall_decision": "accept" if accepted else "revise",
+                 "suggested_changes": [], "dropped": [fx.get("id") for fx in still]})
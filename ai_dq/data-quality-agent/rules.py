@@ -0,0 +1,116 @@
+# rules.py
+# Compiles the declarative POLICY_RULES (policies.py) into vectorized boolean
+# violation masks and evaluates them in one batched pass: every rule is
+# resolved to the columns it applies to, and each column's derived views
+# (null mask, string, numeric, datetime) are computed once and shared by all
+# rules that read it.
+import numpy as np
+import pandas as pd
+from policies import POLICY_RULES
+from dedup import keep_first_mask
+from dates import is_date_like, parse_dates, future_date_mask
+
+SAMPLE_ROWS = 5
+
+
+def resolve_columns(rule, columns):
+    cols = list(columns)
+    if "columns" in rule:
+        picked = [c for c in rule["columns"] if c in cols]
+    elif "name_contains" in rule:
+        picked = [c for c in cols if any(k in c.lower() for k in rule["name_contains"])]
+    else:
+        picked = cols
+    return [c for c in picked if c not in rule.get("exclude", [])]
+
+
+class ColumnViews:
+    # per-column conversions shared across rules within one evaluation
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+
+    def _get(self, kind, col, fn):
+        key = (kind, col)
+        if key not in self._cache:
+            self._cache[key] = fn(self.df[col])
+        return self._cache[key]
+
+    def isna(self, col):
+        return self._get("isna", col, lambda s: s.isna().to_numpy())
+
+    def text(self, col):
+        return self._get("text", col, lambda s: s.astype("string"))
+
+    def numeric(self, col):
+        return self._get("numeric", col, lambda s: s if pd.api.types.is_numeric_dtype(s)
+                         else pd.to_numeric(s, errors="coerce"))
+
+    def dates(self, col):
+        return self._get("dates", col, parse_dates)
+
+
+def _column_mask(rule, col, views, cutoff):
+    check = rule["check"]
+    if check == "not_null":
+        return views.isna(col)
+    if check == "pattern":
+        ok = views.text(col).str.fullmatch(rule["pattern"]).fillna(True)
+        return ~ok.to_numpy(dtype=bool)
+    if check == "non_negative":
+        return (views.numeric(col) < 0).to_numpy(dtype=bool, na_value=False)
+    if check == "not_future":
+        return future_date_mask(views.df[col], views.dates(col), cutoff)
+    raise ValueError(f"Unknown rule check '{check}'")
+
+
+def compile_rules(df, policy_ids=None, rules=None):
+    # -> list of (policy_id, rule, [columns]) for the rules that apply to df
+    rules = rules or POLICY_RULES
+    compiled = []
+    for pid, rule in rules.items():
+        if policy_ids is not None and pid not in policy_ids:
+            continue
+        cols = resolve_columns(rule, df.columns)
+        if rule.get("dtype") == "numeric":
+            cols = [c for c in cols if pd.api.types.is_numeric_dtype(df[c])]
+        elif rule.get("dtype") == "date":
+            cols = [c for c in cols if is_date_like(df[c], c)]
+        if cols:
+            compiled.append((pid, rule, cols))
+    return compiled
+
+
+def evaluate_rules(df, policy_ids=None, sample_n=SAMPLE_ROWS, columns=None, rules=None):
+    # Returns {policy_id: {"check", "columns", "violations", "per_column", "sample_rows"}}.
+    # columns: optionally restrict evaluation to these columns.
+    views = ColumnViews(df)
+    cutoff = pd.Timestamp.now().normalize() + pd.Timedelta(days=1)   # start of tomorrow
+    report = {}
+    for pid, rule, cols in compile_rules(df, policy_ids, rules):
+        if columns is not None:
+            cols = [c for c in cols if c in columns]
+            if not cols:
+                continue
+        if rule["check"] == "unique":
+            mask = ~keep_first_mask(df, cols)
+            per_column = {",".join(cols): int(mask.sum())}
+        else:
+            mask = np.zeros(len(df), dtype=bool)
+            per_column = {}
+            for col in cols:
+                m = _column_mask(rule, col, views, cutoff)
+                per_column[col] = int(m.sum())
+                mask |= m
+        report[pid] = {
+            "check": rule["check"],
+            "columns": cols,
+            "violations": int(mask.sum()),
+            "per_column": per_column,
+            "sample_rows": [int(i) for i in np.flatnonzero(mask)[:sample_n]],
+        }
+    return report
+
+
+def violation_counts(report):
+    return {pid: r["violations"] for pid, r in report.items()}
@@ -0,0 +1,216 @@
+# safe_regex.py
+# Regex execution for regex_clean. Patterns come from the planner (an LLM),
+# so a pattern is compiled once per (pattern, repl) and run by one of two
+# engines:
+# - RE2 through pyarrow.compute.replace_substring_regex: linear time and
+#   vectorized over the column (slices in a thread pool; Arrow releases
+#   the GIL). Used when the pattern translates to RE2
+#   with the same meaning: Python's Unicode \d \w \s become explicit
+#   Unicode classes; \b, lookarounds, backreferences and patterns that
+#   match the empty string (RE2 places empty matches differently) stay on
+#   Python's engine.
+# - Python's re, in a child process under a per-column time budget, so a
+#   pattern that backtracks catastrophically is stopped. When the budget
+#   runs out the fix is skipped and the column keeps its values.
+import os
+import re
+import time
+import importlib.util
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ENGINE = "auto"             # "auto": RE2 when the pattern allows it; "python": always re
+CACHE_SIZE = 256            # compiled (pattern, repl) pairs
+TIME_BUDGET = 30.0          # seconds of Python-engine regex work per column pass
+CHUNK_VALUES = 100_000      # values per task sent to the child process
+WORKERS = min(8, os.cpu_count() or 1)   # threads for the RE2 engine
+MIN_SLICE = 250_000         # fewer values per thread are not worth splitting
+
+# Python's Unicode classes spelled for RE2 (whose \d \w \s are ASCII-only);
+# None = no RE2 equivalent inside a character class
+_CLASSES = {
+    "d": (r"\p{Nd}", r"\p{Nd}"), "D": (r"\P{Nd}", r"\P{Nd}"),
+    "w": (r"[\p{L}\p{N}_]", r"\p{L}\p{N}_"), "W": (r"[^\p{L}\p{N}_]", None),
+    "s": (r"[\s\x0b\x1c-\x1f\x85\p{Z}]", r"\s\x0b\x1c-\x1f\x85\p{Z}"), "S": (r"[^\s\x0b\x1c-\x1f\x85\p{Z}]", None),
+}
+_UNSUPPORTED = set("bBZ0123456789")      # boundaries, anchors and references RE2 treats differently
+_TEMPLATE = re.compile(r"\\(?:g<(\w+)>|(\d+)|(.))|[^\\]+", re.S)
+
+
+class RegexTimeout(Exception):
+    pass
+
+
+def _re2_pattern(pattern):
+    # (RE2 pattern, has an end anchor) or None when it cannot keep Python's meaning
+    out, i, in_class, class_start, anchored = [], 0, False, False, False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            if i + 1 == len(pattern):
+                return None
+            e = pattern[i + 1]
+            if e in _CLASSES:
+                sub = _CLASSES[e][1 if in_class else 0]
+                if sub is None:
+                    return None
+                out.append(sub)
+            elif e in _UNSUPPORTED:
+                return None
+            else:
+                out.append(pattern[i:i + 2])
+            i += 2
+            class_start = False
+            continue
+        if in_class:
+            if c == "]" and not class_start:
+                in_class = False
+            class_start = False
+        elif c == "[":
+            in_class, class_start = True, True
+            out.append(c)
+            i += 1
+            if pattern[i:i + 1] == "^":
+                out.append("^")
+                i += 1
+            continue
+        elif c == "$":
+            anchored = True
+        elif c == "{" and pattern[i + 1:i + 2] == ",":
+            return None     # Python reads {,n} as {0,n}, RE2 as literal text
+        elif c == "(" and pattern[i + 1:i + 2] == "?" and pattern[i + 2:i + 3] not in (":", "P", "i", "s", "m", "-"):
+            return None     # lookarounds, atomic groups, (?a), (?x), ...
+        out.append(c)
+        i += 1
+    return "".join(out), anchored
+
+
+def _re2_rewrite(rx, repl):
+    # Python replacement template as an RE2 rewrite string (\0-\9, \\); None
+    # when it uses something RE2 lacks (escapes like \n, groups past 9)
+    out = []
+    for m in _TEMPLATE.finditer(repl):
+        name, digits, other = m.groups()
+        if name is not None:
+            group = int(name) if name.isdigit() else rx.groupindex.get(name)
+        elif digits is not None:
+            group = None if digits.startswith("0") else int(digits)    # \0.. is an octal escape in Python
+        elif other is not None:
+            if other != "\\":
+                return None
+            out.append("\\\\")
+            continue
+        else:
+            out.append(m.group(0).replace("\\", "\\\\"))
+            continue
+        if group is None or group > min(rx.groups, 9):
+            return None
+        out.append(f"\\{group}")
+    return "".join(out)
+
+
+def _re2_accepts(pattern, rewrite):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    try:
+        pc.replace_substring_regex(pa.array([""], pa.string()), pattern=pattern, replacement=rewrite)
+        return True
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return False
+
+
+def _sub_values(pattern, repl, values):
+    # child process: Python engine over one chunk
+    rx = compile_regex(pattern, repl).rx
+    return [rx.sub(repl, v) for v in values]
+
+
+class CompiledRegex:
+    def __init__(self, pattern, repl):
+        self.pattern, self.repl = pattern, repl
+        self.rx = re.compile(pattern)     # invalid patterns fail here, when the plan is built
+        self.re2 = self.rewrite = None
+        self.anchored = False
+        translated = None if self.rx.search("") else _re2_pattern(pattern)
+        if translated and importlib.util.find_spec("pyarrow"):
+            rewrite = _re2_rewrite(self.rx, repl)
+            if rewrite is not None and _re2_accepts(translated[0], rewrite):
+                (self.re2, self.anchored), self.rewrite = translated, rewrite
+
+    def __call__(self, s):
+        return self.rx.sub(self.repl, s)
+
+    @property
+    def budgeted(self):
+        # may run on Python's engine, i.e. under the per-column time budget
+        return ENGINE != "auto" or self.re2 is None or self.anchored
+
+    def sub_values(self, values, deadline=None):
+        # values: object array of str; deadline (time.monotonic()) bounds the
+        # Python engine. Raises RegexTimeout when it is passed.
+        if not len(values):
+            return values
+        if ENGINE == "auto" and self.re2 is not None:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            arr = pa.array(values, pa.string())
+            # Python's $ also matches before a trailing newline, RE2's does not
+            if not (self.anchored and pc.any(pc.ends_with(arr, "\n")).as_py()):
+                return _re2_sub(arr, self.re2, self.rewrite)
+        return np.array(_python_sub(self.pattern, self.repl, values, deadline), dtype=object)
+
+
+def _re2_sub(arr, pattern, rewrite):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    slices = max(1, min(WORKERS, len(arr) // MIN_SLICE))
+    bounds = np.linspace(0, len(arr), slices + 1).astype(np.int64)
+
+    def sub(i):
+        part = arr.slice(bounds[i], bounds[i + 1] - bounds[i])
+        return pc.replace_substring_regex(part, pattern=pattern, replacement=rewrite)
+
+    if slices == 1:
+        parts = [sub(0)]
+    else:
+        with ThreadPoolExecutor(max_workers=slices) as pool:
+            parts = list(pool.map(sub, range(slices)))
+    return pa.chunked_array(parts, pa.string()).to_numpy().astype(object, copy=False)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_regex(pattern, repl=""):
+    return CompiledRegex(pattern, repl)
+
+
+def re2_translation(pattern, repl=""):
+    # (RE2 pattern, RE2 rewrite) with Python's meaning for engines that run
+    # RE2 themselves (duckdb_engine), or None when there is none
+    try:
+        rx = re.compile(pattern)
+    except re.error:
+        return None
+    translated = None if rx.search("") else _re2_pattern(pattern)
+    rewrite = _re2_rewrite(rx, repl) if translated else None
+    return (translated[0], rewrite) if rewrite is not None else None
+
+
+def _python_sub(pattern, repl, values, deadline=None):
+    # re.sub cannot be interrupted, so the work runs in a child process that
+    # is terminated when the deadline passes
+    deadline = time.monotonic() + TIME_BUDGET if deadline is None else deadline
+    if deadline <= time.monotonic():
+        raise RegexTimeout(pattern)
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    out = []
+    with ctx.Pool(1) as pool:   # leaving the block terminates the child
+        jobs = [pool.apply_async(_sub_values, (pattern, repl, list(values[i:i + CHUNK_VALUES])))
+                for i in range(0, len(values), CHUNK_VALUES)]
+        for job in jobs:
+            try:
+                out.extend(job.get(timeout=max(0.0, deadline - time.monotonic())))
+            except multiprocessing.TimeoutError:
+                raise RegexTimeout(pattern) from None
+    return out
@@ -0,0 +1,229 @@
+# sampling.py
+# Approximate profiling for quick triage of very large tables.
+# Rows are streamed once: every row only feeds cheap vectorized hashes into
+# HyperLogLog sketches (distinct rows / distinct values per column), while
+# the per-row checks (nulls, invalid formats, policy rules) run on a uniform
+# bottom-k reservoir sample, optionally stratified by a column. Estimates
+# come with 95% intervals and the profile is marked "approximate"; when the
+# data fits in the sample the exact profile is returned instead.
+import math
+import numpy as np
+import pandas as pd
+from data_io import load_table, iter_batches, file_format, BATCH_ROWS
+from profiler import profile_frame, row_hashes, email_invalid_count, price_negative_count, _merge_dtype
+from rules import evaluate_rules, compile_rules
+
+SAMPLE_ROWS = 100_000            # reservoir size (per stratum when stratified)
+HLL_P = 14                       # 2^14 registers, ~0.8% relative error
+Z = 1.96                         # 95% confidence
+SEED = 42
+
+
+def wilson_interval(hits, n, z=Z):
+    if n == 0:
+        return 0.0, 1.0
+    p = hits / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _bit_length(x):
+    # exact via frexp: the top 53 bits convert to float64 without rounding;
+    # values below 2^11 report 11 (only ranks above 64 - 11 are affected,
+    # which the register cap removes for p >= 11)
+    return np.frexp((x >> np.uint64(11)).astype(np.float64))[1].astype(np.int64) + 11
+
+
+class HyperLogLog:
+    def __init__(self, p=HLL_P):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        h = np.asarray(hashes, dtype=np.uint64)
+        if not len(h):
+            return self
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h << np.uint64(self.p)
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * self.m and zeros:
+            return self.m * math.log(self.m / zeros)   # linear counting for small cardinalities
+        return raw
+
+
+def _column_hashes(s):
+    s = s.dropna()
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        s = s.astype("float64") + 0.0
+    return pd.util.hash_pandas_object(s, index=False).to_numpy()
+
+
+class SampleState:
+    # Streaming state: exact row/stratum counts and schema, HLL sketches over
+    # all rows, and a bottom-k sample (k smallest random keys) per stratum.
+    def __init__(self, sample_rows=SAMPLE_ROWS, strata=None, seed=SEED):
+        self.k = sample_rows
+        self.strata = strata
+        self.rng = np.random.default_rng(seed)
+        self.num_rows = 0
+        self.schema = {}
+        self.stratum_rows = {}
+        self.samples = {}            # stratum -> (keys, DataFrame)
+        self.rows_hll = HyperLogLog()
+        self.column_hll = {}
+
+    def _offer(self, stratum, keys, frame):
+        if stratum in self.samples:
+            old_keys, old = self.samples[stratum]
+            if len(old_keys) >= self.k:
+                # only rows beating the current k-th key can enter
+                better = keys < old_keys.max()
+                keys, frame = keys[better], frame[better]
+            keys = np.concatenate([old_keys, keys])
+            frame = pd.concat([old, frame], ignore_index=True)
+        if len(keys) > self.k:
+            top = np.argpartition(keys, self.k - 1)[:self.k]
+            keys, frame = keys[top], frame.iloc[top].reset_index(drop=True)
+        self.samples[stratum] = (keys, frame)
+
+    def update(self, df):
+        self.num_rows += int(len(df))
+        for col in df.columns:
+            self.schema[col] = _merge_dtype(self.schema.get(col), str(df[col].dtype))
+            self.column_hll.setdefault(col, HyperLogLog()).add_hashes(_column_hashes(df[col]))
+        self.rows_hll.add_hashes(row_hashes(df))
+        keys = self.rng.random(len(df))
+        if self.strata is None:
+            groups = {"all": np.arange(len(df))}
+        else:
+            groups = df.groupby(df[self.strata].astype(str), dropna=False).indices
+        for stratum, idx in groups.items():
+            self.stratum_rows[stratum] = self.stratum_rows.get(stratum, 0) + len(idx)
+            self._offer(stratum, keys[idx], df.iloc[idx])
+        return self
+
+    def sample(self):
+        return pd.concat([f for _, f in self.samples.values()], ignore_index=True)
+
+    def is_complete(self):
+        return all(len(self.samples[s][0]) == n for s, n in self.stratum_rows.items())
+
+    def _estimate(self, count):
+        # stratum-weighted rate of count(frame) hits, with a Wilson interval
+        n_total = sum(len(k) for k, _ in self.samples.values())
+        if not self.num_rows or not n_total:
+            return 0.0, (0.0, 1.0)
+        p = sum(self.stratum_rows[s] / self.num_rows * count(f) / len(f) for s, (_, f) in self.samples.items())
+        return p, wilson_interval(p * n_total, n_total)
+
+    def to_profile(self):
+        rows = self.num_rows
+        sample = self.sample()
+        profile = {"num_rows": int(rows), "schema": dict(self.schema)}
+        null_counts, null_percent, null_ci = {}, {}, {}
+        for col in self.schema:
+            p, (lo, hi) = self._estimate(lambda f: int(f[col].isna().sum()))
+            null_counts[col] = int(round(p * rows))
+            null_percent[col] = float(p)
+            null_ci[col] = [round(lo, 6), round(hi, 6)]
+        profile["null_counts"] = null_counts
+        profile["null_percent"] = null_percent
+
+        distinct = self.rows_hll.count()
+        err = Z * self.rows_hll.relative_error()
+        profile["dup_rows"] = int(min(rows, max(0, round(rows - distinct))))
+        dup_ci = [int(max(0, rows - distinct * (1 + err))), int(min(rows, max(0, rows - distinct * (1 - err))))]
+
+        invalids, invalids_ci = {}, {}
+        for key, col, count in (("email_invalid_count", "email", email_invalid_count),
+                                ("price_negative_count", "price", price_negative_count)):
+            if col in self.schema:
+                p, (lo, hi) = self._estimate(lambda f: count(f[col]))
+                invalids[key] = int(round(p * rows))
+                invalids_ci[key] = [int(lo * rows), int(math.ceil(hi * rows))]
+        profile["invalids"] = invalids
+
+        # policy rules on the sample; "unique" checks cannot be estimated from
+        # a sample and are left out (dup_rows covers whole-row uniqueness)
+        estimable = [pid for pid, rule, _ in compile_rules(sample) if rule["check"] != "unique"]
+        violations = {pid: 0.0 for pid in estimable}
+        for s, (_, f) in self.samples.items():
+            weight = self.stratum_rows[s] / len(f)
+            for pid, r in evaluate_rules(f, policy_ids=estimable, sample_n=0).items():
+                violations[pid] += r["violations"] * weight
+        profile["policy_violations"] = {pid: int(round(v)) for pid, v in violations.items()}
+
+        profile["approximate"] = True
+        profile["sample_rows"] = int(len(sample))
+        profile["confidence"] = 0.95
+        profile["ci"] = {"null_percent": null_ci, "invalids": invalids_ci, "dup_rows": dup_ci}
+        profile["distinct_rows_estimate"] = int(round(distinct))
+        profile["distinct_estimate"] = {col: int(round(h.count())) for col, h in self.column_hll.items()}
+        if self.strata is not None:
+            profile["strata"] = {"column": self.strata, "rows": {str(s): int(n) for s, n in self.stratum_rows.items()}}
+        return profile
+
+
+def _exact(profile):
+    profile["approximate"] = False
+    return profile
+
+
+def sample_profile_frame(df, sample_rows=SAMPLE_ROWS, strata=None, exact_below=None, seed=SEED):
+    # exact profile when df has at most exact_below rows (default: sample_rows)
+    exact_below = sample_rows if exact_below is None else exact_below
+    if len(df) <= exact_below:
+        profile = profile_frame(df).to_profile()
+        profile["policy_violations"] = {pid: r["violations"] for pid, r in evaluate_rules(df, sample_n=0).items()}
+        return _exact(profile)
+    state = SampleState(sample_rows, strata, seed)
+    for start in range(0, len(df), BATCH_ROWS):
+        state.update(df.iloc[start:start + BATCH_ROWS])
+    return state.to_profile()
+
+
+def _known_rows(path):
+    # row count from file metadata without a scan (None for CSV)
+    fmt = file_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "feather":
+        import pyarrow as pa
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return None
+
+
+def sample_profile_file(path, columns=None, sample_rows=SAMPLE_ROWS, strata=None, exact_below=None,
+                        batch_rows=BATCH_ROWS, seed=SEED):
+    exact_below = sample_rows if exact_below is None else exact_below
+    known = _known_rows(path)
+    if known is not None and known <= exact_below:
+        # fits in the sample: load it and profile it exactly, policy checks included
+        return sample_profile_frame(load_table(path, columns=columns), exact_below=known)
+    state = SampleState(sample_rows, strata, seed)
+    for chunk in iter_batches(path, columns=columns, batch_rows=batch_rows):
+        state.update(chunk)
+    if state.is_complete():
+        # every row made it into the sample (small CSV): profile it exactly
+        return sample_profile_frame(state.sample(), exact_below=state.num_rows)
+    return state.to_profile()
@@ -0,0 +1,340 @@
+# sketches.py
+# Compact per-column sketches kept for every run, so a new file can be
+# compared with earlier ones without reloading them:
+# - HyperLogLog distinct count (sampling.HyperLogLog, 4096 registers)
+# - t-digest quantiles for numeric columns (~COMPRESSION / 2 centroids)
+# - null rate
+# - top-k frequent values for text columns (each batch's TOP_CAPACITY most
+#   frequent values, counts summed across batches and truncated again)
+# - string-length histogram for text columns (power-of-two bins)
+# All sketches merge, so a file can be sketched batch by batch. A run's
+# sketches take a few KB per column in SKETCH_DIR/<dataset>.json (last
+# KEEP_RUNS runs); drift_report compares two runs from the sketches alone.
+import os
+import json
+import time
+import math
+import base64
+import importlib.util
+import numpy as np
+import pandas as pd
+from data_io import iter_batches, BATCH_ROWS
+from profiler import _merge_dtype
+from sampling import HyperLogLog, _column_hashes
+from memory import _dtype_kind, file_lock
+
+SKETCH_DIR = "memory_store/sketches"
+KEEP_RUNS = 30
+HLL_P = 12                  # 4096 registers, ~1.6% relative error
+COMPRESSION = 200           # t-digest scale parameter
+TOP_K = 10                  # values reported / compared
+TOP_CAPACITY = 100          # values kept per sketch
+LENGTH_EDGES = np.array([1, 2, 4, 8, 16, 32, 64, 128, 256, 1024])   # bin i: lengths below LENGTH_EDGES[i]
+QUANTILES = {"p01": 0.01, "p50": 0.5, "p99": 0.99}
+
+# drift thresholds
+NULL_RATE_JUMP = 0.05       # absolute change in null rate
+QUANTILE_RATIO = 2.0        # a quantile grew or shrank at least this much
+DISTINCT_RATIO = 1.5
+TOP_SHIFT = 0.2             # total variation distance between top-k value shares
+LENGTH_SHIFT = 0.2          # total variation distance between length histograms
+ROWS_RATIO = 1.5
+
+
+class TDigest:
+    # Merging t-digest: centroids (mean, weight) sorted by mean; points are
+    # grouped by the integer part of the k1 scale function at their
+    # cumulative weight, which keeps centroids small in the tails.
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = math.inf, -math.inf
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        cum = np.cumsum(weights)
+        mid = (cum - weights / 2) / cum[-1]
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * mid - 1))
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return self
+        self.min, self.max = min(self.min, float(values.min())), max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        if len(other.weights):
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q):
+        if not len(self.weights):
+            return None
+        cum = np.cumsum(self.weights)
+        centers = cum - self.weights / 2
+        return float(np.interp(q * cum[-1], np.r_[0.0, centers, cum[-1]], np.r_[self.min, self.means, self.max]))
+
+    def to_json(self):
+        return {"means": self.means.tolist(), "weights": self.weights.tolist(),
+                "min": self.min if len(self.weights) else None, "max": self.max if len(self.weights) else None}
+
+    @classmethod
+    def from_json(cls, d):
+        t = cls()
+        t.means, t.weights = np.asarray(d["means"], dtype=np.float64), np.asarray(d["weights"], dtype=np.float64)
+        if len(t.weights):
+            t.min, t.max = d["min"], d["max"]
+        return t
+
+
+def _lengths(values):
+    if importlib.util.find_spec("pyarrow"):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        try:
+            return pc.utf8_length(pa.array(values.to_numpy(dtype=object), pa.string())).to_numpy()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass    # not all strings
+    return values.astype(str).str.len().to_numpy()
+
+
+class ColumnSketch:
+    def __init__(self, kind="text"):
+        self.kind = kind            # memory._dtype_kind of the column
+        self.count = 0
+        self.nulls = 0
+        self.hll = HyperLogLog(HLL_P)
+        self.digest = TDigest() if kind in ("int", "float") else None
+        self.top = {} if kind == "text" else None
+        self.lengths = np.zeros(len(LENGTH_EDGES) + 1, dtype=np.int64) if kind == "text" else None
+
+    def _trim(self):
+        if len(self.top) > TOP_CAPACITY:
+            self.top = dict(sorted(self.top.items(), key=lambda kv: -kv[1])[:TOP_CAPACITY])
+
+    def update(self, s):
+        self.count += int(len(s))
+        values = s.dropna()
+        self.nulls += int(len(s) - len(values))
+        hashes = _column_hashes(values)
+        self.hll.add_hashes(hashes)
+        if self.digest is not None:
+            # a later CSV batch may read as text; only its numbers count
+            self.digest.add(pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan))
+        if self.top is not None:
+            # counted by the hashes already computed for the HLL; only the
+            # most frequent ones are looked up as values
+            counts = pd.Series(hashes).value_counts().iloc[:TOP_CAPACITY]
+            pos = np.flatnonzero(np.isin(hashes, counts.index.to_numpy()))
+            top, first = np.unique(hashes[pos], return_index=True)
+            names = dict(zip(top.tolist(), values.iloc[pos[first]].astype(str)))
+            for h, n in counts.items():
+                self.top[names[h]] = self.top.get(names[h], 0) + int(n)
+            self._trim()
+            self.lengths += np.bincount(np.searchsorted(LENGTH_EDGES, _lengths(values), side="right"),
+                                        minlength=len(self.lengths))
+        return self
+
+    def merge(self, other):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.hll.merge(other.hll)
+        if self.digest is not None and other.digest is not None:
+            self.digest.merge(other.digest)
+        if self.top is not None and other.top is not None:
+            for v, n in other.top.items():
+                self.top[v] = self.top.get(v, 0) + n
+            self._trim()
+            self.lengths += other.lengths
+        return self
+
+    def null_rate(self):
+        return self.nulls / self.count if self.count else 0.0
+
+    def summary(self):
+        out = {"kind": self.kind, "null_rate": round(self.null_rate(), 4), "distinct": int(round(self.hll.count()))}
+        if self.digest is not None:
+            out.update({name: self.digest.quantile(q) for name, q in QUANTILES.items()})
+        if self.top is not None:
+            out["top"] = sorted(self.top.items(), key=lambda kv: -kv[1])[:TOP_K]
+        return out
+
+    def to_json(self):
+        d = {"kind": self.kind, "count": self.count, "nulls": self.nulls,
+             "hll": base64.b64encode(self.hll.registers.tobytes()).decode("ascii")}
+        if self.digest is not None:
+            d["digest"] = self.digest.to_json()
+        if self.top is not None:
+            d["top"] = sorted(self.top.items(), key=lambda kv: -kv[1])
+            d["lengths"] = self.lengths.tolist()
+        return d
+
+    @classmethod
+    def from_json(cls, d):
+        sk = cls(d["kind"])
+        sk.count, sk.nulls = d["count"], d["nulls"]
+        sk.hll.registers = np.frombuffer(base64.b64decode(d["hll"]), dtype=np.uint8).copy()
+        if "digest" in d:
+            sk.digest = TDigest.from_json(d["digest"])
+        if "top" in d:
+            sk.top = {v: n for v, n in d["top"]}
+            sk.lengths = np.asarray(d["lengths"], dtype=np.int64)
+        return sk
+
+
+def _update_run(run, df):
+    run["rows"] += int(len(df))
+    for col in df.columns:
+        run["schema"][col] = _merge_dtype(run["schema"].get(col), str(df[col].dtype))
+        if col not in run["columns"]:
+            run["columns"][col] = ColumnSketch(_dtype_kind(df[col].dtype))
+        run["columns"][col].update(df[col])
+    return run
+
+
+def sketch_frame(df):
+    # {"rows", "schema", "columns": {col: ColumnSketch}}
+    return _update_run({"rows": 0, "schema": {}, "columns": {}}, df)
+
+
+def sketch_file(path, batch_rows=BATCH_ROWS):
+    # same, streaming the file in batches
+    run = {"rows": 0, "schema": {}, "columns": {}}
+    for batch in iter_batches(path, batch_rows=batch_rows):
+        _update_run(run, batch)
+    return run
+
+
+def _run_json(run):
+    return {"timestamp": run.get("timestamp", int(time.time())), "rows": run["rows"], "schema": run["schema"],
+            "columns": {c: sk.to_json() for c, sk in run["columns"].items()}}
+
+
+def _run_from_json(d):
+    return {"timestamp": d["timestamp"], "rows": d["rows"], "schema": d["schema"],
+            "columns": {c: ColumnSketch.from_json(sk) for c, sk in d["columns"].items()}}
+
+
+def _history_path(dataset):
+    return os.path.join(SKETCH_DIR, dataset + ".json")
+
+
+def load_runs(dataset):
+    # earlier runs of dataset, oldest first
+    try:
+        with open(_history_path(dataset), "r", encoding="utf-8") as f:
+            return [_run_from_json(d) for d in json.load(f)["runs"]]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def save_run(dataset, run):
+    os.makedirs(SKETCH_DIR, exist_ok=True)
+    path = _history_path(dataset)
+    with file_lock(path):   # concurrent runs of the same dataset (service.py)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                runs = json.load(f)["runs"]
+        except (OSError, ValueError, KeyError):
+            runs = []
+        runs = (runs + [_run_json(run)])[-KEEP_RUNS:]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs}, f)
+        os.replace(tmp, path)
+
+
+def _fmt(v):
+    return f"{v:,.4g}" if isinstance(v, float) else f"{v:,}"
+
+
+def _ratio_words(r):
+    for n, word in ((2, "doubled"), (3, "tripled"), (4, "quadrupled")):
+        if abs(r - n) <= 0.1 * n:
+            return word
+    if abs(r - 0.5) <= 0.05:
+        return "halved"
+    return f"fell x{r:.2f}" if r < 1 else f"grew x{r:.1f}"
+
+
+def _tvd(p, q):
+    # total variation distance between two distributions (arrays of shares)
+    return float(np.abs(p - q).sum() / 2)
+
+
+def _finding(column, metric, before, after, message):
+    return {"column": column, "metric": metric, "before": before, "after": after, "message": message}
+
+
+def _column_drift(col, a, b):
+    out = []
+    ra, rb = a.null_rate(), b.null_rate()
+    if abs(rb - ra) >= NULL_RATE_JUMP:
+        verb = "jumped" if rb > ra else "dropped"
+        out.append(_finding(col, "null_rate", round(ra, 4), round(rb, 4), f"{col} null rate {verb} {ra:.1%} -> {rb:.1%}"))
+    da, db = a.hll.count(), b.hll.count()
+    if min(da, db) >= 1 and max(da, db) / min(da, db) >= DISTINCT_RATIO:
+        out.append(_finding(col, "distinct", round(da), round(db),
+                            f"{col} distinct values {_ratio_words(db / da)} ({_fmt(round(da))} -> {_fmt(round(db))})"))
+    if a.digest is not None and b.digest is not None:
+        for name, q in QUANTILES.items():
+            qa, qb = a.digest.quantile(q), b.digest.quantile(q)
+            if qa is None or qb is None or qa == qb:
+                continue
+            if qa * qb <= 0:
+                if max(abs(qa), abs(qb)) > 0 and (qa < 0 or qb < 0):
+                    out.append(_finding(col, name, qa, qb, f"{col} {name} crossed zero ({_fmt(qa)} -> {_fmt(qb)})"))
+                continue
+            r = qb / qa
+            if r >= QUANTILE_RATIO or r <= 1 / QUANTILE_RATIO:
+                out.append(_finding(col, name, qa, qb, f"{col} {name} {_ratio_words(r)} ({_fmt(qa)} -> {_fmt(qb)})"))
+    if a.top is not None and b.top is not None:
+        # shares of all non-null values: a near-unique column has tiny shares
+        # and no shift, whatever its top values are
+        sa, sb = max(a.count - a.nulls, 1), max(b.count - b.nulls, 1)
+        top_a = {v: n / sa for v, n in a.summary()["top"]}
+        top_b = {v: n / sb for v, n in b.summary()["top"]}
+        values = sorted(set(top_a) | set(top_b), key=lambda v: -abs(top_b.get(v, 0) - top_a.get(v, 0)))
+        shift = _tvd(np.array([top_a.get(v, 0) for v in values]), np.array([top_b.get(v, 0) for v in values]))
+        if shift >= TOP_SHIFT:
+            detail = ", ".join(f"{v!r} {top_a.get(v, 0):.0%} -> {top_b.get(v, 0):.0%}" for v in values[:2])
+            out.append(_finding(col, "top_values", round(shift, 3), None, f"{col} frequent values shifted ({detail})"))
+        shift = _tvd(a.lengths / max(a.lengths.sum(), 1), b.lengths / max(b.lengths.sum(), 1)) if a.lengths.sum() and b.lengths.sum() else 0.0
+        if shift >= LENGTH_SHIFT:
+            out.append(_finding(col, "lengths", round(shift, 3), None,
+                                f"{col} string lengths shifted (distance {shift:.2f})"))
+    return out
+
+
+def drift_report(before, after):
+    # findings (dicts with a readable "message") between two runs' sketches
+    out = []
+    if min(before["rows"], after["rows"]) and max(before["rows"], after["rows"]) / min(before["rows"], after["rows"]) >= ROWS_RATIO:
+        out.append(_finding(None, "rows", before["rows"], after["rows"],
+                            f"row count {_ratio_words(after['rows'] / before['rows'])} ({_fmt(before['rows'])} -> {_fmt(after['rows'])})"))
+    for col in after["columns"]:
+        if col not in before["columns"]:
+            out.append(_finding(col, "schema", None, after["schema"][col], f"new column {col} ({after['schema'][col]})"))
+            continue
+        a, b = before["columns"][col], after["columns"][col]
+        kinds = {a.kind, b.kind}
+        if kinds == {"datetime", "text"}:
+            continue    # typed load vs a raw CSV read (sketch_file): dates are text there
+        if a.kind != b.kind and kinds != {"int", "float"}:
+            out.append(_finding(col, "schema", before["schema"][col], after["schema"][col],
+                                f"{col} type changed {before['schema'][col]} -> {after['schema'][col]}"))
+            continue
+        out.extend(_column_drift(col, a, b))
+    for col in before["columns"]:
+        if col not in after["columns"]:
+            out.append(_finding(col, "schema", before["schema"][col], None, f"column {col} is gone"))
+    return out
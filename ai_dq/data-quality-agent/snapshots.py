@@ -0,0 +1,308 @@
+# snapshots.py
+# Content-addressed snapshot store behind backup_csv / restore_csv.
+# A snapshot is a small JSON manifest; the data is kept either as a reflink
+# (copy-on-write clone, O(1) on btrfs/XFS/APFS-like filesystems) or, where
+# the filesystem cannot clone, as content-defined chunks stored once by
+# hash, so a file that only grew or changed in places adds just the new
+# chunks; the part before the first change is verified by hash against the
+# previous snapshot instead of being chunked again. An unchanged file (same size, mtime and inode as the last
+# snapshot) reuses that snapshot without reading it. KEEP restore points
+# are kept per source file. Snapshots and restores hold a shared lock on
+# the store and gc an exclusive one, so gc never deletes chunks of a
+# snapshot another process is still writing (its manifest does not exist yet).
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+STORE_DIR = "memory_store/snapshots"
+KEEP = 5                       # restore points per source file
+BLOCK_BYTES = 16 << 20         # read size while chunking
+MIN_CHUNK = 256 << 10
+MAX_CHUNK = 4 << 20
+CHUNK_MASK = (1 << 20) - 1     # ~1 MiB average chunk
+WINDOW = 48                    # bytes in the rolling hash window
+FICLONE = 0x40049409           # Linux ioctl: clone a file (reflink)
+GC_GRACE = 3600                # without flock: gc spares chunks written this recently (seconds)
+WORKERS = min(8, os.cpu_count() or 1)   # threads for cut points and chunk hashing
+
+# random 32-bit value per byte (fixed seed: chunk boundaries must be stable);
+# only the low bits under CHUNK_MASK are tested, so uint32 sums suffice
+_GEAR = np.random.default_rng(0x5EED).integers(0, 2 ** 32, 256, dtype=np.uint32)
+_GEAR16 = _GEAR.astype(np.uint16)
+
+
+def _source_key(path):
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "ino": st.st_ino}
+
+
+def _reflink(src, dst):
+    # True if dst was created as a copy-on-write clone of src
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _boundaries(buf):
+    # ends of the windows whose rolling hash hits the mask. The hash of a
+    # window is a difference of prefix sums of per-byte random values, so it
+    # is computed for the whole buffer in a few vectorized passes: first its
+    # low 16 bits in uint16, then the full mask on those candidates only.
+    b = np.frombuffer(buf, dtype=np.uint8)
+    if len(b) <= WINDOW:
+        return np.empty(0, dtype=np.int64)
+    csum = np.cumsum(_GEAR16[b], dtype=np.uint16)
+    cand = np.flatnonzero(csum[WINDOW:] == csum[:-WINDOW])
+    window = _GEAR[b[cand[:, None] + np.arange(1, WINDOW + 1)]].sum(axis=1, dtype=np.uint32)
+    return cand[(window & np.uint32(CHUNK_MASK)) == 0] + WINDOW + 1
+
+
+def _block_cuts(block, context, offset):
+    # candidate cut offsets (file positions) inside block; context holds the
+    # WINDOW bytes before it so windows spanning two blocks are not missed
+    cuts = _boundaries(context + block) + (offset - len(context))
+    return cuts[cuts > offset]
+
+
+def iter_chunks(path, start=0, workers=WORKERS):
+    # content-defined chunks of MIN_CHUNK..MAX_CHUNK bytes from offset start
+    # (a previous chunk boundary). Blocks are read once, in order; their
+    # candidate cuts are computed in a thread pool (numpy releases the GIL)
+    # while earlier blocks are being cut.
+    with open(path, "rb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        f.seek(start)
+        pending = deque()
+        offset, context = start, b""
+
+        def fill():
+            nonlocal offset, context
+            while len(pending) < 2 * workers:
+                block = f.read(BLOCK_BYTES)
+                if not block:
+                    return
+                pending.append((block, pool.submit(_block_cuts, block, context, offset)))
+                offset += len(block)
+                context = block[-WINDOW:]
+
+        buf, buf_start, last = b"", start, start    # buf holds file bytes [buf_start, buf_start + len(buf))
+        fill()
+        while pending:
+            block, cuts = pending.popleft()
+            buf, buf_start = buf[last - buf_start:] + block, last
+            for cut in cuts.result():
+                while cut - last > MAX_CHUNK:
+                    yield buf[last - buf_start:last - buf_start + MAX_CHUNK]
+                    last += MAX_CHUNK
+                if cut - last >= MIN_CHUNK:
+                    yield buf[last - buf_start:cut - buf_start]
+                    last = cut
+            while buf_start + len(buf) - last > MAX_CHUNK:
+                yield buf[last - buf_start:last - buf_start + MAX_CHUNK]
+                last += MAX_CHUNK
+            fill()
+        while last < buf_start + len(buf):
+            yield buf[last - buf_start:last - buf_start + MAX_CHUNK]
+            last += MAX_CHUNK
+
+
+def shared_prefix(path, chunks):
+    # leading chunks of an earlier snapshot that path still starts with,
+    # checked by hashing (reads, but no chunking). The earlier last chunk
+    # ended at EOF, not at a content boundary, so it is never reused.
+    reused, offset = [], 0
+    with open(path, "rb") as f:
+        for digest, n in chunks[:-1]:
+            data = f.read(n)
+            if len(data) != n or hashlib.blake2b(data, digest_size=20).hexdigest() != digest:
+                break
+            reused.append([digest, n])
+            offset += n
+    return reused, offset
+
+
+def _remove(path):
+    # 1 if removed, 0 if it was already gone
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+class SnapshotStore:
+    def __init__(self, root=STORE_DIR, keep=KEEP):
+        self.root = root
+        self.keep = keep
+        for d in ("objects", "blobs", "manifests"):
+            os.makedirs(os.path.join(root, d), exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive=False):
+        try:
+            import fcntl
+        except ImportError:     # no flock (Windows): gc falls back to GC_GRACE
+            yield False
+            return
+        with open(os.path.join(self.root, "lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _manifest_dir(self, path):
+        d = os.path.join(self.root, "manifests", _source_key(path))
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    def list(self, path):
+        # restore points of path, newest first
+        d = self._manifest_dir(path)
+        out = []
+        for name in sorted(os.listdir(d), reverse=True):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(d, name), "r", encoding="utf-8") as f:
+                        out.append(dict(json.load(f), manifest=os.path.join(d, name)))
+                except FileNotFoundError:   # pruned meanwhile (no flock: unlocked store)
+                    continue
+        return out
+
+    def _put_chunk(self, chunk):
+        digest = hashlib.blake2b(chunk, digest_size=20).hexdigest()
+        obj = self._object_path(digest)
+        if os.path.exists(obj):
+            return digest, 0
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp = f"{obj}.{threading.get_ident()}.tmp"   # two threads may store the same chunk
+        with open(tmp, "wb") as f:
+            f.write(chunk)
+        os.replace(tmp, obj)
+        return digest, len(chunk)
+
+    def snapshot(self, path):
+        # new restore point for path; returns the manifest path
+        with self._locked():
+            out = self._snapshot(path)
+        self.prune(path)
+        return out
+
+    def _snapshot(self, path):
+        stat = _stat_key(path)
+        points = self.list(path)
+        if points and points[0]["stat"] == stat:
+            return points[0]["manifest"]
+        snap_id = f"{time.time_ns():020d}"
+        manifest = {"id": snap_id, "source": os.path.abspath(path), "created": time.time(), "stat": stat}
+        blob = os.path.join(self.root, "blobs", snap_id)
+        if _reflink(path, blob):
+            manifest.update(method="reflink", blob=blob, stored_bytes=0)
+        else:
+            # an appended or partly edited file only re-chunks from its first change
+            chunks, offset = shared_prefix(path, points[0]["chunks"]) if points and points[0].get("chunks") else ([], 0)
+            stored = 0
+            with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+                # hashing and writing overlap with chunking (hashlib releases the GIL)
+                pending = deque()
+                for chunk in iter_chunks(path, start=offset):
+                    pending.append((len(chunk), pool.submit(self._put_chunk, chunk)))
+                    while len(pending) > 4 * WORKERS or (pending and pending[0][1].done()):
+                        n, fut = pending.popleft()
+                        digest, written = fut.result()
+                        chunks.append([digest, n])
+                        stored += written
+                for n, fut in pending:
+                    digest, written = fut.result()
+                    chunks.append([digest, n])
+                    stored += written
+            manifest.update(method="chunks", chunks=chunks, stored_bytes=stored)
+        out = os.path.join(self._manifest_dir(path), snap_id + ".json")
+        with open(out + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(out + ".tmp", out)
+        return out
+
+    def restore(self, manifest_path, target=None):
+        # write the snapshot back to target (default: its source). A reflink
+        # snapshot is cloned back in O(1); chunked ones are reassembled.
+        with self._locked():
+            return self._restore(manifest_path, target)
+
+    def _restore(self, manifest_path, target):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        target = target or manifest["source"]
+        if os.path.exists(target) and _stat_key(target) == manifest["stat"]:
+            return target   # untouched since the snapshot
+        tmp = target + ".restore.tmp"
+        if manifest["method"] == "reflink":
+            if not _reflink(manifest["blob"], tmp):
+                shutil.copyfile(manifest["blob"], tmp)
+        else:
+            with open(tmp, "wb") as out:
+                for digest, _ in manifest["chunks"]:
+                    with open(self._object_path(digest), "rb") as f:
+                        shutil.copyfileobj(f, out)
+        os.replace(tmp, target)
+        return target
+
+    def prune(self, path):
+        # keep the newest self.keep restore points, then drop unreferenced
+        # chunks; exclusive, so no snapshot or restore reads what goes away.
+        # Files another prune already removed are skipped.
+        with self._locked(exclusive=True) as locked:
+            old = self.list(path)[self.keep:]
+            for m in old:
+                if m.get("method") == "reflink":
+                    _remove(m["blob"])
+                _remove(m["manifest"])
+            if any(m.get("method") == "chunks" for m in old):
+                self._gc(grace=0 if locked else GC_GRACE)   # gc() would wait on our own lock
+
+    def gc(self):
+        with self._locked(exclusive=True) as locked:
+            return self._gc(grace=0 if locked else GC_GRACE)
+
+    def _gc(self, grace):
+        live = set()
+        mdir = os.path.join(self.root, "manifests")
+        for key in os.listdir(mdir):
+            for name in os.listdir(os.path.join(mdir, key)):
+                if name.endswith(".json"):
+                    try:
+                        with open(os.path.join(mdir, key, name), "r", encoding="utf-8") as f:
+                            live.update(d for d, _ in json.load(f).get("chunks", []))
+                    except FileNotFoundError:
+                        continue
+        removed = 0
+        cutoff = time.time() - grace
+        odir = os.path.join(self.root, "objects")
+        for sub in os.listdir(odir):
+            for digest in os.listdir(os.path.join(odir, sub)):
+                obj = os.path.join(odir, sub, digest)
+                if digest not in live and not obj.endswith(".tmp") and (not grace or os.path.getmtime(obj) < cutoff):
+                    removed += _remove(obj)
+        return removed
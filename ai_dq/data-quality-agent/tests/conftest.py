@@ -0,0 +1,9 @@
+# conftest.py
+# The agent's modules are flat files in the directory above; make them
+# importable from the tests.
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+SAMPLE_CSV = os.path.join(os.path.dirname(HERE), "data", "sample.csv")
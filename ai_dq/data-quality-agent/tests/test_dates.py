@@ -0,0 +1,15 @@
+# test_dates.py
+# Date format inference across datasets in one process (service workers).
+import pandas as pd
+from dates import infer_date_format, parse_dates
+
+
+def test_cached_format_rechecked_for_another_dataset():
+    day_first = pd.Series(["13/01/2024", "25/02/2024", "03/05/2024"], name="order_date")
+    month_first = pd.Series(["01/13/2024", "02/25/2024", "05/03/2024"], name="order_date")
+    assert infer_date_format(day_first) == "%d/%m/%Y"
+    # same column name and value shapes, other day/month order
+    assert infer_date_format(month_first) == "%m/%d/%Y"
+    assert parse_dates(month_first).tolist() == [pd.Timestamp("2024-01-13"), pd.Timestamp("2024-02-25"),
+                                                 pd.Timestamp("2024-05-03")]
+    assert infer_date_format(day_first) == "%d/%m/%Y"
@@ -0,0 +1,37 @@
+# test_duckdb_engine.py
+# SQL generated for fix plans: user-supplied patterns and values are
+# spliced into the query as literals.
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+from duckdb_engine import apply_fixes_sql
+
+
+@pytest.fixture
+def phones(tmp_path):
+    path = tmp_path / "in.csv"
+    pd.DataFrame({"id": [1, 2, 3], "phone": ["555-123-4567", None, "call 123"]}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_braced_regex_and_value(phones, tmp_path):
+    out = str(tmp_path / "out.csv")
+    apply_fixes_sql(phones, out, [
+        {"action": "regex_clean", "params": {"column": "phone", "pattern": r"\d{3}", "repl": "#"}},
+        {"action": "impute_nulls", "params": {"column": "phone", "value": "{unknown}"}},
+    ])
+    assert pd.read_csv(out)["phone"].tolist() == ["#-#-#7", "{unknown}", "call #"]
+
+
+def test_regex_translated_or_skipped(phones, tmp_path):
+    out = str(tmp_path / "out.csv")
+    changes = {}
+    apply_fixes_sql(phones, out, [
+        {"id": "FX1", "action": "regex_clean", "params": {"column": "phone", "pattern": r"(?<=5)5", "repl": ""}},
+        {"id": "FX2", "action": "regex_clean", "params": {"column": "phone", "pattern": r"(\d+)-(\d+)", "repl": r"\2\g<1>"}},
+    ], changes=changes)
+    # lookbehind: no RE2 form, reported instead of failing the query
+    assert changes["skipped"] == ["FX1"]
+    # Python group references become RE2 rewrites
+    assert pd.read_csv(out)["phone"].fillna("").tolist() == ["123555-4567", "", "call 123"]
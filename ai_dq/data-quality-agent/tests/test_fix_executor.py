@@ -0,0 +1,44 @@
+# test_fix_executor.py
+# Fix plans on frames loaded with the typed CSV loader (string / nullable
+# dtypes hold pd.NA), serial and through the process pool.
+import shutil
+import pytest
+import parallel_fixes
+from conftest import SAMPLE_CSV
+from tools import load_data, apply_fixes
+
+PLANS = {
+    "normalize_email then impute": [
+        {"id": "FX1", "action": "normalize_email", "params": {"column": "email"}},
+        {"id": "FX2", "action": "impute_nulls", "params": {"column": "email", "value": "unknown"}},
+    ],
+    "regex_clean then impute": [
+        {"id": "FX1", "action": "regex_clean", "params": {"column": "phone", "pattern": r"[^0-9]", "repl": ""}},
+        {"id": "FX2", "action": "impute_nulls", "params": {"column": "phone", "value": "unknown"}},
+    ],
+}
+
+
+@pytest.fixture
+def typed_sample(tmp_path):
+    # a copy, so the schema cache is not written into the repo
+    path = tmp_path / "sample.csv"
+    shutil.copy(SAMPLE_CSV, path)
+    return load_data(str(path), typed=True)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("plan", list(PLANS))
+def test_string_fix_then_impute_on_typed_frame(typed_sample, plan, workers, monkeypatch):
+    monkeypatch.setattr(parallel_fixes, "MIN_PARTITION_ROWS", 1)    # tiny frame, still partitioned
+    df = typed_sample
+    col = PLANS[plan][0]["params"]["column"]
+    assert df[col].isna().any()
+    changes = {}
+    out = apply_fixes(df, PLANS[plan], changes=changes, workers=workers)
+    assert not out[col].isna().any()
+    assert out[col].dtype == df[col].dtype
+    assert changes["skipped"] == []
+    # every imputed cell is credited to the impute fix
+    fixes = dict(zip(changes["columns"][col], changes["column_fixes"][col]))
+    assert all("FX2" in fixes[i] for i in df.index[df[col].isna()])
@@ -0,0 +1,19 @@
+# test_sampling.py
+# Small inputs get the exact profile, with the same keys whatever the source.
+import pytest
+from conftest import SAMPLE_CSV
+from data_io import load_table, save_table
+from sampling import sample_profile_frame, sample_profile_file
+
+
+@pytest.mark.parametrize("ext", ["csv", "parquet", "feather"])
+def test_small_file_profile_matches_frame(tmp_path, ext):
+    pytest.importorskip("pyarrow")
+    df = load_table(SAMPLE_CSV)
+    path = str(tmp_path / f"sample.{ext}")
+    save_table(df, path)
+    expected = sample_profile_frame(df)
+    profile = sample_profile_file(path)
+    assert profile["approximate"] is False
+    assert set(profile) == set(expected)
+    assert profile["policy_violations"] == expected["policy_violations"]
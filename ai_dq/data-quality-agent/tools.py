@@ -1,110 +1,137 @@
 # tools.py
 import pandas as pd
-import os
-from shutil import copyfile
+from data_io import load_table, save_table, memory_summary
+from profiler import profile_frame, profile_file, delta_profile
+from dedup import count_duplicates_file
+from near_dup import near_duplicate_count, is_text
+from fix_executor import plan_fixes, execute_plan, fix_id
+from parallel_fixes import execute_plan_parallel
+from rules import evaluate_rules, compile_rules, violation_counts
+from sampling import sample_profile_frame, sample_profile_file
+from dates import date_formats
+from snapshots import SnapshotStore
 
-def load_data(csv_path):
-    df = pd.read_csv(csv_path)
+def load_data(path, columns=None, typed=True, report=None):
+    # CSV, Parquet or Feather depending on the extension; columns projects on read.
+    # CSVs load with the compact dtypes cached beside the file (data_io.load_csv_typed);
+    # report (dict) receives the default vs typed memory footprint
+    df = load_table(path, columns=columns, typed=typed, report=report)
     return df
 
+def save_data(df, path):
+    return save_table(df, path)
+
 def backup_csv(csv_path):
-    backup_path = csv_path + ".bak"
-    copyfile(csv_path, backup_path)
-    return backup_path
+    # new restore point in the snapshot store (reflink or deduplicated
+    # chunks, see snapshots.py); returns the snapshot's manifest path
+    return SnapshotStore().snapshot(csv_path)
 
 def restore_csv(backup_path, target_path):
-    copyfile(backup_path, target_path)
-
-def analyze_data(df):
-    profile = {}
-    profile["num_rows"] = int(len(df))
-    profile["schema"] = {col: str(df[col].dtype) for col in df.columns}
-    profile["null_counts"] = {col: int(df[col].isna().sum()) for col in df.columns}
-    profile["null_percent"] = {col: float(df[col].isna().mean()) for col in df.columns}
-    profile["dup_rows"] = int(df.duplicated().sum())
-    invalids = {}
-    if "email" in df.columns:
-        # treat NaN as invalid for format counts
-        invalid_mask = ~df['email'].astype(str).str.match(r"[^@]+@[^@]+\.[^@]+")
-        invalids["email_invalid_count"] = int(invalid_mask.sum())
-    if "price" in df.columns:
-        try:
-            neg_count = int((df['price'].astype(float) < 0).sum())
-        except Exception:
-            neg_count = 0
-        invalids["price_negative_count"] = neg_count
-
-    profile["invalids"] = invalids
-    
+    SnapshotStore().restore(backup_path, target_path)
+
+def analyze_data_state(df, near_dups=False):
+    # one pass over the frame; returns the profile dict plus the mergeable
+    # ProfileState (row-hash counts) that evaluate_improvement can reuse
+    state = profile_frame(df)
+    profile = state.to_profile()
+    # per-policy violation counts from the compiled POLICY_RULES (see rules.py)
+    profile["policy_violations"] = violation_counts(evaluate_rules(df))
+    # date-like columns and the format each is parsed with (see dates.py)
+    profile["date_formats"] = date_formats(df)
+    if near_dups:
+        # fuzzy duplicates over the string columns (MinHash-LSH, see near_dup.py);
+        # opt-in: it costs far more than the rest of the profile
+        profile["near_dup_rows"] = near_duplicate_count(df)
+    return profile, state
+
+def analyze_data(df, near_dups=False, sample_rows=None, strata=None):
+    # sample_rows: quick-triage mode - estimates from a (strata-stratified)
+    # sample with confidence intervals, marked "approximate" (see sampling.py);
+    # frames with at most sample_rows rows are still profiled exactly
+    if sample_rows:
+        return sample_profile_frame(df, sample_rows=sample_rows, strata=strata)
+    return analyze_data_state(df, near_dups)[0]
+
+def analyze_file(path, columns=None, workers=1, spill_dir=None, engine="pandas", sample_rows=None, strata=None):
+    # stream a CSV/Parquet/Feather file without loading it whole; with
+    # spill_dir set, duplicates are counted with the disk-partitioned engine
+    # instead of an in-memory hash set. engine="duckdb" pushes the whole
+    # profile down to SQL over the file (CSV/Parquet, see duckdb_engine.py).
+    if engine == "duckdb":
+        from duckdb_engine import analyze_file_sql, connect  # optional dependency
+        return analyze_file_sql(path, con=connect(temp_dir=spill_dir))
+    if sample_rows:
+        return sample_profile_file(path, columns=columns, sample_rows=sample_rows, strata=strata)
+    if spill_dir is None:
+        return profile_file(path, columns=columns, workers=workers).to_profile()
+    state = profile_file(path, columns=columns, workers=workers, track_hashes=False)
+    profile = state.to_profile()
+    profile["dup_rows"] = count_duplicates_file(path, spill_dir=spill_dir)
     return profile
 
-def apply_fixes(df, actions):
-    df2 = df.copy()
-    for action in actions:
-        act = action.get("action")
-        params = action.get("params", {})
-        print("inside for")
-        print(act)
-        print(params)
-
-        if act == "drop_duplicates":
-            subset = params.get("subset", None)
-            if subset:
-                subset = [c for c in subset if c in df2.columns]
-                if subset:
-                    df2.drop_duplicates(subset=subset, inplace=True)
-            else:
-                df2.drop_duplicates(inplace=True)
-
-        elif act == "impute_nulls":
-            col = params.get("column")
-            strategy = params.get("strategy", "constant")
-            if col in df2.columns:
-                if strategy == "mean" and pd.api.types.is_numeric_dtype(df2[col]):
-                    df2[col].fillna(df2[col].mean(), inplace=True)
-                elif strategy == "median" and pd.api.types.is_numeric_dtype(df2[col]):
-                    df2[col].fillna(df2[col].median(), inplace=True)
-                else:
-                    df2[col].fillna(params.get("value", ""), inplace=True)
-
-        elif act == "normalize_email":
-            col = params.get("column", "email")
-            if col in df2.columns:
-                df2[col] = df2[col].astype(str).str.strip().str.lower()
-
-        elif act == "regex_clean":
-            col = params.get("column")
-            pattern = params.get("pattern")
-            repl = params.get("repl", "")
-            if col in df2.columns and pattern:
-                df2[col] = df2[col].astype(str).str.replace(pattern, repl, regex=True)
-
-        # 🆕 NEW CONSERVATIVE FIX
-        elif act == "remove_negative_values":
-            col = params.get("column")
-            print("inside fixes")
-            print(col)
-            if col in df2.columns and pd.api.types.is_numeric_dtype(df2[col]):
-                print("inside if")
-                df2.loc[df2[col] < 0, col] = None  # Null out invalid negatives
-
-        else:
-            # unknown action - ignore
-            continue
-
-    return df2
-
-
-def evaluate_improvement(before_df, after_df):
-    before = analyze_data(before_df)
-    after = analyze_data(after_df)
+def apply_fixes(df, actions, changes=None, workers=1):
+    # planned, fused and copy-free; df itself is never modified (see fix_executor.py).
+    # Pass a dict as changes to get the dropped rows / changed cells back.
+    # workers > 1: row partitions in a process pool, same result (see parallel_fixes.py)
+    if workers > 1:
+        return execute_plan_parallel(df, plan_fixes(df, actions), changes, workers=workers)
+    return execute_plan(df, plan_fixes(df, actions), changes)
+
+def skipped_fixes(actions, changes):
+    # positions in actions of the fixes apply_fixes reported as skipped
+    skipped = set(changes.get("skipped", []))
+    return {n for n, action in enumerate(actions) if fix_id(action, n) in skipped}
+
+def apply_fixes_file(in_path, out_path, actions, changes=None):
+    # SQL-pushdown variant of apply_fixes: DuckDB reads in_path, applies the
+    # actions as one query and writes out_path, so the data never hits pandas
+    from duckdb_engine import apply_fixes_sql  # optional dependency
+    return apply_fixes_sql(in_path, out_path, actions, changes=changes)
+
+
+def evaluate_improvement(before_df, after_df, before_profile=None, changes=None, before_state=None, near_dups=False):
+    # With the pre-fix profile and the changes reported by apply_fixes, only
+    # the changed rows/columns are re-read; otherwise both frames are profiled.
+    if before_profile is None or changes is None:
+        before = analyze_data(before_df, near_dups)
+        after = analyze_data(after_df, near_dups)
+    else:
+        before = before_profile
+        after = delta_profile(before_profile, before_df, after_df, changes, before_state)
+        if "policy_violations" in before:
+            touched = [c for c, pos in changes.get("columns", {}).items() if len(pos)]
+            if len(changes.get("dropped", [])):
+                after["policy_violations"] = violation_counts(evaluate_rules(after_df))
+            elif touched:
+                # only re-check the policies whose columns were changed
+                affected = [pid for pid, _, cols in compile_rules(after_df) if set(cols) & set(touched)]
+                after["policy_violations"].update(violation_counts(evaluate_rules(after_df, policy_ids=affected)))
+        if "near_dup_rows" in before:
+            string_touched = any(is_text(before_df[c]) or is_text(after_df[c])
+                                 for c, pos in changes.get("columns", {}).items() if len(pos))
+            if string_touched or len(changes.get("dropped", [])):
+                after["near_dup_rows"] = near_duplicate_count(after_df)
+    return compare_profiles(before, after)
+
+
+def evaluate_file_improvement(before_path, after_path, before_profile=None):
+    # evaluate_improvement for the DuckDB engine: both sides profiled in SQL
+    before = before_profile or analyze_file(before_path, engine="duckdb")
+    after = analyze_file(after_path, engine="duckdb")
+    return compare_profiles(before, after)
+
+
+def compare_profiles(before, after):
     before_score = sum(before["invalids"].values()) + before["dup_rows"]
     after_score = sum(after["invalids"].values()) + after["dup_rows"]
     improved = after_score < before_score
+    policy_delta = {pid: after.get("policy_violations", {}).get(pid, 0) - n
+                    for pid, n in before.get("policy_violations", {}).items()}
     return {
         "improved": improved,
         "before_score": int(before_score),
         "after_score": int(after_score),
+        "policy_delta": policy_delta,
         "before_profile": before,
         "after_profile": after
     }
@@ -1,8 +1,9 @@
 # critic.py
 import json
 from rag import get_combined_rag_text
+from tools_prof.ner import sample_column_ner
 
-ALLOWED_ACTIONS = {"mask_email","mask_phone","hash_name","redact_address","mask_column"}
+ALLOWED_ACTIONS = {"mask_email","mask_phone","hash_name","tokenize","redact_address","mask_column"}
 
 def critic_validate_plan(profile, plan, dataset_name=None):
     rag_text = get_combined_rag_text(query=dataset_name, n_results=6).lower()
@@ -54,12 +55,81 @@ def critic_validate_plan(profile, plan, dataset_name=None):
     validated["overall_decision"] = "accept" if not any_rejected else "revise"
     return validated
 
-def critic_validate_results(before_profile, after_profile, plan, dataset_name=None):
-    # Simple: check that masked columns have reduced sensitive counts (approx)
-    # For now, base acceptance on absence of errors and that actions were applied.
-    # Caller should extend with domain-specific checks.
-    # We'll return accepted=True with high confidence as a placeholder if after_profile exists.
-    accepted = True
-    notes = "Post-exec validation not fully implemented; manual review recommended."
-    confidence = 0.7
-    return {"accepted": accepted, "notes": notes, "confidence": confidence}
+# Post-execution residual checks: a value in a touched column is "residual PII"
+# when it does not look like the output of the applied action.
+EMAIL_UNMASKED_RE = r"^[^@*\s]{2,}@[^@\s]+\.[^@\s]+$"
+PHONE_SEPARATORS_RE = r"[\s\-().]"
+PHONE_RUN_RE = r"\d{5,}"
+HASH_RE = r"^[0-9a-f]{12}$"
+TOKEN_RE = r"^TKN_[0-9a-f]{16}$"
+NER_CHECK_ACTIONS = {"hash_name", "tokenize", "redact_address", "mask_column"}
+NER_CHECK_MAX_SAMPLES = 50
+NER_RESIDUAL_MAX_RATE = 0.05
+
+def _residual_mask(action, s):
+    # s: non-null values of the touched column as str
+    if action == "mask_email":
+        return s.str.match(EMAIL_UNMASKED_RE)
+    if action == "mask_phone":
+        return s.str.replace(PHONE_SEPARATORS_RE, "", regex=True).str.contains(PHONE_RUN_RE)
+    if action == "hash_name":
+        return ~s.str.match(HASH_RE)
+    if action == "tokenize":
+        return ~s.str.match(TOKEN_RE)
+    if action == "redact_address":
+        return s.ne("[REDACTED]")
+    if action == "mask_column":
+        return s.ne("[MASKED]")
+    return None
+
+def critic_validate_results(before_profile, after_df, plan, dataset_name=None):
+    # Verify the masked frame directly instead of re-profiling it: only the
+    # columns touched by the applied actions are scanned, with vectorized regex
+    # checks plus a sampled NER check for name/address columns.
+    actions = plan.get("proposed_actions", []) if isinstance(plan, dict) else plan
+    results = []
+    total_checked = 0
+    total_residual = 0
+    for a in actions:
+        action = a.get("action")
+        col = a.get("params", {}).get("column")
+        entry = {"id": a.get("id"), "action": action, "column": col}
+        if not col or col not in after_df.columns:
+            entry.update({"status": "fail", "notes": f"Column '{col}' not present after execution."})
+            results.append(entry)
+            continue
+        values = after_df[col].dropna().astype(str)
+        mask = _residual_mask(action, values)
+        if mask is None:
+            entry.update({"status": "skipped", "notes": f"No residual check for action '{action}'."})
+            results.append(entry)
+            continue
+        residual = int(mask.sum())
+        checked = int(len(values))
+        entry.update({
+            "checked": checked,
+            "residual_count": residual,
+            "residual_rate": round(residual / checked, 4) if checked else 0.0,
+        })
+        passed = residual == 0
+        if action in NER_CHECK_ACTIONS and checked:
+            ner = sample_column_ner(values, max_samples=NER_CHECK_MAX_SAMPLES)
+            if ner:
+                entry["ner"] = {k: ner[k] for k in ("sample_size", "entity_rate", "ci_low", "ci_high")}
+                if ner["ci_low"] > NER_RESIDUAL_MAX_RATE:
+                    passed = False
+        entry["status"] = "pass" if passed else "fail"
+        total_checked += checked
+        total_residual += residual
+        results.append(entry)
+
+    failed = [r["id"] for r in results if r["status"] == "fail"]
+    accepted = not failed
+    notes = "No residual PII detected in touched columns." if accepted else f"Residual PII remains for actions: {failed}"
+    return {
+        "accepted": accepted,
+        "notes": notes,
+        "confidence": 0.9 if accepted else 0.2,
+        "residual_pii_rate": round(total_residual / total_checked, 4) if total_checked else 0.0,
+        "actions": results,
+    }
@@ -1,24 +1,22 @@
 # main.py
 import os, json, time
-from tools import load_data, analyze_data, apply_actions
+from tools import load_data, save_data, analyze_data, apply_actions, memory_summary
 from planner import planner_agent
 from detector import detector_agent
 from critic import critic_validate_plan, critic_validate_results
-from memory import load_memory, save_memory
+from memory import updating_memory
 from rag import get_combined_rag_text, ingest_text
+from snapshots import SnapshotStore
 
-CSV_PATH = "data/sample_pii.csv"
-BACKUP_SUFFIX = ".bak"
+CSV_PATH = "data/sample_pii.csv"  # .parquet / .feather inputs are also supported
+OUTPUT_PATH = "data/pii_masked_output.csv"  # output format follows the extension
 
 def backup_csv(path):
-    import shutil
-    b = path + BACKUP_SUFFIX
-    shutil.copyfile(path, b)
-    return b
+    # restore point in the snapshot store (see snapshots.py); returns its manifest
+    return SnapshotStore().snapshot(path)
 
 def restore_csv(backup, target):
-    import shutil
-    shutil.copyfile(backup, target)
+    SnapshotStore().restore(backup, target)
 
 def ingest_docs_if_needed():
     docs_path = "docs/gdpr_rules.txt"
@@ -39,12 +37,19 @@ def print_risk_report(profile):
         )
         print(f"| {col} | {score} | {level} |")
 
-def main():
-    ingest_docs_if_needed()
+def main(approve=None, ingest=True):
+    # approve(actions) -> bool replaces the console prompt (service.py); ingest=False
+    # when the GDPR docs are already in the vector store. Returns the outcome:
+    # "done", "no_fixes", "rejected" (critic or approval) or "rolled_back".
+    if ingest:
+        ingest_docs_if_needed()
     backup = backup_csv(CSV_PATH)
     print(f"[INFO] Backup created: {backup}")
 
-    df = load_data(CSV_PATH)
+    mem_report = {}
+    df = load_data(CSV_PATH, report=mem_report)
+    if mem_report:
+        print("[INFO] Memory:", memory_summary(mem_report))
     profile = analyze_data(df)
     profile = json.loads(json.dumps(profile, default=str))
     print("[INFO] Profile:")
@@ -67,52 +72,50 @@ def main():
     if validated.get("overall_decision") != "accept":
         print("[WARN] Plan needs revision per critic. Suggested changes:", validated.get("suggested_changes"))
         # For demo purposes, we stop and ask human to review.
-        return
+        return "rejected"
 
     actions = [ { "id": a["id"], "action": a["action"], "params": a["params"] } for a in detector_out.get("proposed_actions", []) ]
     if not actions:
         print("[INFO] No actions to apply.")
-        return
+        return "no_fixes"
 
     # Ask user approval (CLI)
     print("[INFO] Actions to apply:")
     for a in actions:
         print("-", a)
-    approval = input("Apply actions? (Y/N): ").strip().lower()
-    if approval != "y":
+    approved = approve(actions) if approve else input("Apply actions? (Y/N): ").strip().lower() == "y"
+    if not approved:
         print("[INFO] Execution aborted by user.")
-        return
+        return "rejected"
 
     # Execute
     try:
         new_df = apply_actions(df, actions)
-        out_path = "data/pii_masked_output.csv"
-        new_df.to_csv(out_path, index=False)
-        print("[INFO] Actions applied. Output saved to", out_path)
+        save_data(new_df, OUTPUT_PATH)
+        print("[INFO] Actions applied. Output saved to", OUTPUT_PATH)
     except Exception as e:
         print("[ERROR] Execution failed:", e)
         restore_csv(backup, CSV_PATH)
-        return
+        return "rolled_back"
 
     print("[INFO] Risk Report:")
     print_risk_report(profile)
 
 
-    # Post validation (simple)
-    after_profile = analyze_data(new_df)
-    post = critic_validate_results(profile, after_profile, detector_out, dataset_name=os.path.basename(CSV_PATH))
+    # Post validation: residual-PII scan of the touched columns only
+    post = critic_validate_results(profile, new_df, actions, dataset_name=os.path.basename(CSV_PATH))
     print("[INFO] Post validation:", post)
 
     # Save memory history
-    mem = load_memory()
-    mem.setdefault("pii_runs", []).append({
-        "timestamp": int(time.time()),
-        "dataset": os.path.basename(CSV_PATH),
-        "plan": detector_out,
-        "post_validation": post
-    })
-    save_memory(mem)
+    with updating_memory() as mem:
+        mem.setdefault("pii_runs", []).append({
+            "timestamp": int(time.time()),
+            "dataset": os.path.basename(CSV_PATH),
+            "plan": detector_out,
+            "post_validation": post
+        })
     print("[DONE] Run complete. Memory updated.")
+    return "done"
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,7 @@
 # memory.py
 import json
 import os
+import contextlib
 
 MEM_PATH = "memory_store/memory.json"
 if not os.path.exists("memory_store"):
@@ -8,9 +9,38 @@ if not os.path.exists("memory_store"):
 
 def load_memory():
     if os.path.exists(MEM_PATH):
-        return json.load(open(MEM_PATH, "r", encoding="utf-8"))
+        with open(MEM_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
     return {}
 
 def save_memory(mem):
-    with open(MEM_PATH, "w", encoding="utf-8") as f:
+    # tmp + replace: a concurrent reader never sees a half-written file
+    tmp = f"{MEM_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(mem, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, MEM_PATH)
+
+@contextlib.contextmanager
+def file_lock(path):
+    # exclusive lock on path + ".lock" across processes (service.py workers,
+    # concurrent runs); a no-op where flock is unavailable
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def updating_memory():
+    # load, let the caller change it, save - under the memory lock so
+    # concurrent runs do not drop each other's updates
+    with file_lock(MEM_PATH):
+        mem = load_memory()
+        yield mem
+        save_memory(mem)
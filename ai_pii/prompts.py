@@ -15,8 +15,10 @@ You are the PII Detector. You receive:
 Your job:
 - For each step, analyze profile and find PII columns.
 - Propose conservative masking actions.
-- Allowed actions: ["mask_email","mask_phone","hash_name","redact_address","mask_column"]
+- Allowed actions: ["mask_email","mask_phone","hash_name","tokenize","redact_address","mask_column"]
 - Each proposed action MUST include 'params' with concrete column names and masking strategy.
+- Prefer "tokenize" over "hash_name" when authorised users may need to recover the original value
+  (params: {"column":"name","namespace":"customer_name"}).
 - Each proposed action MUST include policy_refs that quote exact snippets from RAG_SNIPPETS.
 - Confidence must be between 0.0 and 1.0
 
@@ -51,7 +53,7 @@ Inputs:
 - RAG_SNIPPETS (GDPR rules combined)
 
 Validation Rules (deterministic):
-1) Each action.action must be one of ["mask_email","mask_phone","hash_name","redact_address","mask_column"].
+1) Each action.action must be one of ["mask_email","mask_phone","hash_name","tokenize","redact_address","mask_column"].
 2) Each params.column must exist in BEFORE_PROFILE.columns.
 3) Each policy_refs[].quote must appear as a substring (case-insensitive) in RAG_SNIPPETS.
 4) Confidence < 0.70 → mark rejected unless question escalation present.
@@ -74,7 +76,10 @@ Output schema (plan validation):
 }
 
 Post-execution validation schema:
-{ "accepted": true|false, "notes":"", "confidence":0.0-1.0 }
+{ "accepted": true|false, "notes":"", "confidence":0.0-1.0,
+  "residual_pii_rate":0.0-1.0,
+  "actions":[ { "id":"A001", "action":"mask_email", "column":"email", "status":"pass"|"fail"|"skipped",
+                "checked":0, "residual_count":0, "residual_rate":0.0 } ] }
 
 STRICT: Output only JSON. No commentary.
 """
@@ -0,0 +1,305 @@
+# service.py
+# Long-running mode for the agent. `python main.py` loads the spaCy NER and
+# embedding models, opens Chroma and re-ingests the GDPR docs on every run,
+# then blocks on input(). Here WORKERS processes do that once at start-up
+# and then take jobs from a bounded queue:
+#   POST /jobs                   {"kind": "profile" | "fix", "params": {...}, "approve": null | true | false}
+#   GET  /jobs, /jobs/{id}       status, log tail, result; a finished job's status is
+#                                done, no_fixes, rejected, rolled_back or failed
+#   POST /jobs/{id}/approval     {"approve": true | false} for a fix job waiting on approval
+#   GET  /health                 ready workers and queue depth
+# "params" overrides main.py settings (SETTINGS) for that job only. A fix
+# (masking) job with "approve": null stops at the approval step
+# ("awaiting_approval", actions under "pending") until a decision is posted or APPROVAL_TIMEOUT
+# passes (= rejected); true/false decide up front. A full queue answers 503.
+# A fix job without its own OUTPUT_PATH writes to data/jobs/<id>/, so jobs
+# never share an output file. Fix jobs on the same input or output file
+# run one after another; other jobs run side by side. memory.json and the
+# sketch history are updated under file locks (memory.file_lock).
+# Usage: python service.py [port] [workers]   (or uvicorn service:app)
+import os
+import sys
+import json
+import time
+import zlib
+import uuid
+import queue
+import threading
+import contextlib
+import multiprocessing
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PORT = 8101
+WORKERS = 2                 # processes, each with its own warm NER/embedding models and vector store client
+QUEUE_SIZE = 16             # jobs waiting for a worker
+APPROVAL_TIMEOUT = 600      # seconds a fix job waits for a decision
+LOG_LINES = 200             # kept per job
+KEEP_JOBS = 500             # finished jobs kept for GET /jobs
+INPUT_LOCKS = 16            # fix jobs lock their input/output files through this many striped locks
+OUTPUTS = ("OUTPUT_PATH",)
+JOB_KINDS = ("profile", "fix")
+FINISHED = ("done", "no_fixes", "rejected", "rolled_back", "failed")   # main.main outcomes + failed
+SETTINGS = ("CSV_PATH", "OUTPUT_PATH")
+
+
+class JobRequest(BaseModel):
+    kind: str = "fix"
+    params: dict = {}
+    approve: bool | None = None
+
+
+class Approval(BaseModel):
+    approve: bool
+
+
+class _LogStream:
+    # stdout of a job, sent to the service line by line
+    def __init__(self, job_id, events):
+        self.job_id, self.events, self.buf = job_id, events, ""
+
+    def write(self, text):
+        self.buf += text
+        *lines, self.buf = self.buf.split("\n")
+        if lines:
+            self.events.put((self.job_id, {"log": lines}))
+        return len(text)
+
+    def flush(self):
+        if self.buf:
+            self.events.put((self.job_id, {"log": [self.buf]}))
+            self.buf = ""
+
+
+def _approver(job, events, decisions):
+    def approve(actions):
+        if job["approve"] is not None:
+            return job["approve"]
+        events.put((job["id"], {"status": "awaiting_approval", "pending": actions}))
+        deadline = time.monotonic() + APPROVAL_TIMEOUT
+        while True:
+            try:
+                job_id, decision = decisions.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                events.put((job["id"], {"status": "running", "pending": None, "log": ["[WARN] No approval in time."]}))
+                return False
+            if job_id == job["id"]:     # a late answer for an earlier job is dropped
+                events.put((job["id"], {"status": "running", "pending": None}))
+                return decision
+    return approve
+
+
+def _profile(main):
+    from tools import load_data, analyze_data
+    return json.loads(json.dumps(analyze_data(load_data(main.CSV_PATH)), default=str))
+
+
+def _job_path(path, job_id):
+    out = os.path.join(os.path.dirname(path), "jobs", job_id, os.path.basename(path))
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    return out
+
+
+@contextlib.contextmanager
+def _file_locks(main, locks):
+    # the striped locks of the job's input and output files, in a fixed order
+    paths = [main.CSV_PATH] + [getattr(main, k) for k in OUTPUTS]
+    with contextlib.ExitStack() as stack:
+        for i in sorted({zlib.crc32(os.path.abspath(p).encode("utf-8")) % len(locks) for p in paths}):
+            stack.enter_context(locks[i])
+        yield
+
+
+def _run(main, job, events, decisions, locks):
+    saved = {k: getattr(main, k) for k in SETTINGS}
+    log = _LogStream(job["id"], events)
+    try:
+        for k, v in job["params"].items():
+            setattr(main, k, v)
+        with contextlib.redirect_stdout(log):
+            if job["kind"] == "profile":
+                status, result = "done", {"profile": _profile(main)}
+            else:
+                for k in OUTPUTS:
+                    if k not in job["params"]:
+                        setattr(main, k, _job_path(getattr(main, k), job["id"]))
+                with _file_locks(main, locks):
+                    status = main.main(approve=_approver(job, events, decisions), ingest=False)
+                # only a finished run has written its output
+                result = {"output": main.OUTPUT_PATH} if status == "done" else None
+        log.flush()
+        events.put((job["id"], {"status": status, "result": result}))
+    except Exception as e:
+        log.flush()
+        events.put((job["id"], {"status": "failed", "error": f"{type(e).__name__}: {e}"}))
+    finally:
+        for k, v in saved.items():
+            setattr(main, k, v)
+
+
+def _worker(index, jobs, events, decisions, locks):
+    # one process: models and vector store are loaded here once, jobs run one at a time
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+    import main
+    main.ingest_docs_if_needed()
+    events.put((None, {"worker": index, "ready": True}))
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        events.put((job["id"], {"status": "running", "worker": index, "started": time.time()}))
+        _run(main, job, events, decisions, locks)
+        events.put((job["id"], {"finished": time.time()}))
+
+
+class JobService:
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE):
+        ctx = multiprocessing.get_context("spawn")    # the server's threads are not fork-safe
+        self.jobs = ctx.Queue(queue_size)
+        self.events = ctx.Queue()
+        self.decisions = [ctx.Queue() for _ in range(workers)]
+        self.locks = [ctx.Lock() for _ in range(INPUT_LOCKS)]
+        self.procs = [ctx.Process(target=_worker, args=(i, self.jobs, self.events, self.decisions[i], self.locks),
+                                  daemon=True) for i in range(workers)]
+        self.state = {}
+        self.ready = set()
+        self.lock = threading.Lock()
+        for p in self.procs:
+            p.start()
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def _listen(self):
+        while True:
+            item = self.events.get()
+            if item is None:
+                return
+            job_id, update = item
+            with self.lock:
+                if job_id is None:
+                    self.ready.add(update["worker"])
+                    continue
+                job = self.state.get(job_id)
+                if job is None:
+                    continue
+                job["log"] = (job["log"] + update.pop("log", []))[-LOG_LINES:]
+                job.update(update)
+
+    def _prune(self):
+        finished = [j for j in self.state.values() if j["status"] in FINISHED]
+        for j in sorted(finished, key=lambda j: j["submitted"])[:max(0, len(finished) - KEEP_JOBS)]:
+            del self.state[j["id"]]
+
+    def submit(self, kind, params, approve):
+        job = {"id": uuid.uuid4().hex[:12], "kind": kind, "params": params, "approve": approve}
+        with self.lock:
+            self._prune()
+            self.state[job["id"]] = dict(job, status="queued", submitted=time.time(), log=[], pending=None)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                del self.state[job["id"]]
+            return None
+        return job["id"]
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.state.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self.lock:
+            return [{k: j[k] for k in ("id", "kind", "status", "submitted")} for j in self.state.values()]
+
+    def decide(self, job_id, approve):
+        # False when the job is not waiting on a decision
+        with self.lock:
+            job = self.state.get(job_id)
+            if job is None or job["status"] != "awaiting_approval":
+                return False
+            job.update(status="running", pending=None)
+            self.decisions[job["worker"]].put((job_id, approve))
+        return True
+
+    def health(self):
+        with self.lock:
+            busy = sum(j["status"] in ("running", "awaiting_approval") for j in self.state.values())
+            queued = sum(j["status"] == "queued" for j in self.state.values())
+        return {"workers": len(self.procs), "ready": len(self.ready),
+                "alive": sum(p.is_alive() for p in self.procs), "busy": busy, "queued": queued}
+
+    def close(self):
+        for _ in self.procs:
+            self.jobs.put(None)
+        for p in self.procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        self.events.put(None)
+        self.listener.join(timeout=10)
+
+
+app = FastAPI(title="PII Agent Service")
+service = None
+
+
+@app.on_event("startup")
+def on_startup():
+    global service
+    service = JobService(workers=int(os.getenv("PII_WORKERS", WORKERS)))
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    service.close()
+
+
+@app.post("/jobs")
+def submit_job(req: JobRequest):
+    if req.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {JOB_KINDS}")
+    unknown = sorted(set(req.params) - set(SETTINGS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown params {unknown}; allowed: {SETTINGS}")
+    job_id = service.submit(req.kind, req.params, req.approve)
+    if job_id is None:
+        raise HTTPException(status_code=503, detail="job queue is full, retry later")
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/jobs")
+def list_jobs():
+    return service.list()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/approval")
+def approve_job(job_id: str, req: Approval):
+    if service.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if not service.decide(job_id, req.approve):
+        raise HTTPException(status_code=409, detail="job is not awaiting approval")
+    return {"id": job_id, "approve": req.approve}
+
+
+@app.get("/health")
+def health():
+    return service.health()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    args = sys.argv[1:]
+    if len(args) > 1:
+        os.environ["PII_WORKERS"] = args[1]
+    uvicorn.run(app, host="127.0.0.1", port=int(args[0]) if args else PORT)
@@ -5,6 +5,10 @@ import hashlib
 import phonenumbers
 from tools_prof.ner import detect_pii_ner
 from tools_prof.embeddings import detect_pii_embeddings
+from vault import get_vault
+from data_io import load_table, save_table, memory_summary
+
+NER_BASELINE_SAMPLE = 20
 
 def compute_risk_scores(profile):
     risk_scores = {}
@@ -16,12 +20,14 @@ def compute_risk_scores(profile):
     for col in embeds.keys():
         score = 0
 
-        # NER impact
+        # NER impact (counts normalised to a 20-value sample, since the
+        # adaptive sampler checks a variable number of values per column)
         if col in ner:
             n = ner[col]
-            score += n.get("PERSON", 0) * 5
-            score += (n.get("GPE", 0) + n.get("LOC", 0)) * 4
-            score += n.get("DATE", 0) * 4
+            scale = NER_BASELINE_SAMPLE / max(n.get("sample_size", NER_BASELINE_SAMPLE), 1)
+            score += n.get("PERSON", 0) * 5 * scale
+            score += (n.get("GPE", 0) + n.get("LOC", 0)) * 4 * scale
+            score += n.get("DATE", 0) * 4 * scale
 
         # Embedding impact
         e = embeds[col]
@@ -34,13 +40,18 @@ def compute_risk_scores(profile):
         if "email_invalid_count" in invalids and "mail" in col:
             score += 10
 
-        risk_scores[col] = min(score, 100)
+        risk_scores[col] = min(int(round(score)), 100)
 
     return risk_scores
 
 
-def load_data(csv_path):
-    return pd.read_csv(csv_path)
+def load_data(path, columns=None, typed=True, report=None):
+    # CSV, Parquet or Feather depending on the extension; columns projects on read.
+    # CSVs load with the compact dtypes cached beside the file (data_io.load_csv_typed)
+    return load_table(path, columns=columns, typed=typed, report=report)
+
+def save_data(df, path):
+    return save_table(df, path)
 
 def analyze_data(df, sample_n=10):
     profile = {}
@@ -129,6 +140,10 @@ def apply_actions(df, actions):
         elif action == "hash_name":
             salt = params.get("salt", "")
             df2[col] = df2[col].apply(lambda v: hash_value(v, salt))
+        elif action == "tokenize":
+            # reversible pseudonymization via the local token vault
+            namespace = params.get("namespace", "default")
+            df2[col] = get_vault().tokenize_series(df2[col], namespace=namespace)
         elif action == "redact_address":
             df2[col] = df2[col].apply(redact_text)
         elif action == "mask_column":
@@ -1,23 +1,115 @@
+import math
+import random
+import numpy as np
+import pandas as pd
 import spacy
 
 nlp = spacy.load("en_core_web_sm")
 
-def detect_pii_ner(df):
-    ner_report = {}
+NER_LABELS = ("PERSON", "GPE", "LOC", "DATE")
 
-    for col in df.columns:
-        text = " ".join(df[col].dropna().astype(str).head(20))
-        if not text.strip():
+# Sequential sampling defaults: keep drawing random batches until the
+# Wilson interval on the entity rate is narrower than +/- CI_HALF_WIDTH,
+# or MAX_SAMPLES values have been checked.
+BATCH_SIZE = 10
+MAX_SAMPLES = 200
+CI_HALF_WIDTH = 0.1
+Z = 1.96  # 95% confidence
+SEED = 42
+
+
+def wilson_interval(hits, n, z=Z):
+    if n == 0:
+        return 0.0, 1.0
+    p = hits / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def reservoir_sample(values, k, seed=SEED):
+    # Algorithm R: uniform sample of k non-null items from a stream of unknown length.
+    rng = random.Random(seed)
+    reservoir = []
+    seen = 0    # non-null items so far; nulls must not shrink later items' odds
+    for v in values:
+        if v is None or (isinstance(v, float) and math.isnan(v)):
             continue
+        if len(reservoir) < k:
+            reservoir.append(v)
+        else:
+            j = rng.randint(0, seen)
+            if j < k:
+                reservoir[j] = v
+        seen += 1
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+def _candidate_values(values, max_samples, seed):
+    # Random order over at most max_samples non-null values.
+    if isinstance(values, pd.Series):
+        non_null = values.dropna()
+        n = len(non_null)
+        if n == 0:
+            return []
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(n, size=min(n, max_samples), replace=False)
+        return non_null.iloc[idx].astype(str).tolist()
+    return [str(v) for v in reservoir_sample(values, max_samples, seed)]
 
-        doc = nlp(text)
 
-        ents = [ent.label_ for ent in doc.ents]
-        ner_report[col] = {
-            "PERSON": ents.count("PERSON"),
-            "GPE": ents.count("GPE"),
-            "LOC": ents.count("LOC"),
-            "DATE": ents.count("DATE"),
-        }
+def sample_column_ner(values, batch_size=BATCH_SIZE, max_samples=MAX_SAMPLES,
+                      ci_half_width=CI_HALF_WIDTH, z=Z, seed=SEED):
+    """
+    Run NER on random batches of a column (Series or any iterable) and stop
+    as soon as the entity-rate estimate is tight enough.
+    Returns None for empty columns.
+    """
+    candidates = _candidate_values(values, max_samples, seed)
+    if not candidates:
+        return None
+
+    counts = {label: 0 for label in NER_LABELS}
+    hits = 0
+    n = 0
+    lo, hi = 0.0, 1.0
+    converged = False
+    for start in range(0, len(candidates), batch_size):
+        batch = [t for t in candidates[start:start + batch_size] if t.strip()]
+        for doc in nlp.pipe(batch):
+            labels = [ent.label_ for ent in doc.ents if ent.label_ in counts]
+            for label in labels:
+                counts[label] += 1
+            if labels:
+                hits += 1
+        n += len(batch)
+        lo, hi = wilson_interval(hits, n, z)
+        if n and (hi - lo) / 2 <= ci_half_width:
+            converged = True
+            break
+
+    if n == 0:
+        return None
+    report = dict(counts)
+    report["sample_size"] = n
+    report["entity_rate"] = round(hits / n, 3)
+    report["ci_low"] = round(lo, 3)
+    report["ci_high"] = round(hi, 3)
+    # 1.0 = exact, 0.0 = no information; at least 1 - 2*ci_half_width once converged
+    report["confidence"] = round(1 - (hi - lo), 3)
+    report["converged"] = converged
+    return report
+
+
+def detect_pii_ner(df, **kwargs):
+    ner_report = {}
+
+    for col in df.columns:
+        report = sample_column_ner(df[col], **kwargs)
+        if report is None:
+            continue
+        ner_report[col] = report
 
     return ner_report
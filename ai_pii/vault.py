@@ -0,0 +1,151 @@
+# vault.py
+# Local token vault for reversible pseudonymization (the `tokenize` action).
+# Values are mapped to random tokens once and the mapping is persisted in SQLite,
+# so the same value gets the same token across runs and files.
+import os
+import sqlite3
+import secrets
+from collections import OrderedDict
+import pandas as pd
+
+VAULT_PATH = "memory_store/token_vault.sqlite3"
+TOKEN_PREFIX = "TKN_"
+TOKEN_BYTES = 8          # 16 hex chars -> 2^64 space, collisions are retried
+LRU_SIZE = 100_000
+SQL_BATCH = 900          # stay below SQLite's host-parameter limit
+
+
+class TokenVault:
+    def __init__(self, path=VAULT_PATH, lru_size=LRU_SIZE):
+        d = os.path.dirname(path)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            " namespace TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " token TEXT NOT NULL UNIQUE,"
+            " PRIMARY KEY (namespace, value))"
+        )
+        self.conn.commit()
+        self.lru_size = lru_size
+        self._fwd = OrderedDict()   # (namespace, value) -> token
+        self._rev = OrderedDict()   # token -> value
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- LRU helpers ----------
+    def _remember(self, namespace, value, token):
+        self._fwd[(namespace, value)] = token
+        self._fwd.move_to_end((namespace, value))
+        self._rev[token] = value
+        self._rev.move_to_end(token)
+        while len(self._fwd) > self.lru_size:
+            self._fwd.popitem(last=False)
+        while len(self._rev) > self.lru_size:
+            self._rev.popitem(last=False)
+
+    # ---------- bulk lookups ----------
+    def _select(self, namespace, values):
+        found = {}
+        for i in range(0, len(values), SQL_BATCH):
+            chunk = values[i:i + SQL_BATCH]
+            q = "SELECT value, token FROM tokens WHERE namespace = ? AND value IN (%s)" % ",".join("?" * len(chunk))
+            for v, t in self.conn.execute(q, [namespace] + chunk):
+                found[v] = t
+        return found
+
+    def tokenize_values(self, values, namespace="default"):
+        """
+        Bulk insert-or-lookup: returns {value: token} for every distinct value.
+        Hot values come from the in-memory LRU, the rest hit SQLite in batches.
+        """
+        out = {}
+        misses = []
+        for v in values:
+            t = self._fwd.get((namespace, v))
+            if t is not None:
+                self._fwd.move_to_end((namespace, v))
+                out[v] = t
+            else:
+                misses.append(v)
+        if not misses:
+            return out
+
+        found = self._select(namespace, misses)
+        new_values = [v for v in misses if v not in found]
+        while new_values:
+            rows = [(namespace, v, TOKEN_PREFIX + secrets.token_hex(TOKEN_BYTES)) for v in new_values]
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO tokens (namespace, value, token) VALUES (?, ?, ?)", rows)
+            # re-read: covers concurrent writers and (astronomically rare) token collisions
+            found.update(self._select(namespace, new_values))
+            new_values = [v for v in new_values if v not in found]
+
+        for v, t in found.items():
+            out[v] = t
+            self._remember(namespace, v, t)
+        return out
+
+    def detokenize_values(self, tokens):
+        out = {}
+        misses = []
+        for t in tokens:
+            v = self._rev.get(t)
+            if v is not None:
+                out[t] = v
+            else:
+                misses.append(t)
+        for i in range(0, len(misses), SQL_BATCH):
+            chunk = misses[i:i + SQL_BATCH]
+            q = "SELECT namespace, value, token FROM tokens WHERE token IN (%s)" % ",".join("?" * len(chunk))
+            for ns, v, t in self.conn.execute(q, chunk):
+                out[t] = v
+                self._remember(ns, v, t)
+        return out
+
+    # ---------- column helpers ----------
+    def tokenize_series(self, s, namespace="default", batch_size=1_000_000):
+        # Map distinct values per batch; NaN stays NaN.
+        parts = []
+        for start in range(0, len(s), batch_size):
+            part = s.iloc[start:start + batch_size]
+            mask = part.notna()
+            as_str = part[mask].astype(str)
+            mapping = self.tokenize_values(list(pd.unique(as_str)), namespace=namespace)
+            res = part.astype(object).copy()
+            res[mask] = as_str.map(mapping)
+            parts.append(res)
+        if not parts:
+            return s.astype(object)
+        return pd.concat(parts)
+
+    def detokenize_series(self, s, batch_size=1_000_000):
+        parts = []
+        for start in range(0, len(s), batch_size):
+            part = s.iloc[start:start + batch_size]
+            mask = part.notna()
+            as_str = part[mask].astype(str)
+            mapping = self.detokenize_values(list(pd.unique(as_str)))
+            res = part.astype(object).copy()
+            # unknown tokens are left as-is
+            mapped = as_str.map(mapping)
+            res[mask] = mapped.where(mapped.notna(), as_str)
+            parts.append(res)
+        if not parts:
+            return s.astype(object)
+        return pd.concat(parts)
+
+
+_default_vault = None
+
+def get_vault(path=VAULT_PATH):
+    global _default_vault
+    if _default_vault is None or _default_vault.path != path:
+        _default_vault = TokenVault(path)
+    return _default_vault
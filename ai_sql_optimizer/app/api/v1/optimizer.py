@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
 from app.schemas.optimizer import OptimizeRequest, OptimizeResponse
 from app.services.optimizer_service import SQLOptimizerService
@@ -16,8 +17,19 @@ def get_db():
     finally:
         db.close()
 
+def save_optimization(db: Session, result: dict):
+    rec = Optimization(
+        original_sql=result["original_sql"],
+        optimized_sql=result["optimized_sql"],
+        diff=result.get("diff"),
+        stats_before=result.get("stats_before"),
+        stats_after=result.get("stats_after"),
+    )
+    db.add(rec)
+    db.commit()
+
 @router.post("/optimize", response_model=OptimizeResponse)
-def optimize(req: OptimizeRequest, db: Session = Depends(get_db)):
+async def optimize(req: OptimizeRequest, db: Session = Depends(get_db)):
     print("inside backend")
     print(req.sql)
     print(req.table)
@@ -25,19 +37,11 @@ def optimize(req: OptimizeRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="SQL is required")
 
     # result = service.stats(req.sql)
-    result = service.optimize(req.sql, table_id=req.table)
+    result = await service.optimize(req.sql, table_id=req.table)
 
-    # persist record
+    # persist record (SQLAlchemy session is blocking: keep it off the event loop)
     try:
-        rec = Optimization(
-            original_sql=result["original_sql"],
-            optimized_sql=result["optimized_sql"],
-            diff=result.get("diff"),
-            stats_before=result.get("stats_before"),
-            stats_after=result.get("stats_after"),
-        )
-        db.add(rec)
-        db.commit()
+        await asyncio.to_thread(save_optimization, db, result)
     except Exception as e:
         # log, but do not fail the optimization
         print("DB save error:", e)
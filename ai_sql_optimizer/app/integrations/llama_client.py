@@ -1,7 +1,7 @@
 import os
 import re
 from typing import Any, Dict, List
-import requests
+import httpx
 import json
 from app.core.config import get_settings
 
@@ -12,8 +12,19 @@ class LlamaClient:
         self.host = os.getenv("OLLAMA_HOST", settings.OLLAMA_HOST).rstrip("/")
         self.model = os.getenv("LLM_MODEL", settings.LLM_MODEL)
         self.timeout = int(os.getenv("LLM_TIMEOUT", "120"))
+        self._http = None
 
-    def optimize_sql(self, sql: str, table_schema: List[Dict[str, Any]]) -> str:
+    # one pooled connection set to Ollama for all requests (closed on shutdown)
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(timeout=self.timeout)
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def optimize_sql(self, sql: str, table_schema: List[Dict[str, Any]]) -> str:
 
         prompt = f"""
         You are an expert SQL performance optimizer for Google BigQuery.
@@ -62,15 +73,14 @@ class LlamaClient:
             print(new_api_url)
             print(self.model)
             print(self.timeout)
-            response = requests.post(
+            response = await self.http().post(
                 new_api_url,
                 json={
                     "model": self.model,
                     "messages": [
                         {"role": "user", "content": prompt}
                     ]
-                },
-                timeout=self.timeout
+                }
             )
 
             if response.status_code == 200:
@@ -84,7 +94,7 @@ class LlamaClient:
         # ------------ FALLBACK: OLD OLLAMA API ------------
         legacy_url = f"{self.host}/api/generate"
         payload = {"model": self.model, "prompt": prompt, "stream": False}
-        response = requests.post(legacy_url, json=payload, timeout=self.timeout)
+        response = await self.http().post(legacy_url, json=payload)
 
         if response.status_code != 200:
             raise Exception(
@@ -98,7 +108,7 @@ class LlamaClient:
     # --------------------------------------------------------
     # LLaMA Review
     # --------------------------------------------------------
-    def llama_review(self, sql: str, text_stats: dict, dry_run_stats: dict, estimated_stats: dict, table_schema: List[Dict[str, Any]]):
+    async def llama_review(self, sql: str, text_stats: dict, dry_run_stats: dict, estimated_stats: dict, table_schema: List[Dict[str, Any]]):
         prompt_payload = {
         "sql": sql,
         "text_analysis": text_stats,
@@ -149,13 +159,12 @@ class LlamaClient:
             print(url)
             print(self.model)
             print(self.timeout)
-            r = requests.post(
+            r = await self.http().post(
                 url,
                 json={
                     "model": self.model,
                     "messages": [{"role": "user", "content": prompt}]
-                },
-                timeout=self.timeout
+                }
             )
             if r.status_code == 200:
                 return r.json()["choices"][0]["message"]["content"]
@@ -164,18 +173,17 @@ class LlamaClient:
 
         # fallback to legacy Ollama API
         legacy_url = f"{self.host}/api/generate"
-        r = requests.post(
+        r = await self.http().post(
             legacy_url,
-            json={"model": self.model, "prompt": prompt, "stream": False},
-            timeout=self.timeout
+            json={"model": self.model, "prompt": prompt, "stream": False}
         )
         return r.json().get("response", "")
 
     # --------------------------------------------------------
     # MASTER FUNCTION — Final combined report
     # --------------------------------------------------------
-    def analyze_sql(self, sql: str,  static_stats: str, dryrun_stats: str, heuristic: str, table_schema: List[Dict[str, Any]]):
-        llama_json = self.llama_review(sql, static_stats, dryrun_stats, heuristic, table_schema)
+    async def analyze_sql(self, sql: str,  static_stats: str, dryrun_stats: str, heuristic: str, table_schema: List[Dict[str, Any]]):
+        llama_json = await self.llama_review(sql, static_stats, dryrun_stats, heuristic, table_schema)
 
         return {
             "query_text_stats": static_stats,
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1.optimizer import router as optimizer_router
+from app.api.v1.optimizer import router as optimizer_router, service as optimizer_service
 from app.core.config import get_settings
 from app.db.session import engine, SessionLocal, init_db
 
@@ -23,3 +23,7 @@ app.include_router(optimizer_router, prefix="/api/v1")
 @app.on_event("startup")
 def on_startup():
     init_db()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await optimizer_service.llm.aclose()
@@ -1,6 +1,7 @@
 from app.integrations.llama_client import LlamaClient
 from app.integrations.bigquery_client import BigQueryClient
 from app.utils.sql_diff import generate_diff
+import asyncio
 import json
 import re
 
@@ -12,41 +13,67 @@ class SQLOptimizerService:
         self.llm = LlamaClient()
         self.bq = BigQueryClient()
 
+    # The BigQuery client is blocking, so its calls run in worker threads;
+    # the LLM calls are async (httpx). Independent stages run concurrently:
+    #   schema fetch | dry run (original)
+    #   -> before-analysis (llama_review) | rewrite (optimize_sql)
+    #   -> dry run + llama_review of the rewrite
+    # so a request takes the critical path instead of the sum of the stages.
 
-    def optimize(self, sql: str, table_id: str):
-        # 1. Get stats before: prefer table-based stats if table_id provided
-        stats_before = None
-        rewritten_sql = None
-        try:
-            table_schema = self.bq.get_bq_table_schema(table_id)
-            print("schema", table_schema)
-            static_stats = self.bq.static_sql_stats(sql)
-            dryrun_stats = self.bq.bigquery_dry_run(sql)
-            heuristic = self.bq.heuristic_stats(sql, static_stats, dryrun_stats)
+    async def _stats(self, sql: str, table_schema, dryrun):
+        # dryrun: awaitable for the dry-run stats of sql
+        dryrun_stats = await dryrun
+        static_stats = self.bq.static_sql_stats(sql)
+        heuristic = self.bq.heuristic_stats(sql, static_stats, dryrun_stats)
+        return await self.llm.analyze_sql(sql, static_stats, dryrun_stats, heuristic, table_schema)
 
-            stats_before = self.llm.analyze_sql(sql, static_stats, dryrun_stats, heuristic, table_schema)
-            print(json.dumps(stats_before, indent=4))
-        except Exception as e:
-            stats_before = {"stats before error": str(e)}
-
-        # 2. Ask LLM to rewrite
+    async def _rewrite(self, sql: str, table_schema):
         try:
-            optimized_sql = self.llm.optimize_sql(sql, table_schema)
+            optimized_sql = await self.llm.optimize_sql(sql, table_schema)
             match = re.search(r"```(.*?)```", optimized_sql, re.DOTALL)
             rewritten_sql = match.group(1).strip() if match else None
             print(rewritten_sql)
-            
         except Exception as e:
             optimized_sql = sql  # fallback to original
+            rewritten_sql = None
             print("LLM error:", e)
+        return optimized_sql, rewritten_sql
 
-        # 3. Stats after (estimate)
+    async def optimize(self, sql: str, table_id: str):
+        # 1. Schema and the dry run of the original SQL (both BigQuery, independent)
+        dryrun_before = asyncio.create_task(asyncio.to_thread(self.bq.bigquery_dry_run, sql))
         try:
-            static_stats_after = self.bq.static_sql_stats(rewritten_sql)
-            dryrun_stats_after = self.bq.bigquery_dry_run(rewritten_sql)
-            heuristic_after = self.bq.heuristic_stats(rewritten_sql, static_stats_after, dryrun_stats_after)
+            try:
+                table_schema = await asyncio.to_thread(self.bq.get_bq_table_schema, table_id)
+                print("schema", table_schema)
+            except Exception as e:
+                # no schema: the review and rewrite still run, without it
+                print("Schema error:", e)
+                table_schema = []
 
-            stats_after = self.llm.analyze_sql(rewritten_sql, static_stats_after, dryrun_stats_after, heuristic_after, table_schema)
+            # 2. Stats before and the LLM rewrite, side by side
+            stats_before, (optimized_sql, rewritten_sql) = await asyncio.gather(
+                self._stats(sql, table_schema, dryrun_before),
+                self._rewrite(sql, table_schema),
+                return_exceptions=True,
+            )
+        finally:
+            # never leave the dry run behind (cancelled request, unretrieved error)
+            if not dryrun_before.done():
+                dryrun_before.cancel()
+            elif not dryrun_before.cancelled():
+                dryrun_before.exception()
+        if isinstance(stats_before, Exception):
+            stats_before = {"stats before error": str(stats_before)}
+        else:
+            print(json.dumps(stats_before, indent=4))
+
+        # 3. Stats after (estimate)
+        try:
+            if rewritten_sql is None:
+                raise ValueError("LLM returned no rewritten SQL")
+            dryrun_after = asyncio.to_thread(self.bq.bigquery_dry_run, rewritten_sql)
+            stats_after = await self._stats(rewritten_sql, table_schema, dryrun_after)
             print(json.dumps(stats_after, indent=4))
         except Exception as e:
             stats_after = {"error": str(e)}